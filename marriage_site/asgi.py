@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'marriage_site.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from users import sse  # после get_asgi_application(): нужны загруженные приложения
+
+application = sse.route(django_application)
@@ -45,29 +45,40 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users.apps.UsersConfig',
     'rest_framework',
-    'rest_framework.authtoken',
     'widget_tweaks',
-    'debug_toolbar',
 ]
 
-# REST_FRAMEWORK = {
-#     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-#     'PAGE_SIZE': 10,
-# }
+REST_FRAMEWORK = {
+    # Сайт — по сессии, мобильные клиенты — по токену из api-token-auth/ (users/authentication.py)
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'users.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+}
 
 MIDDLEWARE = [
+    'users.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar слишком тяжёл для продакшена — только при отладке
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'marriage_site.urls'
 
 TEMPLATES = [
@@ -93,6 +104,16 @@ WSGI_APPLICATION = 'marriage_site.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Соединения с БД: по умолчанию пул psycopg 3 в каждом процессе. Под ASGI (Dockerfile) постоянные
+# соединения (CONN_MAX_AGE) привязаны к потокам, которые создаются на каждый запрос, и копились бы.
+# DB_POOL=false — постоянные соединения на DB_CONN_MAX_AGE секунд с проверкой перед повторным
+# использованием; только для WSGI с постоянными потоками (пул несовместим с CONN_MAX_AGE).
+# DB_PGBOUNCER=true — работа через pgbouncer в режиме transaction: без серверных курсоров и
+# подготовленных выражений, которые живут в сессии сервера, а та меняется между транзакциями.
+# Сравнить режимы: manage.py bench_db_connections
+DB_POOL = env.bool('DB_POOL', default=True)
+DB_PGBOUNCER = env.bool('DB_PGBOUNCER', default=False)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -101,8 +122,38 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST'),
         'PORT': env('DB_PORT'),
+        'CONN_MAX_AGE': 0 if DB_POOL else env.int('DB_CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': {},
     }
 }
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+        'max_size': env.int('DB_POOL_MAX_SIZE', default=10),  # на процесс: не больше потоков gunicorn
+        'timeout': env.float('DB_POOL_TIMEOUT', default=10),  # ожидание свободного соединения, с
+    }
+if DB_PGBOUNCER:
+    DATABASES['default']['OPTIONS']['prepare_threshold'] = None
+
+# Общий для всех процессов кэш без отдельного сервиса — таблица в БД (manage.py createcachetable;
+# migrate создаёт её сам, см. users/signals.py). Запись стоит одного UPSERT и COUNT(*) по таблице
+# (до MAX_ENTRIES строк). Файловый кэш (filecache://) сюда не подходит: каждая запись перебирает
+# весь каталог. Перед общим кэшем — LRU в памяти процесса (users/cache.py): версию общего кэша
+# процесс перечитывает не реже раза в CACHE_LOCAL_TTL секунд
+CACHES = {
+    'default': env.cache('CACHE_URL', default='dbcache://django_cache'),
+}
+CACHES['default'].setdefault('OPTIONS', {}).setdefault('MAX_ENTRIES', 10000)
+CACHE_LOCAL_TTL = 5  # с
+CACHE_LOCAL_MAXSIZE = 10000  # записей на процесс
+
+# Сессии: cached_db читает из общего кэша и пишет в БД только при изменении сессии.
+# signed_cookies обходится без хранилища, но выход не отзывает украденную куку, а данные сессии
+# ездят в каждом запросе. Сравнить варианты на своих данных: manage.py bench_sessions
+SESSION_ENGINE = env('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+SESSION_SAVE_EVERY_REQUEST = False
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +189,25 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# static/css/site.css собирает Tailwind (npm run build:css) из шаблонов, см. tailwind.config.js
+STATICFILES_DIRS = [BASE_DIR / 'static']
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # Имена с хэшем содержимого и сжатые копии .gz/.br для gzip_static в nginx. Файл, которого нет
+    # в манифесте, — ошибка, поэтому без collectstatic (STATIC_MANIFEST=False, по умолчанию при DEBUG)
+    # — обычное хранилище. Тесты и bench_endpoints подменяют его сами (users/test_runner.py)
+    'staticfiles': {
+        'BACKEND': 'users.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+if not env.bool('STATIC_MANIFEST', default=not DEBUG):
+    STORAGES['staticfiles']['BACKEND'] = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+# Тесты не запускают collectstatic — статика в них без манифеста
+TEST_RUNNER = 'users.test_runner.TestRunner'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
@@ -155,3 +225,63 @@ LOGOUT_REDIRECT_URL = 'login'
 
 CSRF_USE_SESSIONS = False
 CSRF_COOKIE_HTTPONLY = False
+
+# Блок «Молодожёны» в base.html
+NEWLYWEDS_LIMIT = 10
+NEWLYWEDS_TIMEOUT = 60 * 5
+
+# Автодополнение свободных пользователей из индекса в памяти процесса (БД — запасной путь).
+# Изменения из других процессов индекс дочитывает из журнала в общем кэше; пересобирается, только
+# если отстал больше чем на AUTOCOMPLETE_MAX_LAG изменений или запись журнала уже вытеснена
+USER_AUTOCOMPLETE_INDEX = env.bool('USER_AUTOCOMPLETE_INDEX', default=False)
+
+# Кэш отрисованной карточки публичного профиля (ключ включает версии пользователя и брака)
+PROFILE_CACHE_TIMEOUT = 60 * 60
+
+# Кэш токенов API в памяти процесса (users/authentication.py)
+API_TOKEN_CACHE_SIZE = 10000
+API_TOKEN_CACHE_TTL = 60 * 5  # с
+
+# Карточки пользователей в списках (users/cards.py)
+CARD_TIMEOUT = 60 * 60
+
+# История браков: записей на страницу
+MARRIAGES_PER_PAGE = 20
+
+# Размеры квадратных превью фото (WebP + JPEG), см. users/thumbnails.py и make_thumbnails
+THUMBNAIL_SIZES = (48, 128, 256)
+
+# Фоновые задачи (users.jobs, manage.py run_workers)
+JOB_POLL_INTERVAL = 1.0
+JOB_RETRY_DELAY = 10  # с, удваивается с каждой попыткой
+JOB_LOCK_TIMEOUT = 60 * 10  # задача, выполняющаяся дольше, считается брошенной упавшим воркером
+
+# Метрики для Prometheus (users/metrics.py, /metrics). При нескольких воркерах gunicorn задайте
+# METRICS_DIR в tmpfs (например /dev/shm/metrics) и очищайте его при старте сервиса.
+# Снаружи /metrics закрыт ещё и в nginx, Prometheus опрашивает web:8000 напрямую. Само представление
+# отдаёт метрики сотрудникам, адресам из METRICS_ALLOWED_IPS (адреса и сети) и по заголовку
+# «Authorization: Bearer <METRICS_TOKEN>» — в Docker адрес Prometheus не постоянен, там нужен токен
+METRICS_DIR = env('METRICS_DIR', default='')
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+METRICS_FLUSH_INTERVAL = 1.0  # с
+METRICS_DUPLICATE_WARNING = 10  # столько повторов SQL за запрос пишется в лог как предупреждение
+
+# Профилирование отдельных запросов (users/profiling.py, manage.py profile_token, админка «Профили»)
+PROFILE_DIR = env('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILE_SAMPLE_RATE = env.int('PROFILE_SAMPLE_RATE', default=0)  # профилировать 1 запрос из N; 0 — выключено
+PROFILE_INTERVAL = 0.005  # с между снимками стека
+PROFILE_TOKEN_MAX_AGE = 60 * 60  # срок жизни токена для заголовка X-Profile-Token, с
+PROFILE_KEEP = 500  # старые снимки и их файлы удаляет задача prune_profiles
+
+# События заявок для SSE (users/events.py, users/sse.py): postgres — LISTEN/NOTIFY между процессами,
+# local — в пределах процесса (один воркер, тесты); auto выбирает по СУБД
+EVENTS_BROKER = env('EVENTS_BROKER', default='auto')
+EVENTS_KEEPALIVE = 20  # с между пингами открытого потока
+# LISTEN не работает через pgbouncer в режиме transaction — слушатель подключается к PostgreSQL напрямую
+EVENTS_LISTEN_DATABASE = {
+    key: value for key, value in {
+        'host': env('EVENTS_LISTEN_HOST', default=''),
+        'port': env('EVENTS_LISTEN_PORT', default=''),
+    }.items() if value
+}
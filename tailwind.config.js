@@ -0,0 +1,12 @@
+/** Классы ищутся в шаблонах и в Python (виджеты форм, css_class тегов) — динамически собранные имена не попадут */
+module.exports = {
+  content: [
+    './templates/**/*.html',
+    './users/templates/**/*.html',
+    './users/**/*.py',
+  ],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
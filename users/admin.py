@@ -1,8 +1,19 @@
+import os
+from functools import partial
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
 from django.utils.html import format_html
 
-from .models import User, Marriage, MarriageProposals
+from .autocomplete import engine as autocomplete
+from .models import ApiToken, User, Marriage, MarriageProposals, Job, ProfileCapture
+from . import authentication, cards, profiling
+from .couples import sync_marriages
 
 
 @admin.register(User)
@@ -19,6 +30,15 @@ class UserAdmin(admin.ModelAdmin):
         return obj.get_full_name()
     get_full_name.short_description = 'ФИО'
 
+
+def _invalidate_after_bulk_update(marriages):
+    # bulk_update обходит post_save (users/signals.py) — сбрасываем кэши сами, как dedupe_photos
+    spouses = [pk for marriage in marriages for pk in (marriage.husband_id, marriage.wife_id)]
+    transaction.on_commit(autocomplete.mark_stale)
+    transaction.on_commit(cards.invalidate_cards)
+    transaction.on_commit(partial(authentication.invalidate_tokens, spouses))
+
+
 @admin.register(Marriage)
 class MarriageAdmin(admin.ModelAdmin):
     fields = ['husband', 'wife', 'status']
@@ -44,31 +64,43 @@ class MarriageAdmin(admin.ModelAdmin):
     wife_link.short_description = 'Жена'
 
     @admin.action(description='Подписать брак')
+    @transaction.atomic
     def set_active(self, request, queryset):
-        marriages = list(queryset)
+        marriages = list(queryset.select_related('husband', 'wife'))
         users_to_update = []
+        now = timezone.now()  # bulk_update не проставляет auto_now
         for marriage in marriages:
             marriage.status = Marriage.Status.ACTIVE
+            marriage.updated_at = now
             marriage.husband.is_married = True
             marriage.wife.is_married = True
+            marriage.husband.updated_at = marriage.wife.updated_at = now
             users_to_update.extend([marriage.husband, marriage.wife])
-        Marriage.objects.bulk_update(marriages, ['status'])
+        Marriage.objects.bulk_update(marriages, ['status', 'updated_at'])
 
-        type(marriages[0].husband).objects.bulk_update(users_to_update, ['is_married'])
+        type(marriages[0].husband).objects.bulk_update(users_to_update, ['is_married', 'updated_at'])
+        sync_marriages(marriages)
+        _invalidate_after_bulk_update(marriages)
         self.message_user(request, f"Успешно подписано {len(marriages)} браков")
 
     @admin.action(description='Расторгнуть брак')
+    @transaction.atomic
     def set_divorced(self, request, queryset):
-        marriages = list(queryset)
+        marriages = list(queryset.select_related('husband', 'wife'))
         users_to_update = []
+        now = timezone.now()  # bulk_update не проставляет auto_now
         for marriage in marriages:
             marriage.status = Marriage.Status.DIVORCED
+            marriage.updated_at = now
             marriage.husband.is_married = False
             marriage.wife.is_married = False
+            marriage.husband.updated_at = marriage.wife.updated_at = now
             users_to_update.extend([marriage.husband, marriage.wife])
-        Marriage.objects.bulk_update(marriages, ['status'])
+        Marriage.objects.bulk_update(marriages, ['status', 'updated_at'])
 
-        type(marriages[0].husband).objects.bulk_update(users_to_update, ['is_married'])
+        type(marriages[0].husband).objects.bulk_update(users_to_update, ['is_married', 'updated_at'])
+        sync_marriages(marriages)
+        _invalidate_after_bulk_update(marriages)
         self.message_user(request, f"Расторгнуто {len(marriages)} браков")
 
     def str_display(self, obj):
@@ -84,3 +116,74 @@ class MarriageProposalAdmin(admin.ModelAdmin):
     list_per_page = 20
     autocomplete_fields = ['sender', 'receiver']
     empty_value_display = '—'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'run_at', 'updated_at')
+    list_filter = ('status', 'name')
+    ordering = ('-created_at',)
+    readonly_fields = ('attempts', 'last_error', 'locked_at', 'created_at', 'updated_at')
+    list_per_page = 50
+    actions = ['retry']
+
+    @admin.action(description='Перезапустить')
+    def retry(self, request, queryset):
+        count = queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.QUEUED, attempts=0, run_at=timezone.now(), locked_at=None
+        )
+        self.message_user(request, f"Перезапущено задач: {count}")
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    """Только просмотр и отзыв (удаление): ключи не хранятся, выдаёт их api-token-auth/."""
+    list_display = ('user', 'name', 'created_at')
+    search_fields = ('user__username', 'name')
+    ordering = ('-created_at',)
+    list_select_related = ('user',)
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProfileCapture)
+class ProfileCaptureAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'view', 'duration_ms', 'queries', 'status', 'trigger', 'user', 'download')
+    list_filter = ('trigger', 'method', 'view')
+    search_fields = ('view', 'path')
+    ordering = ('-created_at',)
+    date_hierarchy = 'created_at'
+    list_select_related = ('user',)
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view),
+                 name='users_profilecapture_download'),
+        ] + super().get_urls()
+
+    def download(self, obj):
+        url = reverse('admin:users_profilecapture_download', args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, obj.file)
+    download.short_description = 'Свёрнутые стеки'
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            raise Http404
+        capture = get_object_or_404(ProfileCapture, pk=pk)
+        try:
+            return FileResponse(open(os.path.join(profiling.profile_dir(), capture.file), 'rb'),
+                                as_attachment=True, filename=capture.file, content_type='text/plain')
+        except FileNotFoundError:
+            raise Http404('Файл профиля удалён')
@@ -1,15 +1,38 @@
 import uuid
 
+from django.conf import settings
 from django.db import transaction, models
-from django.db.models import Q
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
 from rest_framework import serializers, status, permissions, mixins, generics
+from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework.exceptions import PermissionDenied, NotFound
 from rest_framework.generics import ListCreateAPIView
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from rest_framework.views import APIView
 
-from users.models import MarriageProposals, User, Marriage
-from users.serializers import MarriageSerializers, UserShortSerializer, OffersSerializers, DivorceSerializer
+from users import tasks
+from users.authentication import CachedTokenAuthentication
+from users.divorce import divorce
+from users.history import history_queryset, to_records
+from users.models import ApiToken, MarriageProposals, User, Marriage
+from users.proposals import accept_proposal
+from users.serializers import MarriageSerializers, UserShortSerializer, OffersSerializers, DivorceSerializer, \
+    MarriageRecordSerializer
+
+
+def waiting_offers(user):
+    # Поступившие заявки
+    incoming = MarriageProposals.objects.filter(
+        receiver=user,
+        status=MarriageProposals.Status.WAITING
+    )
+    # Отправленные заявки
+    outgoing = MarriageProposals.objects.filter(
+        sender=user,
+        status=MarriageProposals.Status.WAITING
+    )
+    return incoming | outgoing
 
 
 class ProposalAPI(ListCreateAPIView):
@@ -59,6 +82,8 @@ class ProposalAPI(ListCreateAPIView):
                     is_active=True,
                     photo=photo
                 )
+                if receiver.photo:
+                    tasks.generate_thumbnails.delay(photo=receiver.photo.name)
 
                 # For new users, automatically complete the marriage
                 validated_data['status'] = MarriageProposals.Status.COMPLETE
@@ -66,7 +91,7 @@ class ProposalAPI(ListCreateAPIView):
             # Create marriage if status is COMPLETE
             if validated_data.get('status') == MarriageProposals.Status.COMPLETE:
                 husband, wife = (sender, receiver) if sender.gender == User.Gender.MAN else (receiver, sender)
-                User.objects.filter(pk__in=[sender.pk, receiver.pk]).update(is_married=True)
+                User.objects.filter(pk__in=[sender.pk, receiver.pk]).update(is_married=True, updated_at=timezone.now())
                 Marriage.objects.create(husband=husband, wife=wife)
 
             serializer.save(
@@ -82,48 +107,39 @@ class ProposalAPI(ListCreateAPIView):
         return response
 
 
-class UserAutocompleteView(APIView):
+class CandidatesAPI(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = UserShortSerializer
+    keyset_ordering = ('last_name', 'first_name', 'id')
 
-    def get(self, request):
-        q = request.GET.get('q', '')  # Получаем поисковую строку из параметра q
-        users = User.objects.filter(is_married=False)
-        if q:
-            users = users.filter(
-                Q(first_name__icontains=q) | Q(last_name__icontains=q)
-            )
-        users = users[:10]  # Ограничиваем 10 результатами
-        serializer = UserShortSerializer(users, many=True)
-        return Response(serializer.data)
+    def get_queryset(self):
+        user = self.request.user
+        # Кому можно сделать предложение: свободные, противоположного пола, без ожидающих заявок
+        pending = MarriageProposals.objects.filter(status=MarriageProposals.Status.WAITING)
+        opposite = User.Gender.WOMAN if user.gender == User.Gender.MAN else User.Gender.MAN
+        return User.objects.filter(
+            ~Exists(pending.filter(sender=OuterRef('pk'))),
+            ~Exists(pending.filter(receiver=OuterRef('pk'))),
+            is_married=False,
+            gender=opposite,
+        )
 
 
 class OffersAPI(
     mixins.CreateModelMixin,
     mixins.UpdateModelMixin,
     mixins.RetrieveModelMixin,
-    mixins.ListModelMixin,
     generics.GenericAPIView
 ):
+    """Одна заявка: просмотр и смена статуса. Список — async_views.OffersListAPI."""
     serializer_class = OffersSerializers
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        # Поступившие заявки
-        incoming = MarriageProposals.objects.filter(
-            receiver=self.request.user,
-            status=MarriageProposals.Status.WAITING
-        )
-        # Отправленные заявки
-        outgoing = MarriageProposals.objects.filter(
-            sender=self.request.user,
-            status=MarriageProposals.Status.WAITING
-        )
-        return incoming | outgoing
+        return waiting_offers(self.request.user)
 
     def get(self, request, *args, **kwargs):
-        if 'pk' in kwargs:
-            return self.retrieve(request, *args, **kwargs)
-        return self.list(request, *args, **kwargs)
+        return self.retrieve(request, *args, **kwargs)
 
     def patch(self, request, *args, **kwargs):
         return self.partial_update(request, *args, **kwargs)
@@ -135,40 +151,19 @@ class OffersAPI(
         user = self.request.user
 
         # Получатель может принять/отклонить, отправитель — только отменить
-        if user != instance.receiver and user != instance.sender:
+        if user.pk not in (instance.receiver_id, instance.sender_id):
             raise PermissionDenied("Ты не можешь изменить эту заявку!")
 
-        if user == instance.sender and serializer.validated_data.get('status') != MarriageProposals.Status.CANCELED:
+        if user.pk == instance.sender_id and validated_data.get('status') != MarriageProposals.Status.CANCELED:
             raise PermissionDenied("Отправитель может только отменить заявку!")
 
-        with transaction.atomic():
-            if (instance.status == MarriageProposals.Status.WAITING and
-                    validated_data.get('status') == MarriageProposals.Status.COMPLETE):
-                if instance.sender.gender == User.Gender.MAN:
-                    Marriage.objects.create(
-                        husband=instance.sender,
-                        wife=instance.receiver,
-                    )
-                else:
-                    Marriage.objects.create(
-                        husband=instance.receiver,
-                        wife=instance.sender,
-                    )
-
-                instance.sender.is_married = True
-                instance.receiver.is_married = True
-                instance.sender.save()
-                instance.receiver.save()
-
-                MarriageProposals.objects.filter(
-                    models.Q(sender=instance.sender) |
-                    models.Q(sender=instance.receiver) |
-                    models.Q(receiver=instance.sender) |
-                    models.Q(receiver=instance.receiver),
-                    status=MarriageProposals.Status.WAITING
-                ).exclude(id=instance.id).update(status=MarriageProposals.Status.CANCELED)
-
-            serializer.save()
+        if validated_data.get('status') == MarriageProposals.Status.COMPLETE:
+            # Условные UPDATE вместо чтения и полного сохранения обоих пользователей; гонка — 409
+            accept_proposal(instance.pk, user.pk)
+            instance.status = MarriageProposals.Status.COMPLETE
+            return
+
+        serializer.save()
 
 
 class DivorceAPI(
@@ -186,24 +181,15 @@ class DivorceAPI(
         )
 
     def get_object(self):
-        queryset = self.get_queryset()
-        if not queryset.exists():
+        # Активный брак у пользователя не больше одного (unique_active_*) — хватает одного запроса
+        marriage = self.get_queryset().first()
+        if marriage is None:
             raise NotFound("Вы не состоите в активном браке")
-        return queryset.first()
+        self.check_object_permissions(self.request, marriage)
+        return marriage
 
     def perform_update(self, serializer):
-        marriage = serializer.instance
-
-        with transaction.atomic():
-            husband = marriage.husband
-            wife = marriage.wife
-            husband.is_married = False
-            wife.is_married = False
-            husband.save()
-            wife.save()
-
-            marriage.status = Marriage.Status.DIVORCED
-            marriage.save()
+        divorce(serializer.instance)
 
     def update(self, request, *args, **kwargs):
         response = super().update(request, *args, **kwargs)
@@ -214,3 +200,55 @@ class DivorceAPI(
 
     def patch(self, request, *args, **kwargs):
         return super().update(request, *args, **kwargs)
+
+
+class MarriageHistoryPagination(PageNumberPagination):
+    # Курсор по ключу к UNION не применить, а история одного человека короткая — хватает номера страницы
+    page_size = settings.MARRIAGES_PER_PAGE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class MarriagesAPI(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = MarriageRecordSerializer
+    pagination_class = MarriageHistoryPagination
+
+    def get_history_user(self):
+        user = self.request.user
+        user_pk = self.request.query_params.get('user')
+        if user_pk is None or str(user.pk) == user_pk:
+            return user
+        # Историю других пользователей видят только сотрудники
+        if not user.is_staff:
+            raise PermissionDenied("Нет доступа к чужой истории браков")
+        try:
+            return User.objects.get(pk=user_pk)
+        except (User.DoesNotExist, ValueError):
+            raise NotFound("Пользователь не найден")
+
+    def get(self, request, *args, **kwargs):
+        page = self.paginate_queryset(history_queryset(self.get_history_user()))
+        serializer = self.get_serializer(to_records(page), many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class ApiTokenAPI(generics.GenericAPIView):
+    """POST — выдать токен по логину и паролю (ключ показывается один раз), DELETE — отозвать текущий."""
+    serializer_class = AuthTokenSerializer
+    authentication_classes = [CachedTokenAuthentication]
+
+    def get_permissions(self):
+        if self.request.method == 'DELETE':
+            return [permissions.IsAuthenticated()]
+        return [permissions.AllowAny()]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        _, key = ApiToken.issue(serializer.validated_data['user'], name=request.headers.get('User-Agent', '')[:100])
+        return Response({'token': key}, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, *args, **kwargs):
+        ApiToken.objects.filter(digest=request.auth.digest).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
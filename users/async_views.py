@@ -0,0 +1,125 @@
+"""Асинхронные представления частых чтений.
+
+Под ASGI (gunicorn -k uvicorn_worker.UvicornWorker) запрос не держит поток, пока ждёт БД или клиента,
+поэтому один процесс обслуживает много медленных соединений. DRF асинхронных представлений не умеет,
+так что ответы собираются вручную в том же формате: те же сериализаторы, JSONRenderer, пагинация
+и ошибки {"detail": ...}. Аутентификация — по сессии, как у фронтенда сайта, и остальными способами
+из DEFAULT_AUTHENTICATION_CLASSES (Basic, токен API).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from users import newlyweds, sse, thumbnails
+from users.api_views import waiting_offers
+from users.autocomplete import engine as autocomplete
+from users.models import User
+from users.pagination import KeysetPagination
+from users.search import asearch_unmarried
+from users.serializers import OffersSerializers, UserShortSerializer
+
+NEWLYWEDS_AVATAR_SIZE = 128
+
+
+def render(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+class AsyncAPIView(View):
+    login_required = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        # request.user в асинхронном коде не прочитать — пользователь загружается через auser()
+        try:
+            if self.login_required:
+                self.user = await self.authenticate(request)
+                if self.user is None:
+                    raise NotAuthenticated()
+            return await super().dispatch(request, *args, **kwargs)
+        except (NotAuthenticated, AuthenticationFailed) as exc:
+            # Как у DRF с SessionAuthentication первой: без WWW-Authenticate вместо 401 отдаётся 403
+            return render({'detail': exc.detail}, status=403)
+        except APIException as exc:
+            return render({'detail': exc.detail}, status=exc.status_code)
+
+    @staticmethod
+    async def authenticate(request):
+        user = await request.auser()
+        if user.is_authenticated:
+            return user
+        # Остальные способы из DEFAULT_AUTHENTICATION_CLASSES, как у синхронных представлений DRF:
+        # Basic и токен (попадание в кэш токенов обходится без БД)
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            if issubclass(authentication_class, SessionAuthentication):
+                continue
+            result = await sync_to_async(authentication_class().authenticate)(request)
+            if result is not None:
+                return result[0]
+        return None
+
+
+class UserAutocompleteView(AsyncAPIView):
+    async def get(self, request):
+        q = request.GET.get('q', '')
+        if settings.USER_AUTOCOMPLETE_INDEX:
+            found = await autocomplete.asearch(q, limit=10)
+            if found is not None:  # None — индекс ещё не собран или устарел
+                # Несохранённые User из записей индекса: URL фото строит тот же сериализатор, что и для БД
+                users = [User(**record) for record in found]
+                return render(UserShortSerializer(users, many=True, context={'request': request}).data)
+        users = await asearch_unmarried(q, limit=10)
+        return render(UserShortSerializer(users, many=True, context={'request': request}).data)
+
+
+class OffersListAPI(AsyncAPIView):
+    """Список ожидающих заявок (GET api/offers/); изменение заявки — api_views.OffersAPI."""
+
+    async def get(self, request):
+        pagination = KeysetPagination()
+        rows = await pagination.apaginate_queryset(waiting_offers(self.user), Request(request), self)
+        serializer = OffersSerializers(rows, many=True, context={'request': request})
+        return render({'next': pagination.get_next_link(), 'results': serializer.data})
+
+
+class ProposalEventsView(AsyncAPIView):
+    """Поток событий заявок (SSE) для тестов и отладки. В marriage_site/asgi.py этот путь перехватывает
+    sse.app: здесь открытый поток держит выделенный запросу поток ОС и его соединение с БД.
+    Под WSGI (runserver) не работает — Django дочитывает асинхронный поток до конца перед отправкой."""
+
+    async def get(self, request):
+        response = StreamingHttpResponse(sse.stream(self.user.pk), content_type='text/event-stream; charset=utf-8')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+def _spouse(person):
+    return {
+        'id': person['pk'],
+        'first_name': person['first_name'],
+        'last_name': person['last_name'],
+        'photo': thumbnails.photo_url(person['photo'], NEWLYWEDS_AVATAR_SIZE, 'webp'),
+    }
+
+
+class NewlywedsAPI(AsyncAPIView):
+    """Лента молодожёнов — тот же кэшированный список, что и блок в base.html."""
+    login_required = False
+
+    async def get(self, request):
+        couples = await newlyweds.aget_newlyweds()
+        return render([
+            {
+                'id': couple['pk'],
+                'created_at': couple['created_at'],
+                'husband': _spouse(couple['husband']),
+                'wife': _spouse(couple['wife']),
+            }
+            for couple in couples
+        ])
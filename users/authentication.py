@@ -0,0 +1,66 @@
+"""Аутентификация API по токену (заголовок «Authorization: Token <ключ>») с кэшем в памяти процесса.
+
+TokenAuthentication из DRF на каждый вызов делает JOIN токена с пользователем. Здесь пользователь
+по SHA-256 ключа берётся из LRU процесса (API_TOKEN_CACHE_SIZE записей, не дольше API_TOKEN_CACHE_TTL
+секунд), в БД идёт только промах. Записи помечены версией «tokens:<id пользователя>» общего кэша
+(users/cache.py): отзыв токена, изменение или удаление пользователя и его брак повышают версию этого
+пользователя (users/signals.py), и все процессы перестают доверять копиям его токенов не позже чем
+через CACHE_LOCAL_TTL секунд, этот — сразу. Токены остальных пользователей остаются в кэше.
+"""
+import copy
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from users.cache import LocalCache, TwoTierCache
+from users.models import ApiToken
+
+VERSION = 'tokens'
+
+versions = TwoTierCache()
+users = LocalCache(
+    getattr(settings, 'API_TOKEN_CACHE_SIZE', 10000),
+    getattr(settings, 'API_TOKEN_CACHE_TTL', 60 * 5),
+)
+
+
+def _version_name(user_id):
+    return f'{VERSION}:{user_id}'
+
+
+def invalidate_tokens(user_ids):
+    for user_id in user_ids:
+        versions.bump(_version_name(user_id))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    model = ApiToken
+
+    def authenticate_credentials(self, key):
+        digest = ApiToken.make_digest(key)
+        cached = users.get_many([digest]).get(digest)
+        # Версию читаем до запроса пользователя, иначе изменение между ними закэшировалось бы под новой
+        # версией. Для этого нужен id владельца: из прежней записи, а для нового ключа — отдельным запросом
+        user_id = cached[1].pk if cached is not None else (
+            ApiToken.objects.filter(digest=digest).values_list('user_id', flat=True).first()
+        )
+        if user_id is None:
+            # Неизвестные ключи не кэшируются: перебор не вытеснит настоящие токены
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        version = versions.version(_version_name(user_id))
+        if cached is not None and cached[0] == version:
+            user = cached[1]
+        else:
+            token = ApiToken.objects.select_related('user').filter(digest=digest).first()
+            if token is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = token.user
+            users.set_many({digest: (version, user)})
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        # Закэшированный объект общий для потоков — запросу достаётся своя копия
+        user = copy.copy(user)
+        return user, ApiToken(digest=digest, user=user)
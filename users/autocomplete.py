@@ -0,0 +1,257 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'autocomplete:version'
+SEPARATOR = '\x00'  # меньше любого символа имени — префиксы остаются соседями при сортировке
+AUTOCOMPLETE_MAX_LAG = getattr(settings, 'AUTOCOMPLETE_MAX_LAG', 1000)  # изменений; дальше дешевле пересобрать
+AUTOCOMPLETE_CHANGE_TIMEOUT = getattr(settings, 'AUTOCOMPLETE_CHANGE_TIMEOUT', 60 * 60)
+
+
+def _change_key(version):
+    return f'autocomplete:change:{version}'
+
+
+def normalize(text):
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def _tokens(first_name, last_name):
+    first, last = normalize(first_name), normalize(last_name)
+    return {token for token in (first, last, f'{first} {last}'.strip()) if token}
+
+
+class PrefixIndex:
+    """Отсортированный массив ключей «токен\\0pk» для поиска по началу имени или фамилии."""
+
+    def __init__(self):
+        self._keys = []
+        self._records = {}  # pk -> (username, first_name, last_name, photo)
+
+    def __len__(self):
+        return len(self._records)
+
+    @classmethod
+    def build(cls, rows):
+        index = cls()
+        keys = []
+        for pk, username, first_name, last_name, photo in rows:
+            index._records[pk] = (username, first_name, last_name, photo or '')
+            keys.extend(f'{token}{SEPARATOR}{pk}' for token in _tokens(first_name, last_name))
+        keys.sort()
+        index._keys = keys
+        return index
+
+    def add(self, pk, username, first_name, last_name, photo):
+        self.remove(pk)
+        self._records[pk] = (username, first_name, last_name, photo or '')
+        for token in _tokens(first_name, last_name):
+            insort(self._keys, f'{token}{SEPARATOR}{pk}')
+
+    def remove(self, pk):
+        record = self._records.pop(pk, None)
+        if record is None:
+            return
+        for token in _tokens(record[1], record[2]):
+            key = f'{token}{SEPARATOR}{pk}'
+            pos = bisect_left(self._keys, key)
+            if pos < len(self._keys) and self._keys[pos] == key:
+                del self._keys[pos]
+
+    def apply(self, changes):
+        """Применяет записи журнала: (pk, (username, first_name, last_name, photo)) или (pk, None)."""
+        for pk, record in changes:
+            if record is None:
+                self.remove(pk)
+            else:
+                self.add(pk, *record)
+
+    def search(self, q, limit):
+        prefix = normalize(q)
+        found = []
+        seen = set()
+        pos = bisect_left(self._keys, prefix)
+        while pos < len(self._keys) and len(found) < limit:
+            key = self._keys[pos]
+            if not key.startswith(prefix):
+                break
+            pk = int(key.rpartition(SEPARATOR)[2])
+            if pk not in seen:
+                seen.add(pk)
+                found.append((pk, self._records[pk]))
+            pos += 1
+        return found
+
+
+class AutocompleteEngine:
+    """Индекс свободных пользователей в памяти процесса.
+
+    Каждое изменение получает следующий номер общей версии в кэше и записывается в журнал
+    под этим номером (autocomplete:change:<версия>). Процесс, отставший от общей версии, перед
+    поиском дочитывает журнал и применяет изменения на месте. Пересборка в фоне — только при
+    пропуске в журнале (запись вытеснена, mark_stale(), отставание больше AUTOCOMPLETE_MAX_LAG);
+    до её конца поиск возвращает None, и вызывающий идёт в БД.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._building = False
+
+    @property
+    def is_ready(self):
+        return self._catch_up(cache.get(VERSION_KEY), cache.get_many)
+
+    def search(self, q, limit):
+        if not normalize(q):
+            return None
+        if not self.is_ready:
+            self.warm()
+            return None
+        return self._lookup(q, limit)
+
+    async def asearch(self, q, limit):
+        """search() для асинхронных представлений: версия и журнал читаются через cache.aget()."""
+        if not normalize(q):
+            return None
+        shared = await cache.aget(VERSION_KEY)
+        missed = self._missed_keys(shared)
+        entries = await cache.aget_many(missed) if missed else {}
+        if not self._catch_up(shared, lambda keys: {key: entries[key] for key in keys if key in entries}):
+            self.warm()
+            return None
+        return self._lookup(q, limit)
+
+    def _missed_keys(self, shared):
+        version = self._version
+        if self._index is None or not isinstance(shared, int) or not isinstance(version, int):
+            return []
+        if not 0 < shared - version <= AUTOCOMPLETE_MAX_LAG:
+            return []
+        return [_change_key(v) for v in range(version + 1, shared + 1)]
+
+    def _catch_up(self, shared, get_many):
+        """Догоняет общую версию по журналу; False — индекса нет или в журнале пропуск."""
+        if self._index is None or shared is None:
+            return False
+        if self._version == shared:
+            return True
+        keys = self._missed_keys(shared)
+        if not keys:
+            return False
+        entries = get_many(keys)
+        if len(entries) != len(keys):
+            return False
+        with self._lock:
+            if self._version != shared - len(keys):
+                return self._version == shared  # другой поток уже догнал
+            for key in keys:
+                self._index.apply(entries[key])
+            self._version = shared
+        return True
+
+    def _lookup(self, q, limit):
+        # photo — имя файла, URL строит вызывающий (сериализатор)
+        with self._lock:
+            found = self._index.search(q, limit)
+        return [
+            {'id': pk, 'username': username, 'first_name': first_name, 'last_name': last_name, 'photo': photo}
+            for pk, (username, first_name, last_name, photo) in found
+        ]
+
+    def warm(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._build_in_background, name='autocomplete-index', daemon=True).start()
+
+    def build(self):
+        # Версию берём до чтения строк: изменения, попавшие между ними, применятся из журнала повторно
+        version = self._shared_version()
+        started = time.monotonic()
+        rows = User.objects.filter(is_married=False).values_list(
+            'pk', 'username', 'first_name', 'last_name', 'photo'
+        ).iterator(chunk_size=10000)
+        index = PrefixIndex.build(rows)
+        with self._lock:
+            self._index = index
+            self._version = version
+        logger.info('Autocomplete index built: %d users in %.2fs', len(index), time.monotonic() - started)
+
+    def _build_in_background(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Autocomplete index build failed')
+        finally:
+            with self._lock:
+                self._building = False
+            connection.close()  # соединение принадлежит этому потоку
+
+    def _shared_version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, time.time_ns(), None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def _bump(self):
+        try:
+            return cache.incr(VERSION_KEY)
+        except ValueError:
+            version = time.time_ns()
+            cache.set(VERSION_KEY, version, None)
+            return version
+
+    def _publish(self, changes):
+        version = self._bump()
+        # add, а не set: incr в кэше БД не атомарен, и номер может достаться двоим. Второй не затирает
+        # чужую запись, а берёт ещё номер без записи — остальные процессы увидят разрыв и пересоберут индекс
+        if not cache.add(_change_key(version), changes, AUTOCOMPLETE_CHANGE_TIMEOUT):
+            version = self._bump()
+        return version
+
+    def _apply(self, changes):
+        with self._lock:
+            version = self._publish(changes)
+            if self._index is not None and self._version == version - 1:
+                self._index.apply(changes)
+                self._version = version
+
+    def upsert(self, user):
+        if user.is_married:
+            self.remove(user.pk)
+        else:
+            self._apply([(user.pk, (user.username, user.first_name, user.last_name, user.photo.name))])
+
+    def remove(self, pk):
+        self._apply([(pk, None)])
+
+    def refresh_users(self, pks):
+        rows = {
+            row[0]: row for row in User.objects.filter(pk__in=pks).values_list(
+                'pk', 'username', 'first_name', 'last_name', 'photo', 'is_married'
+            )
+        }
+        self._apply([
+            (pk, None if pk not in rows or rows[pk][5] else rows[pk][1:5])
+            for pk in pks
+        ])
+
+    def mark_stale(self):
+        # Номер без записи в журнале — все процессы пересоберут индекс
+        self._bump()
+
+
+engine = AutocompleteEngine()
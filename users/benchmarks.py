@@ -0,0 +1,211 @@
+"""Бенчмарк эндпоинтов users/urls.py: число запросов, время SQL и задержка на заранее заданном наборе данных.
+
+Бюджеты лежат в users/bench_budgets.json; их проверяют тест users.tests.test_budgets (только число
+запросов) и команда bench_endpoints (ещё и задержка).
+"""
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users import couples
+from users.models import Marriage, MarriageProposals, User
+
+BUDGETS_PATH = Path(__file__).with_name('bench_budgets.json')
+MEMORY_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+FIRST_NAMES = ['Иван', 'Пётр', 'Алексей', 'Дмитрий', 'Сергей', 'Анна', 'Мария', 'Елена', 'Ольга', 'Наталья']
+LAST_NAMES = ['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов']
+
+
+def seed(users=200, seed=0):
+    """Заполняет базу: пары с историей разводов, ожидающие заявки и «главные» пользователи бенчмарка.
+
+    Возвращает словарь действующих лиц, от имени которых выполняются запросы.
+    """
+    rnd = random.Random(seed)
+    password = make_password('bench')  # хэш один на всех — PBKDF2 на каждого слишком долог
+
+    def person(username, gender, is_married=False):
+        first = rnd.choice(FIRST_NAMES)
+        last = rnd.choice(LAST_NAMES) + ('а' if gender == User.Gender.WOMAN else '')
+        return User(username=username, password=password, gender=gender, first_name=first, last_name=last,
+                    email=f'{username}@example.com', is_married=is_married)
+
+    def create(*args, **kwargs):
+        user = person(*args, **kwargs)
+        user.save()
+        return user
+
+    crowd = User.objects.bulk_create(
+        person(f'bench{i}', User.Gender.MAN if i % 2 else User.Gender.WOMAN) for i in range(users)
+    )
+    men = [user for user in crowd if user.gender == User.Gender.MAN]
+    women = [user for user in crowd if user.gender == User.Gender.WOMAN]
+
+    # Половина пар — в браке, у каждой ещё по разводу в прошлом
+    marriages = []
+    married = set()
+    for husband, wife in list(zip(men, women))[:len(men) // 2]:
+        marriages.append(Marriage(husband=husband, wife=wife, status=Marriage.Status.DIVORCED))
+        marriages.append(Marriage(husband=husband, wife=wife))
+        married.update([husband.pk, wife.pk])
+    User.objects.filter(pk__in=married).update(is_married=True)
+
+    free_men = [user for user in men if user.pk not in married]
+    free_women = [user for user in women if user.pk not in married]
+    MarriageProposals.objects.bulk_create(
+        MarriageProposals(sender=man, receiver=rnd.choice(free_women)) for man in free_men[1:]
+    )
+
+    # Главные действующие лица
+    viewer = create('viewer', User.Gender.MAN, is_married=True)
+    single = create('single', User.Gender.MAN)
+    newcomer = create('newcomer', User.Gender.MAN)
+    # Фото только в БД: DeletePhotoView файлы не трогает, их удаляет задача
+    photographer = person('photographer', User.Gender.WOMAN)
+    photographer.photo = 'photos/bench/photographer.jpg'
+    photographer.save()
+    bride = create('bride', User.Gender.WOMAN)
+    groom = free_men[0]
+
+    # У viewer длинная история браков и текущий брак
+    for wife in women[:10]:
+        marriages.append(Marriage(husband=viewer, wife=wife, status=Marriage.Status.DIVORCED))
+    viewer_wife = create('viewer_wife', User.Gender.WOMAN, is_married=True)
+    marriages.append(Marriage(husband=viewer, wife=viewer_wife))
+    Marriage.objects.bulk_create(marriages)
+    couples.rebuild()
+
+    # Входящие и исходящие заявки для страниц предложений
+    proposal = MarriageProposals.objects.create(sender=groom, receiver=bride)
+    MarriageProposals.objects.create(sender=single, receiver=free_women[0])
+    MarriageProposals.objects.bulk_create(
+        MarriageProposals(sender=man, receiver=single_woman)
+        for man, single_woman in zip(free_men[1:6], [bride] * 5)
+    )
+    return {
+        'viewer': viewer,
+        'single': single,
+        'newcomer': newcomer,
+        'photographer': photographer,
+        'bride': bride,
+        'anonymous': None,
+        'proposal': proposal,
+        'profile': women[0],
+    }
+
+
+def endpoints(actors):
+    """(имя, метод, URL, данные, от чьего имени) для каждого маршрута users/urls.py."""
+    proposal = actors['proposal']
+    return [
+        ('home', 'get', reverse('home'), None, 'viewer'),
+        ('login', 'get', reverse('login'), None, 'anonymous'),
+        ('logout', 'post', reverse('logout'), None, 'viewer'),
+        ('register', 'get', reverse('register'), None, 'anonymous'),
+        ('profile', 'get', reverse('profile'), None, 'viewer'),
+        ('public_profile', 'get', reverse('public_profile', args=[actors['profile'].pk]), None, 'viewer'),
+        ('delete_photo', 'post', reverse('delete_photo'), None, 'photographer'),
+        ('proposal', 'get', reverse('proposal'), None, 'single'),
+        ('proposal-api:list', 'get', reverse('proposal-api'), None, 'single'),
+        ('proposal-api:create', 'post', reverse('proposal-api'),
+         {'first_name': 'Новая', 'last_name': 'Невеста', 'gender': User.Gender.WOMAN}, 'newcomer'),
+        ('offers-list', 'get', reverse('offers-list'), None, 'bride'),
+        ('offers-list-api', 'get', reverse('offers-list-api'), None, 'bride'),
+        # proposal-events не замеряется: бесконечный поток SSE, см. users/sse.py
+        ('offers-api:retrieve', 'get', reverse('offers-api', args=[proposal.pk]), None, 'bride'),
+        ('offers-api:accept', 'patch', reverse('offers-api', args=[proposal.pk]),
+         {'status': MarriageProposals.Status.COMPLETE}, 'bride'),
+        ('divorce-api', 'patch', reverse('divorce-api'), {}, 'viewer'),
+        ('marriages-list', 'get', reverse('marriages-list'), None, 'viewer'),
+        ('marriages-api', 'get', reverse('marriages-api'), None, 'viewer'),
+        ('user-candidates', 'get', reverse('user-candidates'), None, 'single'),
+        ('user-autocomplete', 'get', reverse('user-autocomplete') + '?q=Ив', None, 'single'),
+        ('newlyweds-api', 'get', reverse('newlyweds-api'), None, 'anonymous'),
+        ('metrics', 'get', reverse('metrics'), None, 'anonymous'),
+        # api-token-auth не замеряется: время выдачи токена — это хэширование пароля
+    ]
+
+
+def _client(actors, actor):
+    client = Client()
+    if actors.get(actor) is not None:
+        client.force_login(actors[actor])
+    return client
+
+
+def measure(actors, iterations=20, only=None):
+    """Прогоняет каждый эндпоинт iterations раз; изменения данных каждого запроса откатываются.
+
+    Число запросов — максимум по прогонам (первый прогон идёт с холодным кэшем).
+    """
+    cache.clear()
+    results = {}
+    for name, method, url, data, actor in endpoints(actors):
+        if only and name not in only:
+            continue
+        client = _client(actors, actor)
+        queries, sql_ms, wall_ms, statuses = [], [], [], set()
+        for _ in range(iterations):
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    if method == 'get':
+                        response = client.get(url)
+                    else:
+                        response = getattr(client, method)(url, data or {}, content_type='application/json')
+                    wall_ms.append((time.perf_counter() - started) * 1000)
+                transaction.set_rollback(True)
+            statuses.add(response.status_code)
+            queries.append(len(captured))
+            sql_ms.append(sum(float(query['time']) for query in captured.captured_queries) * 1000)
+            if name == 'logout':
+                client = _client(actors, actor)
+        wall_ms.sort()
+        results[name] = {
+            'status': sorted(statuses),
+            'queries': max(queries),
+            'sql_ms': round(statistics.mean(sql_ms), 2),
+            'p50_ms': round(statistics.median(wall_ms), 2),
+            'p95_ms': round(wall_ms[min(len(wall_ms) - 1, int(len(wall_ms) * 0.95))], 2),
+        }
+    return results
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check(results, budgets, latency=True):
+    """Список нарушений бюджета в человекочитаемом виде."""
+    violations = []
+    for name, result in results.items():
+        budget = budgets.get(name)
+        if budget is None:
+            violations.append(f'{name}: нет бюджета в {BUDGETS_PATH.name}')
+            continue
+        if result['queries'] > budget['queries']:
+            violations.append(f'{name}: {result["queries"]} запросов при бюджете {budget["queries"]}')
+        if latency and result['p95_ms'] > budget['p95_ms']:
+            violations.append(f'{name}: p95 {result["p95_ms"]}ms при бюджете {budget["p95_ms"]}ms')
+    return violations
+
+
+def budgets_from(results, latency_headroom=3.0, min_latency_ms=50):
+    return {
+        name: {
+            'queries': result['queries'],
+            'p95_ms': max(min_latency_ms, round(result['p95_ms'] * latency_headroom)),
+        }
+        for name, result in results.items()
+    }
@@ -0,0 +1,108 @@
+"""Двухуровневый кэш: LRU процесса с TTL перед общим кэшем Django (CACHES['default'], таблица в БД).
+
+Ключи данных версионные и не меняются, поэтому локальная копия устаревает только вместе с версией.
+Версию процесс перечитывает из общего кэша не реже раза в CACHE_LOCAL_TTL секунд: изменение,
+сделанное другим воркером, видно не позже чем через столько секунд, своё — сразу.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+class LocalCache:
+    """LRU в памяти процесса; записи старше ttl секунд считаются отсутствующими."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                expires, value = entry
+                if expires < now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, mapping):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (expires, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache:
+    def __init__(self, alias=DEFAULT_CACHE_ALIAS, maxsize=None, ttl=None):
+        self.alias = alias
+        self.local = LocalCache(
+            maxsize or getattr(settings, 'CACHE_LOCAL_MAXSIZE', 10000),
+            ttl if ttl is not None else getattr(settings, 'CACHE_LOCAL_TTL', 5),
+        )
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get_many(self, keys):
+        """Словарь найденных ключей: сначала память процесса, недостающие — одним запросом к общему кэшу."""
+        found = self.local.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = self.shared.get_many(missing)
+            self.local.set_many(fetched)
+            found.update(fetched)
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, mapping, timeout=DEFAULT_TIMEOUT):
+        self.shared.set_many(mapping, timeout)
+        self.local.set_many(mapping)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.set_many({key: value}, timeout)
+
+    def version(self, name):
+        key = f'{name}:version'
+        version = self.get(key)
+        if version is None:
+            # Ключ мог быть вытеснен — начинаем с метки времени, чтобы не подхватить старые данные
+            self.shared.add(key, time.time_ns(), None)
+            version = self.shared.get(key)
+            self.local.set_many({key: version})
+        return version
+
+    def bump(self, name):
+        # Новое случайное значение, а не incr: incr в кэше БД — чтение и запись, и два параллельных
+        # повышения дали бы одну и ту же версию, а данные, закэшированные между ними, — устаревшими
+        key = f'{name}:version'
+        version = secrets.randbits(63)
+        self.shared.set(key, version, None)
+        self.local.set_many({key: version})
+        return version
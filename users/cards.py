@@ -0,0 +1,59 @@
+"""Карточки пользователей для списков: имя, аватар, пол, семейное положение.
+
+Хранятся в двухуровневом кэше (users/cache.py) под ключами с общей версией; версию повышают
+сигналы сохранения пользователя и брака (users/signals.py). Список страниц получает все карточки
+одним get_many, недостающие дочитываются из БД одним запросом.
+"""
+from django.conf import settings
+
+from users.cache import TwoTierCache
+from users.models import User
+from users.newlyweds import avatar_url
+
+CARD_TIMEOUT = getattr(settings, 'CARD_TIMEOUT', 60 * 60)
+CARD_FIELDS = ('pk', 'username', 'first_name', 'last_name', 'photo', 'gender', 'is_married')
+VERSION = 'cards'
+
+store = TwoTierCache()
+
+
+def make_card(pk, username, first_name, last_name, photo, gender, is_married):
+    return {
+        'pk': pk,
+        'full_name': f'{first_name} {last_name}'.strip() or username,
+        'photo': photo or '',
+        'avatar': avatar_url(photo),
+        'gender': gender,
+        'is_married': is_married,
+    }
+
+
+def _key(version, pk):
+    return f'card:{version}:{pk}'
+
+
+def get_cards(user_ids):
+    """{pk: карточка} для существующих пользователей из user_ids."""
+    user_ids = list(dict.fromkeys(user_ids))
+    version = store.version(VERSION)
+    cards = {
+        card['pk']: card
+        for card in store.get_many([_key(version, pk) for pk in user_ids]).values()
+    }
+    missing = [pk for pk in user_ids if pk not in cards]
+    if missing:
+        fresh = {
+            row[0]: make_card(*row)
+            for row in User.objects.filter(pk__in=missing).values_list(*CARD_FIELDS)
+        }
+        store.set_many({_key(version, pk): card for pk, card in fresh.items()}, CARD_TIMEOUT)
+        cards.update(fresh)
+    return cards
+
+
+def get_card(user_id):
+    return get_cards([user_id]).get(user_id)
+
+
+def invalidate_cards():
+    store.bump(VERSION)
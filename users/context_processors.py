@@ -1,6 +1,8 @@
-from users.models import Marriage
+from django.utils.functional import SimpleLazyObject
+
+from users.newlyweds import get_newlyweds
 
 
 def get_marriage(request):
-    marriages = Marriage.objects.filter(status = Marriage.Status.ACTIVE).select_related('husband', 'wife')
-    return {'marriages': marriages}
\ No newline at end of file
+    # Список читается из кэша только если шаблон действительно выводит блок
+    return {'marriages': SimpleLazyObject(get_newlyweds)}
@@ -0,0 +1,78 @@
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from users import newlyweds
+from users.models import ActiveCouple, Marriage
+
+DISPLAY_FIELDS = ['first_name', 'last_name', 'photo']
+COUPLE_FIELDS = [f'{role}_{field}' for role in ('husband', 'wife') for field in DISPLAY_FIELDS]
+
+
+def _display(user, role):
+    return {
+        f'{role}_first_name': user.first_name,
+        f'{role}_last_name': user.last_name,
+        f'{role}_photo': user.photo.name or '',
+    }
+
+
+def couple_for(marriage):
+    return ActiveCouple(
+        marriage=marriage,
+        husband_id=marriage.husband_id,
+        wife_id=marriage.wife_id,
+        created_at=marriage.created_at,
+        **_display(marriage.husband, 'husband'),
+        **_display(marriage.wife, 'wife'),
+    )
+
+
+def sync_marriages(marriages):
+    """Приводит витрину ActiveCouple в соответствие со статусами переданных браков.
+
+    Вызывается внутри той же транзакции, что и изменение брака; блок молодожёнов
+    обновляется уже после коммита.
+    """
+    active = [marriage for marriage in marriages if marriage.status == Marriage.Status.ACTIVE]
+    divorced = [marriage.pk for marriage in marriages if marriage.status != Marriage.Status.ACTIVE]
+
+    if divorced:
+        ActiveCouple.objects.filter(marriage_id__in=divorced).delete()
+    if active:
+        couples = ActiveCouple.objects.bulk_create(
+            [couple_for(marriage) for marriage in active],
+            update_conflicts=True,
+            unique_fields=['marriage'],
+            update_fields=COUPLE_FIELDS,
+        )
+
+    if len(marriages) == 1:
+        if active:
+            transaction.on_commit(partial(newlyweds.add_couple, couples[0]))
+        else:
+            transaction.on_commit(partial(newlyweds.remove_couple, divorced[0]))
+    elif marriages:
+        transaction.on_commit(newlyweds.invalidate_newlyweds)
+
+
+def refresh_user(user):
+    """Обновляет имя и фото пользователя в витрине, если он состоит в браке."""
+    for role in ('husband', 'wife'):
+        updated = ActiveCouple.objects.filter(**{role: user}).update(**_display(user, role))
+        if updated:
+            # Брак «меняется» вместе с данными супруга — от его updated_at зависят версии профилей
+            Marriage.objects.filter(couple__in=ActiveCouple.objects.filter(**{role: user})).update(
+                updated_at=timezone.now()
+            )
+            transaction.on_commit(newlyweds.invalidate_newlyweds)
+            return
+
+
+def rebuild():
+    with transaction.atomic():
+        ActiveCouple.objects.all().delete()
+        active = Marriage.objects.filter(status=Marriage.Status.ACTIVE).select_related('husband', 'wife')
+        ActiveCouple.objects.bulk_create((couple_for(marriage) for marriage in active.iterator()), batch_size=1000)
+    transaction.on_commit(newlyweds.invalidate_newlyweds)
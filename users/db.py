@@ -0,0 +1,13 @@
+from django.db import connections
+
+
+def close_before_fork():
+    """Закрывает соединения и пулы соединений перед запуском дочерних процессов.
+
+    Унаследованный сокет нельзя делить с родителем, а пул psycopg держит соединения и
+    фоновые потоки, которые после fork в дочернем процессе не работают.
+    """
+    for connection in connections.all():
+        connection.close()
+        if connection.settings_dict['OPTIONS'].get('pool'):
+            connection.close_pool()
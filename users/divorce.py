@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import Marriage, User
+
+
+@transaction.atomic
+def divorce(marriage):
+    """Расторгает брак: один UPDATE для обоих супругов и сохранение только статуса брака.
+
+    Витрину ActiveCouple и индекс автодополнения обновляют сигналы сохранения брака.
+    """
+    User.objects.filter(pk__in=[marriage.husband_id, marriage.wife_id]).update(
+        is_married=False, updated_at=timezone.now()
+    )
+    marriage.status = Marriage.Status.DIVORCED
+    marriage.save(update_fields=['status', 'updated_at'])
+    return marriage
@@ -0,0 +1,143 @@
+"""События заявок для потока SSE (users/sse.py): создание, принятие, отмена.
+
+Событие получают отправитель и получатель заявки. Публикуется только после коммита:
+- PostgresBroker шлёт pg_notify внутри транзакции — PostgreSQL доставит его при коммите всем
+  процессам, а в каждом процессе один поток держит LISTEN и раздаёт события подписчикам;
+- LocalBroker (SQLite, тесты, один процесс) раздаёт событие в transaction.on_commit.
+
+Подписчик — asyncio.Queue своего цикла событий, так что тысяча открытых потоков — это тысяча
+очередей, а не тысяча потоков ОС или соединений с БД.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from users.models import MarriageProposals
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'proposal_events'
+QUEUE_SIZE = 100  # медленный клиент теряет события сверх этого, а не копит их в памяти
+RECONNECT_DELAY = 5
+
+KINDS = {
+    MarriageProposals.Status.WAITING: 'proposal.created',
+    MarriageProposals.Status.COMPLETE: 'proposal.accepted',
+    MarriageProposals.Status.CANCELED: 'proposal.canceled',
+}
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass
+
+
+class LocalBroker:
+    """Подписки процесса: user_id -> {(цикл событий, очередь)}."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.difference_update({item for item in subscribers if item[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def dispatch(self, event):
+        """Раздаёт событие подписчикам этого процесса; вызывается из любого потока."""
+        with self._lock:
+            targets = [
+                item for user_id in {event['sender'], event['receiver']}
+                for item in self._subscribers.get(user_id, ())
+            ]
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:  # цикл уже закрыт — подписчик вот-вот отпишется
+                pass
+
+    def publish(self, event):
+        transaction.on_commit(partial(self.dispatch, event))
+
+
+class PostgresBroker(LocalBroker):
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, json.dumps(event)])
+
+    def subscribe(self, user_id):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='proposal-events', daemon=True)
+                self._listener.start()
+        return super().subscribe(user_id)
+
+    def _connection_params(self):
+        params = connection.get_connection_params()
+        # Через pgbouncer в режиме transaction LISTEN не работает — слушатель ходит в PostgreSQL напрямую
+        params.update(getattr(settings, 'EVENTS_LISTEN_DATABASE', {}))
+        params.pop('prepare_threshold', None)
+        return params
+
+    def _listen(self):
+        import psycopg
+
+        while True:
+            try:
+                with psycopg.connect(**self._connection_params(), autocommit=True) as listener:
+                    listener.execute(f'LISTEN {CHANNEL}')
+                    for notify in listener.notifies():
+                        self.dispatch(json.loads(notify.payload))
+            except Exception:
+                logger.exception('Proposal events listener failed, reconnecting in %ss', RECONNECT_DELAY)
+            time.sleep(RECONNECT_DELAY)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            backend = getattr(settings, 'EVENTS_BROKER', 'auto')
+            if backend == 'auto':
+                backend = 'postgres' if connection.vendor == 'postgresql' else 'local'
+            _broker = PostgresBroker() if backend == 'postgres' else LocalBroker()
+        return _broker
+
+
+def proposal_changed(proposal_id, sender_id, receiver_id, status):
+    broker().publish({
+        'type': KINDS[status],
+        'id': proposal_id,
+        'sender': sender_id,
+        'receiver': receiver_id,
+        'status': int(status),
+    })
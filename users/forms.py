@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.forms import Select
 
+from users import tasks
 from users.models import User
 
 
@@ -51,6 +52,17 @@ class ProfileUserForm(forms.ModelForm):
         model = get_user_model()
         fields = ['photo','username', 'email', 'first_name', 'last_name', 'gender']
 
+    def save(self, commit=True):
+        user = super().save(commit)
+        if commit and 'photo' in self.changed_data:
+            old_photo = self.initial.get('photo')
+            if old_photo and old_photo.name != user.photo.name:
+                # Старый файл мог остаться у других пользователей — задача проверит ссылки
+                tasks.delete_photo.delay(photo=old_photo.name)
+            if user.photo:
+                tasks.generate_thumbnails.delay(photo=user.photo.name)
+        return user
+
 class MarriageProposalForm(forms.Form):
     type = forms.CharField(widget=forms.HiddenInput(),
                            required=False)
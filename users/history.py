@@ -0,0 +1,44 @@
+from django.db.models import F
+
+from users.models import Marriage
+from users.newlyweds import avatar_url
+
+ROW_FIELDS = ('id', 'partner_pk', 'partner_first_name', 'partner_last_name', 'partner_photo',
+              'status', 'created_at', 'updated_at')
+
+
+class MarriageRecord:
+    """Строка истории браков с точки зрения одного из супругов."""
+    __slots__ = ('id', 'partner_id', 'partner_name', 'partner_photo', 'started_at', 'ended_at', 'is_active')
+
+    def __init__(self, id, partner_pk, partner_first_name, partner_last_name, partner_photo,
+                 status, created_at, updated_at):
+        self.id = id
+        self.partner_id = partner_pk
+        self.partner_name = f'{partner_first_name} {partner_last_name}'.strip()
+        self.partner_photo = partner_photo or ''
+        self.is_active = status == Marriage.Status.ACTIVE
+        self.started_at = created_at
+        self.ended_at = None if self.is_active else updated_at
+
+    @property
+    def partner_avatar(self):
+        return avatar_url(self.partner_photo)
+
+
+def _as(role, partner, user):
+    return Marriage.objects.filter(**{role: user}).annotate(
+        partner_pk=F(f'{partner}_id'),
+        partner_first_name=F(f'{partner}__first_name'),
+        partner_last_name=F(f'{partner}__last_name'),
+        partner_photo=F(f'{partner}__photo'),
+    ).values_list(*ROW_FIELDS)
+
+
+def history_queryset(user):
+    """Браки пользователя, новые сверху: UNION ALL двух выборок по индексам (husband, created_at) и (wife, created_at)."""
+    return _as('husband', 'wife', user).union(_as('wife', 'husband', user), all=True).order_by('-created_at', '-id')
+
+
+def to_records(rows):
+    return [MarriageRecord(*row) for row in rows]
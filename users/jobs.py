@@ -0,0 +1,129 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_LOCK_TIMEOUT = getattr(settings, 'JOB_LOCK_TIMEOUT', 60 * 10)
+JOB_RETRY_DELAY = getattr(settings, 'JOB_RETRY_DELAY', 10)
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def delay(self, **kwargs):
+        return enqueue(self, **kwargs)
+
+
+def task(name=None, priority=0, max_attempts=3):
+    """Регистрирует функцию как фоновую задачу; аргументы передаются только по имени и должны сериализоваться в JSON."""
+    def decorator(func):
+        registered = Task(func, name or f'{func.__module__}.{func.__name__}', priority, max_attempts)
+        _registry[registered.name] = registered
+        return registered
+    return decorator
+
+
+def enqueue(task, priority=None, run_at=None, delay=None, **kwargs):
+    """Ставит задачу в очередь.
+
+    Строка вставляется в текущей транзакции: если она откатится, задачи не будет,
+    а воркер не увидит задачу раньше, чем закоммичены данные, которые она обрабатывает.
+    """
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    return Job.objects.create(
+        name=task.name,
+        payload=kwargs,
+        priority=task.priority if priority is None else priority,
+        max_attempts=task.max_attempts,
+        run_at=run_at,
+    )
+
+
+def claim(limit=1):
+    """Забирает готовые к запуску задачи; параллельные воркеры пропускают уже заблокированные строки."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.Status.QUEUED, run_at__lte=now)
+            .order_by('-priority', 'run_at', 'id')[:limit]
+        )
+        for job in jobs:
+            job.status = Job.Status.RUNNING
+            job.locked_at = now
+            job.attempts += 1
+            job.updated_at = now  # bulk_update не проставляет auto_now
+        Job.objects.bulk_update(jobs, ['status', 'locked_at', 'attempts', 'updated_at'])
+    return jobs
+
+
+def execute(job):
+    registered = _registry.get(job.name)
+    try:
+        if registered is None:
+            raise LookupError(f'Неизвестная задача {job.name}')
+        registered.func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            # Экспоненциальная пауза между попытками: 10 с, 20 с, 40 с...
+            job.status = Job.Status.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+            logger.warning('Job %s failed (attempt %d), retrying', job, job.attempts)
+        else:
+            job.status = Job.Status.FAILED
+            logger.error('Job %s failed permanently:\n%s', job, error)
+        job.last_error = error
+    else:
+        job.status = Job.Status.DONE
+        job.last_error = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_at', 'last_error', 'locked_at', 'updated_at'])
+    return job.status == Job.Status.DONE
+
+
+def release_stale():
+    """Возвращает в очередь задачи, которые слишком долго числятся выполняемыми (воркер упал).
+
+    Задача, исчерпавшая попытки, помечается FAILED: иначе задача, которая каждый раз роняет воркер,
+    крутилась бы вечно. Возвращает число задач, возвращённых в очередь.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.Status.RUNNING, locked_at__lt=now - timedelta(seconds=JOB_LOCK_TIMEOUT))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.Status.FAILED, locked_at=None, updated_at=now,
+        last_error=f'Воркер не завершил задачу за {JOB_LOCK_TIMEOUT} с',
+    )
+    if failed:
+        logger.error('%d stale job(s) exhausted their attempts and failed', failed)
+    return stale.update(status=Job.Status.QUEUED, locked_at=None, updated_at=now)
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи в текущем процессе, пока они не закончатся. Возвращает число выполненных."""
+    done = 0
+    while limit is None or done < limit:
+        jobs = claim()
+        if not jobs:
+            break
+        execute(jobs[0])
+        done += 1
+    return done
@@ -0,0 +1,81 @@
+import random
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from users.models import Marriage, MarriageProposals, User
+from users.proposals import ProposalConflict, accept_proposal
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный замер принятия заявок: параллельные принятия конкурирующих заявок одних и тех же людей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--receivers', type=int, default=50, help='Сколько невест получают заявки')
+        parser.add_argument('--proposals', type=int, default=5, help='Заявок на каждую невесту')
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, receivers, proposals, threads, seed, **options):
+        prefix = f'bench_{uuid.uuid4().hex[:6]}_'
+        pairs = self._prepare(prefix, receivers, proposals)
+        random.Random(seed).shuffle(pairs)
+
+        def attempt(pair):
+            started = time.perf_counter()
+            try:
+                accept_proposal(*pair)
+                outcome = 'accepted'
+            except ProposalConflict:
+                outcome = 'conflict'
+            except Exception as exc:
+                outcome = f'error: {type(exc).__name__}'
+            finally:
+                connection.close()  # соединение принадлежит потоку пула
+            return outcome, (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(attempt, pairs))
+        elapsed = time.perf_counter() - started
+
+        try:
+            outcomes = {}
+            for outcome, _ in results:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            timings = sorted(ms for _, ms in results)
+            marriages = Marriage.objects.filter(wife__username__startswith=prefix).count()
+            self.stdout.write(
+                f'attempts={len(results)} threads={threads} {elapsed:.2f}s '
+                f'({len(results) / elapsed:.0f}/s) p50={statistics.median(timings):.2f}ms '
+                f'p95={timings[int(len(timings) * 0.95)]:.2f}ms max={timings[-1]:.2f}ms '
+                + ' '.join(f'{name}={count}' for name, count in sorted(outcomes.items()))
+            )
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+        errors = {name: count for name, count in outcomes.items() if name.startswith('error')}
+        if errors:
+            raise CommandError(f'Неожиданные ошибки: {errors}')
+        if marriages != receivers:
+            raise CommandError(f'Заключено браков: {marriages}, ожидалось {receivers}')
+
+    def _prepare(self, prefix, receivers, proposals):
+        # Каждый жених делает предложение двум невестам подряд — гонки и по невесте, и по жениху
+        women = User.objects.bulk_create(
+            User(username=f'{prefix}w{i}', first_name='Невеста', last_name=str(i), gender=User.Gender.WOMAN)
+            for i in range(receivers)
+        )
+        men = User.objects.bulk_create(
+            User(username=f'{prefix}m{i}', first_name='Жених', last_name=str(i), gender=User.Gender.MAN)
+            for i in range(receivers * proposals // 2 + 1)
+        )
+        offers = MarriageProposals.objects.bulk_create(
+            MarriageProposals(sender=men[(w * proposals + k) // 2], receiver=woman)
+            for w, woman in enumerate(women) for k in range(proposals)
+        )
+        return [(offer.pk, offer.receiver_id) for offer in offers]
@@ -0,0 +1,60 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import User
+from users.search import search_unmarried
+
+
+class Command(BaseCommand):
+    help = 'Замер задержки автодополнения свободных пользователей (p50/p95/p99) на текущих данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=1000)
+        parser.add_argument('--sample', type=int, default=500, help='Сколько имён взять за основу запросов')
+        parser.add_argument('--budget-ms', type=float, default=10.0, help='Допустимый p99, мс')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        names = list(
+            User.objects.filter(is_married=False)
+            .order_by('?')
+            .values_list('first_name', 'last_name')[:options['sample']]
+        )
+        if not names:
+            raise CommandError('Нет свободных пользователей — сначала заполните базу')
+
+        queries = []
+        for _ in range(options['iterations']):
+            name = rnd.choice(rnd.choice(names))
+            kind = rnd.random()
+            if kind < 0.6:
+                q = name[:rnd.randint(2, max(2, len(name)))]  # набор по буквам
+            elif kind < 0.9 and len(name) > 3:
+                pos = rnd.randrange(1, len(name) - 1)
+                q = name[:pos] + name[pos + 1:]  # опечатка
+            else:
+                q = name
+            queries.append(q)
+
+        search_unmarried(queries[0])  # прогрев соединения
+
+        timings = []
+        for q in queries:
+            started = time.perf_counter()
+            search_unmarried(q)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'users={User.objects.count()} iterations={len(timings)} '
+            f'p50={statistics.median(timings):.2f}ms '
+            f'p95={timings[int(len(timings) * 0.95)]:.2f}ms '
+            f'p99={p99:.2f}ms max={timings[-1]:.2f}ms'
+        )
+        if p99 > options['budget_ms']:
+            raise CommandError(f'p99 {p99:.2f}ms превышает бюджет {options["budget_ms"]}ms')
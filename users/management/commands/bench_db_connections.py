@@ -0,0 +1,109 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from users import db
+
+# Режим -> переменные окружения, которыми settings.py настраивает DATABASES
+MODES = {
+    'none': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '60'},
+    'pool': {'DB_POOL': 'true'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Запросов в секунду при разных режимах соединений с БД: новое соединение на запрос, '
+            'постоянные соединения, пул psycopg. Каждый режим — в отдельном процессе со своими настройками')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8, help='Как потоки gunicorn --threads')
+        parser.add_argument('--path', default=None, help='URL запроса; по умолчанию автодополнение')
+        parser.add_argument('--username', default=None, help='От чьего имени; по умолчанию любой свободный')
+        parser.add_argument('--child', action='store_true', help='Служебный: замер в текущих настройках')
+
+    def handle(self, *args, modes, requests, threads, path, username, child, **options):
+        path = path or reverse('user-autocomplete') + '?q=Ив'
+        if child:
+            self.stdout.write(json.dumps(self.measure(requests, threads, path, username)))
+            return
+
+        baseline = None
+        for mode in modes:
+            command = [sys.executable, sys.argv[0], 'bench_db_connections', '--child', '--requests', str(requests),
+                       '--threads', str(threads), '--path', path]
+            if username:
+                command += ['--username', username]
+            finished = subprocess.run(command, env={**os.environ, **MODES[mode]}, capture_output=True, text=True)
+            if finished.returncode:
+                raise CommandError(f'{mode}: {finished.stderr.strip()}')
+            result = json.loads(finished.stdout.strip().splitlines()[-1])
+            baseline = baseline or result['rps']
+            self.stdout.write(
+                f'{mode:<11} {result["rps"]:8.0f} req/s  x{result["rps"] / baseline:.2f}  '
+                f'p50={result["p50_ms"]:.2f}ms p95={result["p95_ms"]:.2f}ms statuses={result["statuses"]}'
+            )
+
+    def measure(self, requests, threads, path, username):
+        """Запросы идут через WSGIHandler: как в gunicorn, на каждый запрос срабатывают
+        request_started/request_finished, которые и закрывают либо сохраняют соединение."""
+        if settings.DATABASES['default']['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError('Замер имеет смысл только на PostgreSQL')
+        users = get_user_model().objects.filter(is_married=False)
+        user = users.get(username=username) if username else users.first()
+        if user is None:
+            raise CommandError('Нет пользователей — сначала заполните базу (seed_scale)')
+        client = Client()
+        client.force_login(user)
+        cookie = '; '.join(f'{name}={morsel.value}' for name, morsel in client.cookies.items())
+        db.close_before_fork()  # замер начинается без открытых соединений
+
+        handler = WSGIHandler()
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and host[0] != '.'), 'localhost')
+        environ = RequestFactory().get(path, HTTP_COOKIE=cookie, HTTP_HOST=host).environ
+        timings, statuses, lock = [], {}, threading.Lock()
+
+        def worker(count):
+            local = []
+            for _ in range(count):
+                status = []
+                started = time.perf_counter()
+                response = handler({**environ, 'wsgi.input': BytesIO()}, lambda s, h: status.append(s))
+                b''.join(response)
+                response.close()  # request_finished
+                local.append((time.perf_counter() - started) * 1000)
+                with lock:
+                    statuses[status[0]] = statuses.get(status[0], 0) + 1
+            with lock:
+                timings.extend(local)
+
+        per_thread = [requests // threads + (1 if number < requests % threads else 0) for number in range(threads)]
+        workers = [threading.Thread(target=worker, args=(count,)) for count in per_thread]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        timings.sort()
+        return {
+            'rps': len(timings) / elapsed,
+            'p50_ms': statistics.median(timings),
+            'p95_ms': timings[int(len(timings) * 0.95)],
+            'statuses': statuses,
+        }
@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from users import benchmarks
+from users.test_runner import plain_static
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все эндпоинты users/urls.py на тестовой базе с заранее заданными данными '
+            'и сверяет число запросов и p95 с users/bench_budgets.json')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Размер набора данных')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--only', nargs='*', help='Имена эндпоинтов (см. users.benchmarks.endpoints)')
+        parser.add_argument('--no-latency', action='store_true', help='Проверять только число запросов')
+        parser.add_argument('--update-budgets', action='store_true', help='Записать замеры как новые бюджеты')
+        parser.add_argument('--json', action='store_true', dest='as_json', help='Вывести результаты в JSON')
+        parser.add_argument('--keepdb', action='store_true', help='Не удалять тестовую базу')
+
+    def handle(self, *args, users, iterations, only, no_latency, update_budgets, as_json, keepdb, **options):
+        # Данные засеваются в отдельную тестовую базу (test_<NAME>), рабочая не затрагивается
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+        try:
+            actors = benchmarks.seed(users=users)
+            # Бюджеты считают SQL эндпоинтов, поэтому общий кэш — в памяти, как в users.tests.test_budgets:
+            # с dbcache:// к каждому эндпоинту добавились бы запросы к таблице кэша. Статика — как в тестах
+            with override_settings(CACHES=benchmarks.MEMORY_CACHES), plain_static():
+                results = benchmarks.measure(actors, iterations=iterations, only=only)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+            teardown_test_environment()
+
+        if as_json:
+            self.stdout.write(dumps(results))
+        else:
+            self.stdout.write(f'{"endpoint":<22} {"status":<10} {"queries":>7} {"sql ms":>8} {"p50 ms":>8} {"p95 ms":>8}')
+            for name, result in results.items():
+                self.stdout.write(
+                    f'{name:<22} {",".join(map(str, result["status"])):<10} {result["queries"]:>7} '
+                    f'{result["sql_ms"]:>8} {result["p50_ms"]:>8} {result["p95_ms"]:>8}'
+                )
+
+        if update_budgets:
+            budgets = benchmarks.load_budgets() if benchmarks.BUDGETS_PATH.exists() else {}
+            budgets.update(benchmarks.budgets_from(results))
+            benchmarks.BUDGETS_PATH.write_text(dumps(dict(sorted(budgets.items()))) + '\n', encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Бюджеты записаны в {benchmarks.BUDGETS_PATH}'))
+            return
+
+        violations = benchmarks.check(results, benchmarks.load_budgets(), latency=not no_latency)
+        if violations:
+            raise CommandError('Бюджет превышен:\n' + '\n'.join(violations))
+        self.stdout.write(self.style.SUCCESS('Все эндпоинты в пределах бюджета'))
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, indent=2)
@@ -0,0 +1,97 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from users.models import User
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+class Command(BaseCommand):
+    help = ('Накладные расходы сессии на запрос для каждого SESSION_ENGINE: чтение (обычный запрос '
+            'вошедшего пользователя) и запись (сессия изменилась), время SessionMiddleware и SQL-запросы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+        parser.add_argument('--username', default=None, help='Чья сессия (по умолчанию — первый пользователь)')
+
+    def handle(self, *args, iterations, engines, username, **options):
+        users = User.objects.order_by('pk')
+        user = (users.filter(username=username) if username else users).first()
+        if user is None:
+            raise CommandError('Пользователь не найден — сначала заполните базу')
+
+        self.stdout.write(f'current: {settings.SESSION_ENGINE}')
+        self.stdout.write(f'{"engine":<16} {"read µs":>9} {"read SQL":>9} {"write µs":>9} {"write SQL":>10} '
+                          f'{"cookie B":>9}')
+        for name in engines:
+            with override_settings(SESSION_ENGINE=ENGINES[name]):
+                result = self._measure(user, iterations)
+            self.stdout.write(
+                f'{name:<16} {result["read_us"]:>9.0f} {result["read_queries"]:>9.2f} '
+                f'{result["write_us"]:>9.0f} {result["write_queries"]:>10.2f} {result["cookie"]:>9}'
+            )
+
+    def _measure(self, user, iterations):
+        def read(request):
+            request.session.get(SESSION_KEY)  # как AuthenticationMiddleware: без обращения сессия не читается
+            return HttpResponse()
+
+        def write(request):
+            request.session['bench'] = time.perf_counter_ns()
+            return HttpResponse()
+
+        middleware = SessionMiddleware(read)
+        store = middleware.SessionStore()
+        store.update({
+            SESSION_KEY: str(user.pk),
+            BACKEND_SESSION_KEY: settings.AUTHENTICATION_BACKENDS[0],
+            HASH_SESSION_KEY: user.get_session_auth_hash(),
+        })
+        store.save()
+        key = store.session_key
+        factory = RequestFactory()
+
+        def run(get_response):
+            nonlocal key
+            middleware.get_response = get_response
+            timings, queries = [], 0
+            for _ in range(iterations):
+                request = factory.get('/')
+                request.COOKIES[settings.SESSION_COOKIE_NAME] = key
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = middleware(request)
+                    timings.append((time.perf_counter() - started) * 1_000_000)
+                queries += len(captured)
+                if settings.SESSION_COOKIE_NAME in response.cookies:
+                    key = response.cookies[settings.SESSION_COOKIE_NAME].value
+            return statistics.median(timings), queries / iterations
+
+        try:
+            run(read)  # прогрев: кэш сессии и соединение с БД
+            read_us, read_queries = run(read)
+            write_us, write_queries = run(write)
+        finally:
+            middleware.SessionStore(key).delete()
+        return {
+            'read_us': read_us,
+            'read_queries': read_queries,
+            'write_us': write_us,
+            'write_queries': write_queries,
+            'cookie': len(key),
+        }
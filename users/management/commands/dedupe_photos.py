@@ -0,0 +1,131 @@
+import os
+import shutil
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users import authentication, cards, newlyweds, thumbnails
+from users.autocomplete import engine as autocomplete
+from users.models import ActiveCouple, Marriage, User
+from users.storage import PHOTO_DIR, content_digest, content_name
+from users.tasks import PHOTO_GRACE
+
+
+def _move(source, target):
+    """Переносит файл на место target; если такой файл уже есть — просто удаляет source."""
+    if os.path.exists(target):
+        os.remove(source)
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(source, target)
+    return True
+
+
+def _link(source, target):
+    # Сначала второе имя для того же файла: до коммита в БД старое имя остаётся рабочим
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class Command(BaseCommand):
+    help = ('Переводит загруженные фото пользователей на имена по хэшу содержимого (photos/ab/ab….jpg): '
+            'одинаковые файлы сливаются в один, ссылки в БД и превью переносятся')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет сделано')
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help='Удалить файлы в photos/, на которые не ссылается ни один пользователь')
+
+    def handle(self, *args, dry_run, delete_orphans, **options):
+        storage = User._meta.get_field('photo').storage
+        names = list(
+            User.objects.exclude(photo='').exclude(photo__isnull=True)
+            .order_by().values_list('photo', flat=True).distinct()
+        )
+
+        renamed, merged, missing, changed_users = {}, 0, 0, set()
+        targets = set()
+        for name in names:
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f'{name}: файла нет')
+                continue
+            with storage.open(name) as f:
+                target = content_name(content_digest(File(f)), name)
+            if target == name:
+                targets.add(target)
+                continue
+            if target in targets or storage.exists(target):
+                merged += 1
+            targets.add(target)
+            renamed[name] = target
+            self.stdout.write(f'{name} -> {target}')
+            if dry_run:
+                continue
+
+            _link(storage.path(name), storage.path(target))
+            with transaction.atomic():
+                changed_users.update(User.objects.filter(photo=name).values_list('pk', flat=True))
+                User.objects.filter(photo=name).update(photo=target, updated_at=timezone.now())
+                for role in ('husband', 'wife'):
+                    ActiveCouple.objects.filter(**{f'{role}_photo': name}).update(**{f'{role}_photo': target})
+            os.remove(storage.path(name))
+            self._move_thumbnails(name, target)
+
+        if changed_users:
+            # Данные меняли мимо save(), поэтому кэши и версии сбрасываем сами (как users/signals.py)
+            couples = Q(couple__husband__in=changed_users) | Q(couple__wife__in=changed_users)
+            Marriage.objects.filter(couples).update(updated_at=timezone.now())
+            cards.invalidate_cards()
+            authentication.invalidate_tokens(changed_users)
+            newlyweds.invalidate_newlyweds()
+            if settings.USER_AUTOCOMPLETE_INDEX:
+                autocomplete.refresh_users(sorted(changed_users))
+
+        orphans = self._orphans(storage, targets)
+        for name in orphans:
+            self.stdout.write(f'без ссылок: {name}')
+            if delete_orphans and not dry_run:
+                with storage.lock(name):
+                    # Под блокировкой: файл могли загрузить заново, пока искали файлы без ссылок
+                    if storage.recently_saved(name, PHOTO_GRACE):
+                        continue
+                    thumbnails.delete_thumbnails(name)
+                    storage.delete(name)
+
+        prefix = 'Будет переименовано' if dry_run else 'Переименовано'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: {len(renamed)}, из них слито с дубликатами: {merged}, '
+            f'без файла: {missing}, файлов без ссылок: {len(orphans)}'
+            + (' (удалены)' if delete_orphans and not dry_run else '')
+        ))
+
+    def _move_thumbnails(self, name, target):
+        for old, new in zip(thumbnails.rendition_names(name), thumbnails.rendition_names(target)):
+            if default_storage.exists(old):
+                _move(default_storage.path(old), default_storage.path(new))
+
+    def _orphans(self, storage, referenced):
+        root = storage.path(PHOTO_DIR)
+        referenced = referenced | set(
+            User.objects.exclude(photo='').exclude(photo__isnull=True).values_list('photo', flat=True)
+        )
+        orphans = []
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                name = os.path.relpath(os.path.join(directory, filename), storage.location).replace(os.sep, '/')
+                # Свежие файлы могут принадлежать загрузке, которая ещё не сохранилась в БД
+                if name in referenced or filename.startswith('.') or storage.recently_saved(name, PHOTO_GRACE):
+                    continue
+                orphans.append(name)
+        return sorted(orphans)
@@ -0,0 +1,113 @@
+import asyncio
+import ssl
+import statistics
+import time
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест запущенного сервера: пропускная способность и задержки при растущем числе '
+            'одновременных клиентов. Сравнивает, сколько клиентов держат синхронные воркеры gunicorn и ASGI')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Например http://localhost:8000/api/users/autocomplete/?q=Ив')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 200, 500],
+                            help='Уровни одновременных клиентов, каждый прогоняется отдельно')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность уровня, с')
+        parser.add_argument('--timeout', type=float, default=10, help='Запрос дольше — ошибка, с')
+        parser.add_argument('--slow-ms', type=int, default=0,
+                            help='Медленный клиент: пауза между строкой запроса и заголовками, мс')
+        parser.add_argument('--username', default=None, help='Войти под этим пользователем (сессионная кука)')
+
+    def handle(self, *args, url, concurrency, duration, timeout, slow_ms, username, **options):
+        target = urlsplit(url)
+        if target.scheme not in ('http', 'https'):
+            raise CommandError('Нужен URL вида http://host:port/path')
+        cookie = self._session_cookie(username) if username else None
+        request = self._request(target, cookie)
+
+        self.stdout.write(f'{"clients":>8} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        for clients in concurrency:
+            result = asyncio.run(self._level(target, request, clients, duration, timeout, slow_ms / 1000))
+            self.stdout.write(
+                f'{clients:>8} {result["rps"]:>8.0f} {result["p50"]:>8.1f} {result["p95"]:>8.1f} '
+                f'{result["p99"]:>8.1f} {result["errors"]:>7}'
+                + (f'  {result["statuses"]}' if set(result['statuses']) - {200} else '')
+            )
+
+    def _session_cookie(self, username):
+        try:
+            user = get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'Пользователь {username} не найден')
+        client = Client()
+        client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    @staticmethod
+    def _request(target, cookie):
+        path = target.path or '/'
+        if target.query:
+            path += '?' + target.query
+        head = f'GET {quote(path, safe="/?=&%+")} HTTP/1.1\r\n'
+        headers = f'Host: {target.netloc}\r\nConnection: close\r\nAccept: application/json\r\n'
+        if cookie:
+            headers += f'Cookie: {cookie}\r\n'
+        return head.encode(), (headers + '\r\n').encode()
+
+    async def _level(self, target, request, clients, duration, timeout, slow):
+        port = target.port or (443 if target.scheme == 'https' else 80)
+        context = ssl.create_default_context() if target.scheme == 'https' else None
+        deadline = time.monotonic() + duration
+        timings, statuses, errors = [], {}, [0]
+
+        async def fetch():
+            reader, writer = await asyncio.open_connection(target.hostname, port, ssl=context)
+            try:
+                head, headers = request
+                writer.write(head)
+                if slow:
+                    await writer.drain()
+                    await asyncio.sleep(slow)
+                writer.write(headers)
+                await writer.drain()
+                status_line = await reader.readline()
+                await reader.read()  # Connection: close — тело до конца потока
+                return int(status_line.split()[1])
+            finally:
+                writer.close()
+
+        async def client():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(fetch(), timeout)
+                except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+                    errors[0] += 1
+                    await asyncio.sleep(0.05)  # не долбить в цикле отказавший сервер
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        elapsed = time.monotonic() - started
+
+        timings.sort()
+
+        def percentile(share):
+            return timings[min(len(timings) - 1, int(len(timings) * share))] if timings else float('nan')
+
+        return {
+            'rps': len(timings) / elapsed,
+            'p50': statistics.median(timings) if timings else float('nan'),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'errors': errors[0],
+            'statuses': statuses,
+        }
@@ -0,0 +1,47 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from users import db
+from users.models import User
+from users.thumbnails import generate_thumbnails
+
+
+def _process(name, force):
+    try:
+        return name, generate_thumbnails(name, force=force), None
+    except Exception as exc:
+        return name, 0, f'{type(exc).__name__}: {exc}'
+
+
+class Command(BaseCommand):
+    help = 'Создаёт превью для уже загруженных фото пользователей (в несколько процессов)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Число процессов (по умолчанию — число ядер)')
+        parser.add_argument('--force', action='store_true', help='Пересоздать уже существующие превью')
+
+    def handle(self, *args, workers, force, **options):
+        names = list(
+            User.objects.exclude(photo='').exclude(photo__isnull=True)
+            .order_by().values_list('photo', flat=True).distinct()
+        )
+        # Дочерние процессы не должны унаследовать открытые соединения с БД
+        db.close_before_fork()
+
+        written = failed = 0
+        # Декодирование и ресайз упираются в CPU, поэтому процессы, а не потоки
+        with ProcessPoolExecutor(max_workers=max(workers, 1), initializer=django.setup) as pool:
+            chunksize = max(len(names) // (workers * 4), 1)
+            for name, count, error in pool.map(_process, names, [force] * len(names), chunksize=chunksize):
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                written += count
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Фото: {len(names)}, создано превью: {written}, ошибок: {failed}'
+        ))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users import profiling
+
+
+class Command(BaseCommand):
+    help = 'Выдаёт токен для профилирования запросов через заголовок X-Profile-Token'
+
+    def handle(self, *args, **options):
+        token = profiling.make_token()
+        max_age = getattr(settings, 'PROFILE_TOKEN_MAX_AGE', 60 * 60)
+        self.stdout.write(token)
+        self.stderr.write(f'Действует {max_age} с. Пример:\n'
+                          f"  curl -H '{profiling.TOKEN_HEADER}: {token}' https://.../api/proposal/")
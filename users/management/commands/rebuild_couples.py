@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from users import couples
+from users.models import ActiveCouple
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает витрину активных пар (ActiveCouple) из таблицы браков'
+
+    def handle(self, *args, **options):
+        couples.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Активных пар: {ActiveCouple.objects.count()}'))
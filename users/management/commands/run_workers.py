@@ -0,0 +1,97 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+
+from users import db
+
+logger = logging.getLogger('users.jobs')
+
+STALE_CHECK_INTERVAL = 60
+SHUTDOWN_TIMEOUT = 30
+
+
+def _work(stop, poll_interval, parent_pid):
+    # При запуске через spawn дочерний процесс начинает с чистого интерпретатора,
+    # поэтому users.jobs импортируется только после django.setup()
+    django.setup()
+    from users import jobs
+
+    # Сигналы обрабатывает родитель и через stop просит воркеров доделать текущую задачу и выйти
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    last_stale_check = 0
+    while not stop.is_set() and os.getppid() == parent_pid:
+        try:
+            if time.monotonic() - last_stale_check > STALE_CHECK_INTERVAL:
+                jobs.release_stale()
+                last_stale_check = time.monotonic()
+            claimed = jobs.claim()
+        except OperationalError:
+            logger.exception('Job queue is unavailable')
+            connection.close()
+            stop.wait(poll_interval * 5)
+            continue
+        if not claimed:
+            stop.wait(poll_interval)
+            continue
+        jobs.execute(claimed[0])
+    connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры фоновых задач (users.jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Число процессов-воркеров')
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'JOB_POLL_INTERVAL', 1.0),
+                            help='Пауза между опросами пустой очереди, с')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи в текущем процессе и выйти')
+
+    def handle(self, *args, concurrency, poll_interval, once, **options):
+        if once:
+            from users import jobs
+            jobs.release_stale()
+            self.stdout.write(f'Выполнено задач: {jobs.run_pending()}')
+            return
+
+        # Дочерние процессы не должны унаследовать открытые соединения с БД
+        db.close_before_fork()
+        stop = multiprocessing.Event()
+        # Event.set() из обработчика сигнала может взаимно заблокироваться с Event.wait(), поэтому только флаг
+        signals = []
+        signal.signal(signal.SIGINT, lambda signum, frame: signals.append(signum))
+        signal.signal(signal.SIGTERM, lambda signum, frame: signals.append(signum))
+
+        def start(number):
+            process = multiprocessing.Process(
+                target=_work, args=(stop, poll_interval, os.getpid()), name=f'job-worker-{number}', daemon=True
+            )
+            process.start()
+            return process
+
+        workers = [start(number) for number in range(max(concurrency, 1))]
+        self.stdout.write(f'Запущено воркеров: {len(workers)}')
+
+        while not signals:
+            for number, process in enumerate(workers):
+                if not process.is_alive():
+                    logger.warning('Worker %s exited with code %s, restarting', process.name, process.exitcode)
+                    workers[number] = start(number)
+            time.sleep(1)
+
+        # Воркеры доделывают текущую задачу и выходят сами
+        stop.set()
+        for process in workers:
+            process.join(timeout=SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+        self.stdout.write('Воркеры остановлены')
@@ -0,0 +1,252 @@
+import csv
+import io
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from users import couples, db
+from users.autocomplete import engine as autocomplete
+from users.models import Marriage, MarriageProposals, User
+
+MALE_FIRST_NAMES = [
+    'Александр', 'Алексей', 'Андрей', 'Антон', 'Артём', 'Борис', 'Вадим', 'Василий', 'Виктор', 'Владимир',
+    'Глеб', 'Григорий', 'Даниил', 'Денис', 'Дмитрий', 'Евгений', 'Егор', 'Иван', 'Игорь', 'Илья',
+    'Кирилл', 'Константин', 'Лев', 'Максим', 'Матвей', 'Михаил', 'Никита', 'Николай', 'Олег', 'Павел',
+    'Пётр', 'Роман', 'Семён', 'Сергей', 'Станислав', 'Степан', 'Тимофей', 'Фёдор', 'Юрий', 'Ярослав',
+]
+FEMALE_FIRST_NAMES = [
+    'Александра', 'Алина', 'Алёна', 'Анастасия', 'Анна', 'Валентина', 'Валерия', 'Вера', 'Вероника', 'Виктория',
+    'Галина', 'Дарья', 'Диана', 'Ева', 'Екатерина', 'Елена', 'Елизавета', 'Жанна', 'Зоя', 'Инна',
+    'Ирина', 'Кристина', 'Ксения', 'Лариса', 'Любовь', 'Людмила', 'Маргарита', 'Марина', 'Мария', 'Надежда',
+    'Наталья', 'Нина', 'Оксана', 'Ольга', 'Полина', 'Светлана', 'София', 'Татьяна', 'Ульяна', 'Юлия',
+]
+# Мужские формы; женские образуются по окончанию (Иванов → Иванова, Вишневский → Вишневская)
+LAST_NAMES = [
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков', 'Фёдоров',
+    'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Козлов', 'Степанов', 'Николаев',
+    'Орлов', 'Андреев', 'Макаров', 'Никитин', 'Захаров', 'Зайцев', 'Соловьёв', 'Борисов', 'Яковлев', 'Григорьев',
+    'Романов', 'Воробьёв', 'Сергеев', 'Кузьмин', 'Фролов', 'Александров', 'Дмитриев', 'Королёв', 'Гусев', 'Киселёв',
+    'Ильин', 'Максимов', 'Поляков', 'Сорокин', 'Виноградов', 'Ковалёв', 'Белов', 'Медведев', 'Антонов', 'Тарасов',
+    'Жуков', 'Баранов', 'Филиппов', 'Комаров', 'Давыдов', 'Беляев', 'Герасимов', 'Богданов', 'Осипов', 'Сидоров',
+    'Вишневский', 'Ковальский', 'Покровский', 'Троицкий', 'Успенский', 'Белых', 'Черных', 'Шевчук', 'Бондаренко',
+]
+
+DAY = timedelta(days=1)
+
+
+def feminine(last_name):
+    if last_name.endswith(('ов', 'ев', 'ёв', 'ин', 'ын')):
+        return last_name + 'а'
+    if last_name.endswith('ский'):
+        return last_name[:-2] + 'ая'
+    return last_name  # Белых, Шевчук, Бондаренко не склоняются по роду
+
+
+class Plan:
+    """Детерминированная раскладка данных: любой пакет строк вычисляется независимо от остальных.
+
+    Пользователь i — мужчина при чётном i, женщина при нечётном; пара k — пользователи 2k и 2k+1.
+    Первые `active` пар состоят в активном браке друг с другом, поэтому unique_active_husband/wife
+    соблюдаются без проверок; разводы случайны, но закончились раньше начала любого активного брака.
+    """
+
+    def __init__(self, users, marriages, divorce_ratio, proposals, seed, now, ids, tag, password):
+        self.users = users
+        self.pairs = users // 2
+        self.active = min(int(marriages * (1 - divorce_ratio)), self.pairs)
+        self.marriages = marriages
+        self.proposals = proposals
+        self.seed = seed
+        self.now = now
+        self.ids = ids  # первые id для User, Marriage, MarriageProposals
+        self.tag = tag
+        self.password = password
+
+    def user_id(self, index):
+        return self.ids['user'] + index
+
+    def man(self, pair):
+        return self.user_id(2 * pair)
+
+    def woman(self, pair):
+        return self.user_id(2 * pair + 1)
+
+    def random(self, table, start):
+        return random.Random(f'{self.seed}:{table}:{start}')
+
+    def users_rows(self, start, end):
+        rnd = self.random('users', start)
+        for index in range(start, end):
+            is_man = index % 2 == 0
+            last_name = rnd.choice(LAST_NAMES)
+            username = f'{self.tag}{index}'
+            joined = self.now - rnd.randrange(1, 8 * 365) * DAY
+            yield {
+                'id': self.user_id(index),
+                'username': username,
+                'email': f'{username}@example.com',
+                'password': self.password,
+                'first_name': rnd.choice(MALE_FIRST_NAMES if is_man else FEMALE_FIRST_NAMES),
+                'last_name': last_name if is_man else feminine(last_name),
+                'gender': 1 if is_man else 0,
+                'is_married': index // 2 < self.active,
+                'date_joined': joined,
+                'updated_at': joined,
+            }
+
+    def marriages_rows(self, start, end):
+        rnd = self.random('marriages', start)
+        for number in range(start, end):
+            if number < self.active:
+                created = self.now - rnd.randrange(1, 365) * DAY
+                yield {
+                    'id': self.ids['marriage'] + number,
+                    'husband_id': self.man(number), 'wife_id': self.woman(number),
+                    'status': 1, 'created_at': created, 'updated_at': created,
+                }
+            else:
+                # Развод: заключён 2–8 лет назад и расторгнут не позже, чем год назад
+                created = self.now - rnd.randrange(2 * 365, 8 * 365) * DAY
+                ended = min(created + rnd.randrange(30, 3 * 365) * DAY, self.now - 365 * DAY)
+                yield {
+                    'id': self.ids['marriage'] + number,
+                    'husband_id': self.man(rnd.randrange(self.pairs)),
+                    'wife_id': self.woman(rnd.randrange(self.pairs)),
+                    'status': 0, 'created_at': created, 'updated_at': ended,
+                }
+
+    def proposals_rows(self, start, end):
+        rnd = self.random('proposals', start)
+        free_pairs = self.pairs - self.active
+        for number in range(start, end):
+            # Из каждых десяти: 3 ожидают, 5 отменены, 2 приняты
+            slot = number % 10
+            created = self.now - rnd.randrange(30, 8 * 365) * DAY
+            row = {'id': self.ids['proposal'] + number, 'receiver_fullname': None, 'created_at': created}
+            # Ожидающая заявка у отправителя одна — каждая достаётся следующему свободному мужчине
+            waiting = (number // 10) * 3 + slot
+            if slot < 3 and waiting < free_pairs:
+                created = self.now - rnd.randrange(0, 30) * DAY
+                row.update(sender_id=self.man(self.active + waiting),
+                           receiver_id=self.woman(self.active + rnd.randrange(free_pairs)),
+                           status=-1, created_at=created, updated_at=created)
+            elif slot >= 8 and self.active:
+                pair = rnd.randrange(self.active)
+                row.update(sender_id=self.man(pair), receiver_id=self.woman(pair), status=1,
+                           updated_at=created + rnd.randrange(1, 30) * DAY)
+            else:
+                man, woman = self.man(rnd.randrange(self.pairs)), self.woman(rnd.randrange(self.pairs))
+                sender, receiver = (man, woman) if rnd.random() < 0.7 else (woman, man)
+                row.update(sender_id=sender, receiver_id=receiver, status=0,
+                           updated_at=created + rnd.randrange(1, 30) * DAY)
+            yield row
+
+
+MODELS = {'users': User, 'marriages': Marriage, 'proposals': MarriageProposals}
+
+
+def _insert(model, rows):
+    """COPY в PostgreSQL, пакетный INSERT на остальных базах; на входе — словари значений по attname."""
+    fields = model._meta.concrete_fields
+    defaults = {field.attname: field.get_default() for field in fields}
+    prepared = (
+        [field.get_db_prep_save(row.get(field.attname, defaults[field.attname]), connection) for field in fields]
+        for row in rows
+    )
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows([r'\N' if value is None else value for value in row] for row in prepared)
+            with cursor.copy(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')") as copy:
+                copy.write(buffer.getvalue())
+        else:
+            placeholders = ', '.join(['%s'] * len(fields))
+            cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', list(prepared))
+
+
+def _fill(plan, table, start, end):
+    with transaction.atomic():
+        _insert(MODELS[table], getattr(plan, f'{table}_rows')(start, end))
+    return end - start
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными большого объёма: пользователи с русскими именами, '
+            'история браков с разводами и заявки во всех статусах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--marriages', type=int, default=None, help='По умолчанию — по одному на двух пользователей')
+        parser.add_argument('--divorce-ratio', type=float, default=0.4, help='Доля расторгнутых браков')
+        parser.add_argument('--proposals', type=int, default=None, help='По умолчанию — по одной на пользователя')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--workers', type=int, default=4, help='Процессов; на SQLite всегда 1')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, users, marriages, divorce_ratio, proposals, batch_size, workers, seed, **options):
+        if users < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        if not 0 <= divorce_ratio <= 1:
+            raise CommandError('--divorce-ratio должен быть от 0 до 1')
+        if connection.vendor == 'sqlite':
+            workers = 1  # SQLite не допускает параллельной записи
+
+        plan = Plan(
+            users=users,
+            marriages=users // 2 if marriages is None else marriages,
+            divorce_ratio=divorce_ratio,
+            proposals=users if proposals is None else proposals,
+            seed=seed,
+            now=timezone.now(),
+            ids={'user': self._next_id(User), 'marriage': self._next_id(Marriage),
+                 'proposal': self._next_id(MarriageProposals)},
+            tag=f's{uuid.uuid4().hex[:6]}_',
+            password=make_password('password'),  # один хэш на всех: PBKDF2 на миллион строк занял бы часы
+        )
+
+        # Пакеты пишутся независимо и в своих транзакциях: память ограничена размером пакета
+        db.close_before_fork()
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=django.setup) if workers > 1 else None
+        try:
+            for table, total in (('users', users), ('marriages', plan.marriages), ('proposals', plan.proposals)):
+                started = time.monotonic()
+                batches = [(start, min(start + batch_size, total)) for start in range(0, total, batch_size)]
+                if pool:
+                    done = sum(pool.map(_fill, *zip(*[(plan, table, start, end) for start, end in batches])))
+                else:
+                    done = sum(_fill(plan, table, start, end) for start, end in batches)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'{table}: {done} строк за {elapsed:.1f}s ({done / max(elapsed, 1e-9):.0f}/s)')
+        finally:
+            if pool:
+                pool.shutdown()
+
+        self._reset_sequences()
+        couples.rebuild()
+        autocomplete.mark_stale()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: активных браков {plan.active}, логины {plan.tag}<номер>, пароль «password»'
+        ))
+
+    def _next_id(self, model):
+        last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+        return (last or 0) + 1
+
+    def _reset_sequences(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(MODELS.values())):
+                cursor.execute(sql)
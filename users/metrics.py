@@ -0,0 +1,266 @@
+"""Метрики запросов в формате Prometheus без внешних зависимостей.
+
+Каждый процесс копит значения в памяти. Если задан METRICS_DIR (лучше в tmpfs, например /dev/shm),
+процесс раз в METRICS_FLUSH_INTERVAL секунд сбрасывает свой снимок в <pid>.json, а /metrics
+складывает снимки всех воркеров gunicorn. Файлы завершившихся воркеров не удаляются — иначе счётчики
+пошли бы назад; каталог очищается при перезапуске сервиса.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    'http_requests_total': ('counter', 'Обработанные запросы'),
+    'http_request_duration_seconds': ('histogram', 'Время обработки запроса'),
+    'db_queries_per_request': ('histogram', 'SQL-запросов на один HTTP-запрос'),
+    'db_query_duration_seconds_total': ('counter', 'Суммарное время SQL-запросов'),
+    'db_duplicate_queries_total': ('counter', 'Повторы одного и того же SQL в пределах запроса (N+1)'),
+}
+BUCKETS = {
+    'http_request_duration_seconds': LATENCY_BUCKETS,
+    'db_queries_per_request': QUERY_BUCKETS,
+}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}  # (метрика, метки) -> значение
+        self.histograms = {}  # (метрика, метки) -> [счётчики корзин..., сумма, количество]
+        self._flushed_at = 0
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = BUCKETS[name]
+        key = (name, labels)
+        with self._lock:
+            state = self.histograms.get(key)
+            if state is None:
+                state = self.histograms[key] = [0] * (len(buckets) + 2)
+            for position, bound in enumerate(buckets):
+                if value <= bound:
+                    state[position] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(state)] for (name, labels), state in self.histograms.items()],
+            }
+
+    def flush(self, directory, force=False):
+        now = time.monotonic()
+        if not force and now - self._flushed_at < getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+            return
+        self._flushed_at = now
+        path = Path(directory) / f'{os.getpid()}.json'
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, path)  # читатель не увидит недописанный файл
+
+
+registry = Registry()
+
+
+def _labels(pairs):
+    return tuple(tuple(pair) for pair in pairs)
+
+
+def collect(directory=None):
+    """Снимки всех процессов (собственный — из памяти, чтобы не ждать сброса), сложенные вместе."""
+    snapshots = [registry.snapshot()]
+    if directory:
+        own = f'{os.getpid()}.json'
+        for path in Path(directory).glob('*.json'):
+            if path.name == own:
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue  # файл удалён или перезаписывается — пропускаем до следующего опроса
+
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, _labels(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, state in snapshot['histograms']:
+            key = (name, _labels(labels))
+            total = histograms.setdefault(key, [0] * len(state))
+            for position, value in enumerate(state):
+                total[position] += value
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def render(directory=None):
+    """Текстовый формат экспозиции Prometheus 0.0.4."""
+    counters, histograms = collect(directory)
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+            continue
+        buckets = BUCKETS[name]
+        for (metric, labels), state in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, state):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {state[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {state[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {state[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryTracker:
+    """execute_wrapper: считает запросы, их время и повторы одинакового SQL."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+
+# Трекеры SQL текущего запроса. Контекст копируется в потоки sync_to_async, поэтому запросы асинхронных
+# представлений, которые ORM выполняет в отдельном потоке, попадают в тот же трекер
+_trackers = ContextVar('metrics_query_trackers', default=())
+
+
+def _track(execute, sql, params, many, context):
+    for tracker in _trackers.get():
+        execute = partial(tracker, execute)
+    return execute(sql, params, many, context)
+
+
+def install(db_connection):
+    # В начало списка: execute_wrapper() снимает свою обёртку с конца
+    if _track not in db_connection.execute_wrappers:
+        db_connection.execute_wrappers.insert(0, _track)
+
+
+@receiver(connection_created)
+def _connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+@contextmanager
+def track_queries(tracker):
+    """Передаёт tracker все SQL-запросы этого контекста, в каком бы потоке они ни выполнялись."""
+    install(connection)  # соединение этого потока могло открыться до подключения сигнала
+    token = _trackers.set(_trackers.get() + (tracker,))
+    try:
+        yield tracker
+    finally:
+        _trackers.reset(token)
+
+
+def view_name(request):
+    match = request.resolver_match
+    return (match.view_name or match._func_path) if match else '<unresolved>'
+
+
+class MetricsMiddleware:
+    """Метрики по имени представления: задержка, число и время SQL, повторяющиеся запросы."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        with track_queries(tracker):
+            response = self.get_response(request)
+        self.record(request, response, tracker, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        with track_queries(tracker):
+            response = await self.get_response(request)
+        self.record(request, response, tracker, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, tracker, elapsed):
+        view = view_name(request)
+        labels = (('view', view), ('method', request.method))
+
+        registry.inc('http_requests_total', labels + (('status', response.status_code),))
+        registry.observe('http_request_duration_seconds', labels, elapsed)
+        registry.observe('db_queries_per_request', labels, tracker.count)
+        registry.inc('db_query_duration_seconds_total', labels, tracker.duration)
+        duplicates = tracker.duplicates
+        if duplicates:
+            registry.inc('db_duplicate_queries_total', labels, duplicates)
+            if duplicates >= getattr(settings, 'METRICS_DUPLICATE_WARNING', 10):
+                sql, repeats = tracker.statements.most_common(1)[0]
+                logger.warning('%s %s: %d duplicate queries, e.g. %dx %s', request.method, view, duplicates,
+                               repeats, sql[:200])
+
+        directory = getattr(settings, 'METRICS_DIR', '')
+        if directory:
+            try:
+                registry.flush(directory)
+            except OSError:
+                logger.exception('Failed to flush metrics to %s', directory)
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:48
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# GIN + gin_trgm_ops есть только в PostgreSQL. Индексы не входят в состояние модели,
+# иначе SQLite (тесты) пытался бы пересоздать их при перестройке таблицы.
+TRIGRAM_INDEXES = [
+    ('user_free_first_name_trgm', 'first_name'),
+    ('user_free_last_name_trgm', 'last_name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON users_user '
+            f'USING gin ({column} gin_trgm_ops) WHERE NOT is_married'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_alter_marriage_husband_alter_marriage_status_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
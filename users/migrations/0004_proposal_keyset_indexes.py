@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marriageproposals',
+            index=models.Index(fields=['-created_at', '-id'], name='proposal_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marriageproposals',
+            index=models.Index(fields=['receiver', 'status', '-created_at', '-id'], name='proposal_receiver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marriageproposals',
+            index=models.Index(fields=['sender', 'status', '-created_at', '-id'], name='proposal_sender_idx'),
+        ),
+    ]
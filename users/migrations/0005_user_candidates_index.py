@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0004_proposal_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_married', False)), fields=['gender', 'last_name', 'first_name', 'id'], name='user_free_candidates_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_couples(apps, schema_editor):
+    Marriage = apps.get_model('users', 'Marriage')
+    ActiveCouple = apps.get_model('users', 'ActiveCouple')
+
+    active = Marriage.objects.filter(status=1).select_related('husband', 'wife')
+    ActiveCouple.objects.bulk_create(
+        (
+            ActiveCouple(
+                marriage_id=marriage.pk,
+                husband_id=marriage.husband_id,
+                wife_id=marriage.wife_id,
+                husband_first_name=marriage.husband.first_name,
+                husband_last_name=marriage.husband.last_name,
+                husband_photo=marriage.husband.photo.name or '',
+                wife_first_name=marriage.wife.first_name,
+                wife_last_name=marriage.wife.last_name,
+                wife_photo=marriage.wife.photo.name or '',
+                created_at=marriage.created_at,
+            )
+            for marriage in active.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_candidates_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveCouple',
+            fields=[
+                ('marriage', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='couple', serialize=False, to='users.marriage')),
+                ('husband_first_name', models.CharField(max_length=150)),
+                ('husband_last_name', models.CharField(max_length=150)),
+                ('husband_photo', models.CharField(blank=True, max_length=100)),
+                ('wife_first_name', models.CharField(max_length=150)),
+                ('wife_last_name', models.CharField(max_length=150)),
+                ('wife_photo', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField()),
+                ('husband', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='couple_as_husband', to=settings.AUTH_USER_MODEL)),
+                ('wife', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='couple_as_wife', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-created_at', '-marriage'], name='couple_created_idx')],
+            },
+        ),
+        migrations.RunPython(fill_couples, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marriage',
+            index=models.Index(fields=['husband', '-created_at'], name='marriage_husband_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marriage',
+            index=models.Index(fields=['wife', '-created_at'], name='marriage_wife_created_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileCapture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(max_length=200, verbose_name='Представление')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=500, verbose_name='Путь')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('duration_ms', models.PositiveIntegerField(verbose_name='Время, мс')),
+                ('queries', models.PositiveIntegerField(default=0, verbose_name='SQL-запросов')),
+                ('samples', models.PositiveIntegerField(default=0, verbose_name='Сэмплов')),
+                ('trigger', models.SmallIntegerField(choices=[(0, 'Сотрудник'), (1, 'Подписанный заголовок'), (2, 'Выборка 1 из N')], verbose_name='Причина')),
+                ('file', models.CharField(max_length=200, verbose_name='Файл')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['view', '-duration_ms'], name='profile_view_duration_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:13
+
+import users.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_apitoken'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='photo',
+            field=models.ImageField(blank=True, default=None, null=True, storage=users.storage.ContentAddressedStorage(), upload_to='photos/', verbose_name='Фото'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+import hashlib
+
+from django.db import migrations
+
+LEGACY_TABLE = 'authtoken_token'  # rest_framework.authtoken, больше не подключён
+
+
+def copy_keys(apps, schema_editor):
+    # Ключи, выданные старым api-token-auth/ (obtain_auth_token), продолжают работать: переносим их
+    # в ApiToken в виде SHA-256, а таблицу authtoken_token удаляем — приложение больше не подключено,
+    # и её внешний ключ на users_user не дал бы удалить пользователя со старым токеном.
+    # Обратно не переносится: по SHA-256 ключи не восстановить
+    connection = schema_editor.connection
+    if LEGACY_TABLE not in connection.introspection.table_names():
+        return
+    ApiToken = apps.get_model('users', 'ApiToken')
+    quote = schema_editor.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {quote("key")}, {quote("user_id")}, {quote("created")} FROM {quote(LEGACY_TABLE)}')
+        rows = [(hashlib.sha256(key.encode()).hexdigest(), user_id, created) for key, user_id, created in cursor]
+        existing = set(ApiToken.objects.filter(digest__in=[row[0] for row in rows]).values_list('digest', flat=True))
+        # Сырой INSERT, а не bulk_create: auto_now_add затёр бы дату выдачи ключа
+        cursor.executemany(
+            f'INSERT INTO {quote(ApiToken._meta.db_table)} '
+            f'({quote("digest")}, {quote("user_id")}, {quote("name")}, {quote("created_at")}) '
+            f'VALUES (%s, %s, %s, %s)',
+            [(digest, user_id, '', created) for digest, user_id, created in rows if digest not in existing],
+        )
+        cursor.execute(f'DROP TABLE {quote(LEGACY_TABLE)}')
+        # Иначе повторное подключение rest_framework.authtoken не создало бы таблицу заново
+        cursor.execute(f"DELETE FROM {quote('django_migrations')} WHERE {quote('app')} = 'authtoken'")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_content_addressed_photos'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_keys, migrations.RunPython.noop),
+    ]
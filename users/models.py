@@ -1,13 +1,56 @@
+import hashlib
+import secrets
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AbstractUser, UserManager
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.db import models
+from django.db.models import Case, Value, When
+from django.db.models.functions import Coalesce, Concat
+from django.utils import timezone
+
+from users import thumbnails
+from users.storage import photo_storage
+
+
+class UserQuerySet(models.QuerySet):
+    def with_active_marriage(self):
+        """Добавляет данные активного брака из ActiveCouple тем же запросом.
+
+        Строка витрины пользователя — couple_as_husband или couple_as_wife: два LEFT JOIN по уникальным
+        husband_id/wife_id, в выборку попадает одна из них. active_marriage_pk, partner_pk, partner_name,
+        married_since (и partner_first_name, partner_last_name, partner_photo для partner) — None,
+        если пользователь не в браке.
+        """
+        def either(as_husband, as_wife):
+            return Coalesce(f'couple_as_husband__{as_husband}', f'couple_as_wife__{as_wife}')
+
+        return self.annotate(
+            active_marriage_pk=either('marriage_id', 'marriage_id'),
+            partner_pk=either('wife_id', 'husband_id'),
+            partner_first_name=either('wife_first_name', 'husband_first_name'),
+            partner_last_name=either('wife_last_name', 'husband_last_name'),
+            partner_photo=either('wife_photo', 'husband_photo'),
+            married_since=either('created_at', 'created_at'),
+        ).annotate(
+            partner_name=Case(
+                When(partner_pk__isnull=False, then=Concat('partner_first_name', Value(' '), 'partner_last_name')),
+                default=None,
+                output_field=models.CharField(),
+            ),
+        )
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
 
 
 class MarriedManager(models.Manager):
     def get_queryset(self):
-        return super().get_queryset().filter(husband__isnull=False)
+        # Только состоящие в активном браке — по витрине ActiveCouple, без дублей
+        return super().get_queryset().filter(
+            models.Q(couple_as_husband__isnull=False) | models.Q(couple_as_wife__isnull=False)
+        )
 
 
 class User(AbstractUser):
@@ -23,39 +66,97 @@ class User(AbstractUser):
     first_name = models.CharField(max_length=150, blank=False, null=False, verbose_name='Имя')
     last_name = models.CharField(max_length=150, blank=False, null=False, verbose_name='Фамилия')
 
-    photo = models.ImageField(upload_to='photos/%Y/%m/%d/', default=None, blank=True, null=True, verbose_name='Фото')
+    # Файлы по хэшу содержимого, одинаковые загрузки хранятся один раз (users/storage.py)
+    photo = models.ImageField(upload_to='photos/', storage=photo_storage, default=None, blank=True, null=True,
+                              verbose_name='Фото')
+    updated_at = models.DateTimeField(auto_now=True)
 
     objects = UserManager()
     married = MarriedManager()
 
     REQUIRED_FIELDS = ['email', 'gender', 'first_name', 'last_name']
 
+    class Meta(AbstractUser.Meta):
+        # Триграммные индексы автодополнения (user_free_*_trgm) создаёт только на PostgreSQL миграция 0003,
+        # в состоянии моделей их нет: SQLite не смог бы создать GIN при создании и перестройке таблицы
+        indexes = [
+            # Список кандидатов на странице предложения (CandidatesAPI)
+            models.Index(
+                fields=['gender', 'last_name', 'first_name', 'id'],
+                name='user_free_candidates_idx',
+                condition=models.Q(is_married=False),
+            ),
+        ]
+
+    def _has_marriage_annotation(self):
+        return 'active_marriage_pk' in self.__dict__
+
     @property
     def partner(self):
         if not hasattr(self, '_partner'):
-            marriage = self.active_marriage  # Используем уже оптимизированный property
-            if marriage:
-                self._partner = marriage.wife if marriage.husband == self else marriage.husband
+            if self._has_marriage_annotation():
+                self._partner = self._annotated_partner()
             else:
-                self._partner = None
+                marriage = self.active_marriage  # Используем уже оптимизированный property
+                if marriage:
+                    self._partner = marriage.wife if marriage.husband_id == self.pk else marriage.husband
+                else:
+                    self._partner = None
         return self._partner
 
+    def _annotated_partner(self):
+        if self.partner_pk is None:
+            return None
+        # Супруг из колонок витрины; остальные поля отложены и догрузятся при обращении
+        gender = User.Gender.WOMAN if self.gender == User.Gender.MAN else User.Gender.MAN
+        known = {
+            'id': self.partner_pk,
+            'first_name': self.partner_first_name,
+            'last_name': self.partner_last_name,
+            'photo': self.partner_photo or None,
+            'gender': gender,
+            'is_married': True,
+        }
+        fields = [f.attname for f in User._meta.concrete_fields if f.attname in known]  # from_db ждёт порядок модели
+        return User.from_db(self._state.db, fields, [known[name] for name in fields])
+
     @property
     def active_marriage(self):
         if not hasattr(self, '_active_marriage'):
-            self._active_marriage = self.husband.filter(status=Marriage.Status.ACTIVE).first() or \
-                                    self.wife.filter(status=Marriage.Status.ACTIVE).first()
+            if self._has_marriage_annotation() and self.active_marriage_pk is None:
+                self._active_marriage = None
+            else:
+                self._active_marriage = Marriage.objects.filter(
+                    models.Q(husband=self) | models.Q(wife=self),
+                    status=Marriage.Status.ACTIVE
+                ).select_related('husband', 'wife').first()
         return self._active_marriage
 
+    @property
+    def partner_full_name(self):
+        if self._has_marriage_annotation():
+            return self.partner_name
+        partner = self.partner
+        return partner.get_full_name() if partner else None
+
+    @property
+    def marriage_started_at(self):
+        if self._has_marriage_annotation():
+            return self.married_since
+        marriage = self.active_marriage
+        return marriage.created_at if marriage else None
+
     @property
     def has_photo(self):
+        """URL фото или аватара по умолчанию; для списков — карточки users.cards."""
         if self.photo:
-            try:
-                return self.photo.url
-            except ValueError:
-                pass
+            return self.photo.storage.url(self.photo.name)
         return f"{settings.MEDIA_URL}users/default.png"
 
+    def thumbnail_url(self, size=128, ext='webp'):
+        """URL превью фото не меньше size пикселей (или аватар по умолчанию)."""
+        return thumbnails.thumbnail_url(self.photo, size, ext)
+
 
     def __str__(self):
         return self.username
@@ -87,6 +188,11 @@ class Marriage(models.Model):
                 name='unique_active_wife'
             ),
         ]
+        indexes = [
+            # История браков (MarriagesHTML, /api/marriages/) — по каждому из супругов, новые сверху
+            models.Index(fields=['husband', '-created_at'], name='marriage_husband_created_idx'),
+            models.Index(fields=['wife', '-created_at'], name='marriage_wife_created_idx'),
+        ]
 
     def display_partner(self, user):
         if user == self.husband:
@@ -100,6 +206,30 @@ class Marriage(models.Model):
     def __str__(self):
         return f'{self.husband} + {self.wife}'
 
+class ActiveCouple(models.Model):
+    """Витрина активных браков: одна строка на брак с данными обоих супругов для вывода."""
+    marriage = models.OneToOneField('Marriage', on_delete=models.CASCADE, primary_key=True, related_name='couple')
+    husband = models.OneToOneField('User', on_delete=models.CASCADE, related_name='couple_as_husband')
+    wife = models.OneToOneField('User', on_delete=models.CASCADE, related_name='couple_as_wife')
+
+    husband_first_name = models.CharField(max_length=150)
+    husband_last_name = models.CharField(max_length=150)
+    husband_photo = models.CharField(max_length=100, blank=True)
+    wife_first_name = models.CharField(max_length=150)
+    wife_last_name = models.CharField(max_length=150)
+    wife_photo = models.CharField(max_length=100, blank=True)
+
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-marriage'], name='couple_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.husband_first_name} {self.husband_last_name} + {self.wife_first_name} {self.wife_last_name}'
+
+
 class MarriageProposals(models.Model):
     class Status(models.IntegerChoices):
         COMPLETE = 1, 'Approved'
@@ -120,6 +250,14 @@ class MarriageProposals(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Под курсорную пагинацию ProposalAPI и OffersAPI: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['-created_at', '-id'], name='proposal_created_idx'),
+            models.Index(fields=['receiver', 'status', '-created_at', '-id'], name='proposal_receiver_idx'),
+            models.Index(fields=['sender', 'status', '-created_at', '-id'], name='proposal_sender_idx'),
+        ]
+
     def __str__(self):
         return f'{self.sender} -> {self.receiver}'
 
@@ -133,3 +271,92 @@ class MarriageProposals(models.Model):
             return self.receiver.get_full_name() or self.receiver.username
         return self.receiver_fullname or "Партнера не найдено"
 
+
+
+class Job(models.Model):
+    """Фоновая задача очереди users.jobs; выполняется командой run_workers."""
+    class Status(models.IntegerChoices):
+        QUEUED = 0, 'В очереди'
+        RUNNING = 1, 'Выполняется'
+        DONE = 2, 'Выполнена'
+        FAILED = 3, 'Ошибка'
+
+    name = models.CharField(max_length=100, verbose_name='Задача')
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.SmallIntegerField(choices=Status.choices, default=Status.QUEUED, verbose_name='Статус')
+    priority = models.SmallIntegerField(default=0, verbose_name='Приоритет')  # больше — раньше
+    run_at = models.DateTimeField(default=timezone.now, verbose_name='Запуск не раньше')
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Выборка следующей задачи: только ожидающие, в порядке приоритета и времени запуска
+            models.Index(
+                fields=['-priority', 'run_at', 'id'],
+                condition=models.Q(status=0),
+                name='job_queue_idx',
+            ),
+            # Поиск «зависших» задач упавших воркеров
+            models.Index(fields=['locked_at'], condition=models.Q(status=1), name='job_running_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+
+class ProfileCapture(models.Model):
+    """Профиль одного запроса, снятый users.profiling; сами стеки лежат в PROFILE_DIR."""
+    class Trigger(models.IntegerChoices):
+        STAFF = 0, 'Сотрудник'
+        HEADER = 1, 'Подписанный заголовок'
+        SAMPLE = 2, 'Выборка 1 из N'
+
+    view = models.CharField(max_length=200, verbose_name='Представление')
+    method = models.CharField(max_length=10, verbose_name='Метод')
+    path = models.CharField(max_length=500, verbose_name='Путь')
+    status = models.PositiveSmallIntegerField(verbose_name='Код ответа')
+    duration_ms = models.PositiveIntegerField(verbose_name='Время, мс')
+    queries = models.PositiveIntegerField(default=0, verbose_name='SQL-запросов')
+    samples = models.PositiveIntegerField(default=0, verbose_name='Сэмплов')
+    trigger = models.SmallIntegerField(choices=Trigger.choices, verbose_name='Причина')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    file = models.CharField(max_length=200, verbose_name='Файл')  # относительно PROFILE_DIR
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['view', '-duration_ms'], name='profile_view_duration_idx')]
+
+    def __str__(self):
+        return f'{self.method} {self.view} ({self.duration_ms} мс)'
+
+
+class ApiToken(models.Model):
+    """Токен API мобильных клиентов. Хранится только SHA-256 ключа: сам ключ выдаётся один раз."""
+    digest = models.CharField(max_length=64, primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_tokens', verbose_name='Пользователь')
+    name = models.CharField(max_length=100, blank=True, verbose_name='Устройство')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.user} ({self.name or self.digest[:8]})'
+
+    @staticmethod
+    def make_digest(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def issue(cls, user, name=''):
+        """Создаёт токен и возвращает (токен, ключ для клиента)."""
+        key = secrets.token_hex(20)
+        return cls.objects.create(digest=cls.make_digest(key), user=user, name=name), key
@@ -0,0 +1,133 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models import ActiveCouple, User
+
+NEWLYWEDS_LIMIT = getattr(settings, 'NEWLYWEDS_LIMIT', 10)
+NEWLYWEDS_TIMEOUT = getattr(settings, 'NEWLYWEDS_TIMEOUT', 60 * 5)
+
+VERSION_KEY = 'newlyweds:version'
+
+
+def _data_key(version):
+    return f'newlyweds:{version}'
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Ключ мог быть вытеснен — начинаем с метки времени, чтобы не подхватить старые данные
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def acurrent_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def _bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(VERSION_KEY, version, None)
+        return version
+
+
+def avatar_url(photo):
+    if photo:
+        return User._meta.get_field('photo').storage.url(photo)
+    return f"{settings.MEDIA_URL}users/default.png"
+
+
+def _person(pk, first_name, last_name, photo):
+    return {
+        'pk': pk,
+        'first_name': first_name,
+        'last_name': last_name,
+        'photo': photo,
+    }
+
+
+def couple_entry(couple):
+    return {
+        'pk': couple.marriage_id,
+        'created_at': couple.created_at,
+        'husband': _person(couple.husband_id, couple.husband_first_name, couple.husband_last_name, couple.husband_photo),
+        'wife': _person(couple.wife_id, couple.wife_first_name, couple.wife_last_name, couple.wife_photo),
+    }
+
+
+def _latest():
+    return ActiveCouple.objects.order_by('-created_at', '-marriage')[:NEWLYWEDS_LIMIT]
+
+
+def build_newlyweds():
+    return [couple_entry(couple) for couple in _latest()]
+
+
+def get_newlyweds():
+    key = _data_key(current_version())
+    couples = cache.get(key)
+    if couples is None:
+        couples = build_newlyweds()
+        cache.set(key, couples, NEWLYWEDS_TIMEOUT)
+    return couples
+
+
+async def aget_newlyweds():
+    """get_newlyweds() для асинхронных представлений: тот же ключ кэша, запрос — через асинхронный ORM."""
+    key = _data_key(await acurrent_version())
+    couples = await cache.aget(key)
+    if couples is None:
+        couples = [couple_entry(couple) async for couple in _latest()]
+        await cache.aset(key, couples, NEWLYWEDS_TIMEOUT)
+    return couples
+
+
+def invalidate_newlyweds():
+    _bump_version()
+
+
+def _publish(version, couples):
+    new_version = _bump_version()
+    if new_version != version + 1:
+        # Кто-то успел опубликовать свой список параллельно — пусть пересоберётся из БД
+        _bump_version()
+        return
+    if not cache.add(_data_key(new_version), couples, NEWLYWEDS_TIMEOUT):
+        # incr в кэше БД не атомарен: тот же номер достался и другому процессу
+        _bump_version()
+
+
+def add_couple(couple):
+    version = current_version()
+    couples = cache.get(_data_key(version))
+    if couples is None:
+        return  # Список соберётся при первом чтении
+
+    couples = [couple_entry(couple)] + [c for c in couples if c['pk'] != couple.marriage_id]
+    _publish(version, couples[:NEWLYWEDS_LIMIT])
+
+
+def remove_couple(marriage_pk):
+    version = current_version()
+    couples = cache.get(_data_key(version))
+    if couples is None:
+        return
+
+    remaining = [c for c in couples if c['pk'] != marriage_pk]
+    if len(remaining) == len(couples):
+        return
+    if len(couples) >= NEWLYWEDS_LIMIT:
+        # Список был обрезан — хвост нужно дочитать из БД
+        invalidate_newlyweds()
+        return
+    _publish(version, remaining)
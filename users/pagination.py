@@ -0,0 +1,121 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу: следующая страница — строки «после» последней выданной.
+
+    Курсор хранит значения полей сортировки последней строки, поэтому глубина
+    листания не влияет на стоимость запроса (в отличие от OFFSET). Сочетание
+    полей сортировки должно быть уникальным, поэтому последним идёт pk.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_ordering(self, view):
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, page_size = self.page_queryset(queryset, request, view)
+        return self.take_page(list(queryset), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() для асинхронных представлений."""
+        queryset, page_size = self.page_queryset(queryset, request, view)
+        return self.take_page([row async for row in queryset], page_size)
+
+    def page_queryset(self, queryset, request, view=None):
+        """Запрос строк страницы (с одной лишней — признаком следующей) и размер страницы."""
+        self.request = request
+        self.ordering_fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in self.get_ordering(view)
+        ]
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.get_ordering(view))
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return queryset[:page_size + 1], page_size
+
+    def take_page(self, rows, page_size):
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = (
+            [getattr(rows[-1], name) for name, _ in self.ordering_fields] if self.has_next else None
+        )
+        return rows
+
+    def after(self, position):
+        # (a, b) < (x, y)  ->  a <= x AND (a < x OR (a = x AND b < y))
+        # Условие a <= x избыточно, но только его БД может взять границей диапазона индекса:
+        # одно OR она так не использует и на глубоких страницах читала бы индекс с начала
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.ordering_fields, position):
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        (first, descending), value = self.ordering_fields[0], position[0]
+        return Q(**{f'{first}__{"lte" if descending else "gte"}': value}) & condition
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if len(values) != len(self.ordering_fields):
+                raise ValueError
+            return [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.ordering_fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        # isoformat() целиком: DjangoJSONEncoder обрезает микросекунды, и курсор терял бы строки
+        payload = json.dumps(position, default=lambda value: value.isoformat(), separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
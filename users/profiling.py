@@ -0,0 +1,210 @@
+"""Профилирование отдельных запросов в продакшене.
+
+Запрос профилируется, если:
+- сотрудник добавил к URL ?_profile=1;
+- передан заголовок X-Profile-Token с токеном из manage.py profile_token (для API и не-сотрудников);
+- сработала выборка 1 из PROFILE_SAMPLE_RATE (0 — выключено).
+
+Поток-сэмплер раз в PROFILE_INTERVAL секунд снимает стек обрабатывающего потока, поэтому накладные
+расходы не зависят от числа вызовов функций (в отличие от cProfile). Результат сохраняется в
+PROFILE_DIR в формате свёрнутых стеков («a;b;c 12») — его понимают flamegraph.pl и speedscope.
+Список снимков — в админке (ProfileCapture).
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import SyncToAsync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from users import tasks
+from users.metrics import QueryTracker, track_queries, view_name
+from users.models import ProfileCapture
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEADER = 'X-Profile-Token'
+TOKEN_SALT = 'users.profiling'
+QUERY_PARAM = '_profile'
+
+
+def profile_dir():
+    return getattr(settings, 'PROFILE_DIR', settings.BASE_DIR / 'profiles')
+
+
+def make_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def _valid_token(token):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=getattr(settings, 'PROFILE_TOKEN_MAX_AGE', 60 * 60)
+        )
+    except signing.BadSignature:  # в том числе SignatureExpired
+        return False
+    return True
+
+
+def _frame_name(frame):
+    return f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_qualname}'
+
+
+class Sampler:
+    """Снимает стеки потоков targets — пар (thread_id, root): в профиль попадают только кадры
+    под кадром с кодом root, а снимки, где такого кадра нет (поток занят чужой работой), отбрасываются."""
+
+    def __init__(self, targets, interval):
+        self.targets = targets
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, root in self.targets:
+                stack = self._stack(frames.get(thread_id), root)
+                if stack:
+                    self.stacks[';'.join(reversed(stack))] += 1
+
+    @staticmethod
+    def _stack(frame, root):
+        stack = []
+        while frame is not None:
+            if frame.f_code is root:
+                return stack
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        return None
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def save(request, response, sampler, tracker, duration, trigger):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    view = view_name(request)
+    name = f'{timezone.now():%Y%m%d-%H%M%S}-{view.replace(":", "-")}-{uuid.uuid4().hex[:8]}.folded'
+    with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+        f.write(sampler.folded())
+
+    user = getattr(request, 'user', None)
+    capture = ProfileCapture.objects.create(
+        view=view[:200],
+        method=request.method,
+        path=request.get_full_path()[:500],
+        status=response.status_code,
+        duration_ms=round(duration * 1000),
+        queries=tracker.count,
+        samples=sampler.samples,
+        trigger=trigger,
+        user=user if user is not None and user.is_authenticated else None,
+        file=name,
+    )
+    tasks.prune_profiles.delay()
+    return capture
+
+
+class ProfilingMiddleware:
+    """Ставится после AuthenticationMiddleware: для запуска по ?_profile=1 нужен пользователь."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def trigger(self, request, user):
+        token = request.headers.get(TOKEN_HEADER)
+        if token and _valid_token(token):
+            return ProfileCapture.Trigger.HEADER
+        if user is not None and user.is_staff:
+            return ProfileCapture.Trigger.STAFF
+        rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+        if rate and random.randrange(rate) == 0:
+            return ProfileCapture.Trigger.SAMPLE
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user = getattr(request, 'user', None) if QUERY_PARAM in request.GET else None
+        trigger = self.trigger(request, user)
+        if trigger is None:
+            return self.get_response(request)
+
+        sampler = Sampler([(threading.get_ident(), sys._getframe().f_code)], _interval())
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            with track_queries(tracker):
+                response = self.get_response(request)
+        finally:
+            sampler.stop()
+        capture = self.save_safely(request, response, sampler, tracker, time.perf_counter() - started, trigger)
+        if capture is not None:
+            response['X-Profile-Id'] = str(capture.pk)
+        return response
+
+    async def __acall__(self, request):
+        user = await request.auser() if QUERY_PARAM in request.GET and hasattr(request, 'auser') else None
+        trigger = self.trigger(request, user)
+        if trigger is None:
+            return await self.get_response(request)
+
+        # Корутины запроса выполняются в потоке цикла событий (снимки, где работают чужие корутины,
+        # отбрасываются), ORM и синхронный код — в выделенном запросу потоке sync_to_async
+        sync_thread = await sync_to_async(threading.get_ident)()
+        sampler = Sampler([
+            (threading.get_ident(), sys._getframe().f_code),
+            (sync_thread, SyncToAsync.thread_handler.__code__),
+        ], _interval())
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            with track_queries(tracker):
+                response = await self.get_response(request)
+        finally:
+            sampler.stop()
+        duration = time.perf_counter() - started
+        capture = await sync_to_async(self.save_safely)(request, response, sampler, tracker, duration, trigger)
+        if capture is not None:
+            response['X-Profile-Id'] = str(capture.pk)
+        return response
+
+    @staticmethod
+    def save_safely(request, response, sampler, tracker, duration, trigger):
+        # Сбой записи профиля не должен ломать сам запрос
+        try:
+            return save(request, response, sampler, tracker, duration, trigger)
+        except Exception:
+            logger.exception('Failed to save profile of %s %s', request.method, request.path)
+            return None
+
+
+def _interval():
+    return getattr(settings, 'PROFILE_INTERVAL', 0.005)
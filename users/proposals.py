@@ -0,0 +1,91 @@
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from users import events, tasks
+from users.models import Marriage, MarriageProposals, User
+
+
+class ProposalConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Заявка уже обработана или один из участников уже в браке'
+    default_code = 'conflict'
+
+
+def _update_returning(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _complete(proposal_id, receiver_id, now):
+    proposals = MarriageProposals._meta.db_table
+    rows = _update_returning(
+        f'UPDATE {proposals} SET status = %s, updated_at = %s '
+        f'WHERE id = %s AND receiver_id = %s AND status = %s RETURNING sender_id',
+        [MarriageProposals.Status.COMPLETE, now, proposal_id, receiver_id, MarriageProposals.Status.WAITING],
+    )
+    return rows[0][0] if rows else None
+
+
+def _marry(user_ids, now):
+    # Условный UPDATE блокирует строки супругов: параллельное принятие другой заявки
+    # тем же человеком дождётся коммита, перепроверит is_married и не найдёт строку
+    users = User._meta.db_table
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    rows = _update_returning(
+        f'UPDATE {users} SET is_married = %s, updated_at = %s '
+        f'WHERE id IN ({placeholders}) AND NOT is_married '
+        f'RETURNING id, gender, first_name, last_name, photo',
+        [True, now, *user_ids],
+    )
+    return [
+        User(pk=pk, gender=gender, first_name=first_name, last_name=last_name, photo=photo, is_married=True)
+        for pk, gender, first_name, last_name, photo in rows
+    ]
+
+
+def cancel_competing(proposal_id, spouse_ids, now):
+    """Отменяет остальные ожидающие заявки супругов одним UPDATE; события уходят фоновой задачей."""
+    proposals = MarriageProposals._meta.db_table
+    placeholders = ', '.join(['%s'] * len(spouse_ids))
+    canceled = _update_returning(
+        f'UPDATE {proposals} SET status = %s, updated_at = %s '
+        f'WHERE status = %s AND id <> %s AND (sender_id IN ({placeholders}) OR receiver_id IN ({placeholders})) '
+        f'RETURNING id, sender_id, receiver_id',
+        [MarriageProposals.Status.CANCELED, now, MarriageProposals.Status.WAITING, proposal_id,
+         *spouse_ids, *spouse_ids],
+    )
+    if canceled:
+        tasks.publish_proposal_events.delay(
+            proposals=[[pk, sender_id, receiver_id, MarriageProposals.Status.CANCELED]
+                       for pk, sender_id, receiver_id in canceled],
+        )
+    return len(canceled)
+
+
+@transaction.atomic
+def accept_proposal(proposal_id, receiver_id):
+    """Принимает заявку фиксированным числом запросов; при проигранной гонке — ProposalConflict (409).
+
+    Витрину ActiveCouple заполняет сигнал сохранения брака (из уже прочитанных данных супругов),
+    остальные заявки пары отменяются в той же транзакции, рассылку событий о них делает воркер.
+    """
+    now = timezone.now()
+    sender_id = _complete(proposal_id, receiver_id, now)
+    if sender_id is None:
+        raise ProposalConflict('Заявка уже обработана')
+
+    spouses = _marry([sender_id, receiver_id], now)
+    if len(spouses) != 2:
+        raise ProposalConflict('Один из участников уже состоит в браке')
+
+    husband, wife = sorted(spouses, key=lambda user: user.gender != User.Gender.MAN)
+    if husband.gender == wife.gender:
+        raise ProposalConflict('Однополые браки запрещены')
+
+    marriage = Marriage.objects.create(husband=husband, wife=wife)
+    events.proposal_changed(proposal_id, sender_id, receiver_id, MarriageProposals.Status.COMPLETE)
+    cancel_competing(proposal_id, [sender_id, receiver_id], now)
+    return marriage
@@ -0,0 +1,75 @@
+import re
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from users.models import User
+
+AUTOCOMPLETE_LIMIT = 10
+# Короче трёх символов в запросе нет ни одной полной триграммы — нечёткий поиск бесполезен
+FUZZY_MIN_LENGTH = 3
+
+
+def _unmarried(exclude_pk=None):
+    users = User.objects.filter(is_married=False)
+    if exclude_pk is not None:
+        users = users.exclude(pk=exclude_pk)
+    return users
+
+
+def _prefix_query(users, q):
+    # ~* '^...' обслуживается тем же GIN-индексом pg_trgm, что и нечёткий поиск
+    pattern = '^' + re.escape(q)
+    return users.filter(Q(first_name__iregex=pattern) | Q(last_name__iregex=pattern)).order_by(
+        'last_name', 'first_name', 'pk'
+    )
+
+
+def _fuzzy_query(users, q, exclude_pks):
+    return users.filter(
+        Q(first_name__trigram_word_similar=q) | Q(last_name__trigram_word_similar=q)
+    ).exclude(pk__in=exclude_pks).annotate(
+        similarity=Greatest(
+            TrigramWordSimilarity(q, 'first_name'),
+            TrigramWordSimilarity(q, 'last_name'),
+        )
+    ).order_by('-similarity', 'pk')
+
+
+def _fallback_query(users, q):
+    if not q:
+        return users.order_by('pk')
+    if connection.vendor != 'postgresql':
+        return users.filter(Q(first_name__icontains=q) | Q(last_name__icontains=q)).order_by('pk')
+    return None
+
+
+def search_unmarried(q, limit=AUTOCOMPLETE_LIMIT, exclude_pk=None):
+    """Свободные пользователи для автодополнения: сначала совпадения по началу имени/фамилии, затем похожие."""
+    q = q.strip()
+    users = _unmarried(exclude_pk)
+    fallback = _fallback_query(users, q)
+    if fallback is not None:
+        return list(fallback[:limit])
+
+    found = list(_prefix_query(users, q)[:limit])
+    if len(found) < limit and len(q) >= FUZZY_MIN_LENGTH:
+        found += list(_fuzzy_query(users, q, [user.pk for user in found])[:limit - len(found)])
+    return found
+
+
+async def asearch_unmarried(q, limit=AUTOCOMPLETE_LIMIT, exclude_pk=None):
+    """То же, что search_unmarried, через асинхронный ORM."""
+    q = q.strip()
+    users = _unmarried(exclude_pk)
+    fallback = _fallback_query(users, q)
+    if fallback is not None:
+        return [user async for user in fallback[:limit]]
+
+    found = [user async for user in _prefix_query(users, q)[:limit]]
+    if len(found) < limit and len(q) >= FUZZY_MIN_LENGTH:
+        fuzzy = _fuzzy_query(users, q, [user.pk for user in found])[:limit - len(found)]
+        found += [user async for user in fuzzy]
+    return found
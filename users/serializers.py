@@ -69,17 +69,9 @@ class OffersSerializers(ModelSerializer):
         }
 
     def validate_status(self, value):
-        if value == MarriageProposals.Status.COMPLETE:
-            instance = self.instance
-
-            if instance.sender.is_married:
-                raise serializers.ValidationError("Отправитель уже в браке")
-
-            if instance.receiver.is_married:
-                raise serializers.ValidationError("Получатель уже в браке")
-
-            if instance.status != MarriageProposals.Status.WAITING:
-                raise serializers.ValidationError("Заявка уже обработана")
+        # Семейное положение участников при принятии проверяет сам UPDATE (users.proposals)
+        if value == MarriageProposals.Status.COMPLETE and self.instance.status != MarriageProposals.Status.WAITING:
+            raise serializers.ValidationError("Заявка уже обработана")
 
         return value
 
@@ -95,4 +87,14 @@ class DivorceSerializer(ModelSerializer):
 class UserShortSerializer(ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'first_name', 'last_name', 'photo']
\ No newline at end of file
+        fields = ['id', 'username', 'first_name', 'last_name', 'photo']
+
+
+class MarriageRecordSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    partner_id = serializers.IntegerField()
+    partner_name = serializers.CharField()
+    partner_photo = serializers.CharField(source='partner_avatar')
+    started_at = serializers.DateTimeField()
+    ended_at = serializers.DateTimeField(allow_null=True)
+    is_active = serializers.BooleanField()
@@ -0,0 +1,129 @@
+import os
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_migrate, post_save, post_delete
+from django.dispatch import receiver
+
+from users import authentication, cards, couples, events, newlyweds, profiling, tasks
+from users.autocomplete import engine as autocomplete
+from users.models import ApiToken, User, Marriage, MarriageProposals, ProfileCapture
+
+# Поля пользователя, которые выводятся в витрине пар и блоке молодожёнов
+DISPLAY_FIELDS = set(couples.DISPLAY_FIELDS)
+CARD_FIELDS = set(cards.CARD_FIELDS) - {'pk'}
+
+
+@receiver(post_save, sender=Marriage)
+def marriage_saved(sender, instance, **kwargs):
+    # Витрина обновляется в той же транзакции, что и сам брак
+    couples.sync_marriages([instance])
+
+
+@receiver(post_delete, sender=Marriage)
+def marriage_deleted(sender, instance, **kwargs):
+    # Строку ActiveCouple удаляет каскад
+    transaction.on_commit(partial(newlyweds.remove_couple, instance.pk))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not DISPLAY_FIELDS.union({'is_married'}).intersection(update_fields):
+        return
+    if settings.USER_AUTOCOMPLETE_INDEX:
+        transaction.on_commit(partial(autocomplete.upsert, instance))
+    if not created and instance.is_married:
+        couples.refresh_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    if settings.USER_AUTOCOMPLETE_INDEX:
+        transaction.on_commit(partial(autocomplete.remove, instance.pk))
+    if instance.photo:
+        tasks.delete_photo.delay(photo=instance.photo.name)
+
+
+@receiver(post_save, sender=Marriage)
+@receiver(post_delete, sender=Marriage)
+def sync_autocomplete(sender, instance, **kwargs):
+    # is_married супругов часто меняется через QuerySet.update() — перечитываем их из БД
+    if settings.USER_AUTOCOMPLETE_INDEX:
+        transaction.on_commit(partial(autocomplete.refresh_users, [instance.husband_id, instance.wife_id]))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Marriage)
+@receiver(post_delete, sender=Marriage)
+def invalidate_cards(sender, instance, update_fields=None, **kwargs):
+    # is_married меняется через QuerySet.update() вместе с сохранением брака — его сигнала достаточно
+    if sender is User and update_fields is not None and not CARD_FIELDS.intersection(update_fields):
+        return
+    # После коммита: раньше параллельное чтение закэшировало бы старые строки под новой версией.
+    # Вне транзакции on_commit выполняется сразу
+    transaction.on_commit(cards.invalidate_cards)
+
+
+@receiver(post_delete, sender=ApiToken)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Marriage)
+@receiver(post_delete, sender=Marriage)
+def invalidate_tokens(sender, instance, update_fields=None, **kwargs):
+    # Кэш токенов хранит пользователя целиком; вход по сессии меняет только last_login
+    if sender is User and update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    if sender is User:
+        user_ids = [instance.pk]
+    elif sender is Marriage:
+        user_ids = [instance.husband_id, instance.wife_id]
+    else:
+        user_ids = [instance.user_id]
+    # Сбрасываются только токены затронутых пользователей, остальные остаются в кэше (после коммита,
+    # как и карточки)
+    transaction.on_commit(partial(authentication.invalidate_tokens, user_ids))
+
+
+@receiver(post_save, sender=MarriageProposals)
+def proposal_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Принятие (accept_proposal) и отмена конкурирующих заявок (cancel_competing) идут мимо save()
+    # и публикуют события сами (отмена — через задачу publish_proposal_events)
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    events.proposal_changed(instance.pk, instance.sender_id, instance.receiver_id, instance.status)
+
+
+@receiver(post_delete, sender=ProfileCapture)
+def profile_capture_deleted(sender, instance, **kwargs):
+    path = os.path.join(profiling.profile_dir(), instance.file)
+    transaction.on_commit(partial(_remove_file, path))
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@receiver(post_migrate)
+def clear_cache(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Общий кэш переживает перезапуски: после миграций (и создания тестовой БД) его данные не к месту.
+    # Таблицу кэша в БД migrate создаёт сам — отдельный createcachetable при развёртывании не нужен
+    if sender.name == 'users':
+        call_command('createcachetable', database=using, verbosity=0)
+        cache.clear()
+
+
+def warm_autocomplete(sender, **kwargs):
+    request_started.disconnect(warm_autocomplete)
+    if settings.USER_AUTOCOMPLETE_INDEX:
+        autocomplete.warm()
+
+
+request_started.connect(warm_autocomplete)
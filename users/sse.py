@@ -0,0 +1,123 @@
+"""Поток Server-Sent Events по заявкам пользователя (api/offers/events/).
+
+Под ASGI путь обслуживает лёгкое приложение app, подключённое в marriage_site/asgi.py перед Django:
+открытый поток — это корутина и очередь подписки. Поток ОС на запрос, как у ASGIHandler Django,
+не заводится, соединение с БД нужно только для проверки сессии и сразу закрывается.
+Так воркер держит тысячи простаивающих соединений. Под runserver и в тестах тот же поток отдаёт
+async_views.ProposalEventsView.
+"""
+import asyncio
+import json
+from http.cookies import SimpleCookie
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import connection
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import NotAuthenticated
+
+from users import events
+
+RETRY_MS = 5000
+HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),  # nginx не буферизует ответ
+]
+
+
+def _keepalive():
+    return getattr(settings, 'EVENTS_KEEPALIVE', 20)
+
+
+def encode(event):
+    data = json.dumps(event, ensure_ascii=False)
+    return f'event: {event["type"]}\ndata: {data}\n\n'.encode()
+
+
+async def stream(user_id):
+    """Байты SSE: события заявок пользователя и комментарии-пинги, чтобы прокси не рвали соединение."""
+    queue = events.broker().subscribe(user_id)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'.encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), _keepalive())
+            except asyncio.TimeoutError:
+                yield b': keepalive\n\n'
+            else:
+                yield encode(event)
+    finally:
+        events.broker().unsubscribe(user_id, queue)
+
+
+class _SessionRequest:
+    """Минимум HttpRequest, который нужен django.contrib.auth.get_user."""
+
+    def __init__(self, session):
+        self.session = session
+
+
+def _authenticate(session_key):
+    try:
+        engine = import_string(f'{settings.SESSION_ENGINE}.SessionStore')
+        user = get_user(_SessionRequest(engine(session_key)))
+        return user.pk if user.is_authenticated else None
+    finally:
+        # Поток пула не должен держать соединение, пока клиент слушает поток
+        connection.close()
+
+
+def _session_key(scope):
+    cookie = SimpleCookie()
+    for name, value in scope['headers']:
+        if name == b'cookie':
+            cookie.load(value.decode('latin-1'))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    return morsel.value if morsel else None
+
+
+async def _disconnected(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def app(scope, receive, send):
+    session_key = _session_key(scope)
+    user_id = await sync_to_async(_authenticate, thread_sensitive=False)(session_key) if session_key else None
+    if user_id is None:
+        await send({'type': 'http.response.start', 'status': 403,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body',
+                    'body': json.dumps({'detail': str(NotAuthenticated.default_detail)}).encode()})
+        return
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': HEADERS})
+
+    async def pump():
+        async for chunk in stream(user_id):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(_disconnected(receive))]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()  # ошибка отправки (клиент ушёл) — в лог сервера
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def route(django_application):
+    """ASGI-приложение: поток событий — в app, остальное — в Django."""
+    path = reverse('proposal-events')
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == path and scope['method'] == 'GET':
+            return await app(scope, receive, send)
+        return await django_application(scope, receive, send)
+
+    return application
@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import os
+import posixpath
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:  # без пакета Brotli сжатые копии только .gz
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировок между процессами нет, только для разработки
+    fcntl = None
+
+COMPRESSIBLE = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.xml', '.html', '.ico', '.ttf', '.eot')
+MIN_SIZE = 256  # мельче выигрыш съедают заголовки
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """collectstatic пишет файлы с хэшем содержимого в имени (site.3f2a1b9c0d4e.css) и рядом сжатые
+    копии .gz и .br — nginx отдаёт их через gzip_static, не сжимая на каждый запрос."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = set()
+        for original, processed, changed in super().post_process(paths, dry_run, **options):
+            if processed and not isinstance(changed, Exception):
+                hashed.add(processed)
+            yield original, processed, changed
+        if not dry_run:
+            for name in sorted(hashed):
+                self.compress(name)
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE):
+            return
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < MIN_SIZE:
+            return
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+PHOTO_DIR = 'photos'
+EXTENSIONS = {'.jpeg': '.jpg', '.jpe': '.jpg', '.tif': '.tiff'}
+
+
+def content_digest(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(digest, original_name):
+    """photos/3f/3f2a…e1.jpg — имя определяется только содержимым (и типом файла)."""
+    ext = posixpath.splitext(original_name)[1].lower()
+    return f'{PHOTO_DIR}/{digest[:2]}/{digest}{EXTENSIONS.get(ext, ext)}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Фото пользователей по SHA-256 содержимого: одинаковые загрузки — один файл на диске.
+
+    Файл общий для всех пользователей с тем же фото, поэтому удаляет его только задача delete_photo,
+    когда в БД на него не осталось ссылок. Повторная загрузка обновляет время изменения файла —
+    по нему задача не трогает файл, который только что загрузили и ещё не сохранили в БД. Загрузка и
+    удаление берут блокировку каталога файла (lock), чтобы проверка и удаление не разошлись с загрузкой.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name  # имя выбирает _save по содержимому
+
+    @contextmanager
+    def lock(self, name):
+        """Эксклюзивная блокировка (flock) каталога photos/ab/, общая для процессов и потоков."""
+        if fcntl is None:
+            yield
+            return
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # закрытие снимает блокировку
+
+    def _save(self, name, content):
+        name = content_name(content_digest(content), name)
+        # Без блокировки delete_photo мог удалить файл между проверкой и обновлением времени ниже:
+        # пользователь сохранился бы со ссылкой на удалённый файл
+        with self.lock(name):
+            return self._write(name, content)
+
+    def _write(self, name, content):
+        path = self.path(name)
+        if os.path.exists(path):
+            os.utime(path)
+            return name
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Пишем во временный файл и переименовываем: читатели не увидят файл недописанным,
+        # а параллельная загрузка тех же байтов просто заменит его таким же
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            os.chmod(tmp, self.file_permissions_mode if self.file_permissions_mode is not None else 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return name
+
+    def recently_saved(self, name, seconds):
+        try:
+            return time.time() - os.path.getmtime(self.path(name)) < seconds
+        except FileNotFoundError:
+            return False
+
+
+photo_storage = ContentAddressedStorage()
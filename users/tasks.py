@@ -0,0 +1,54 @@
+from contextlib import nullcontext
+
+from django.conf import settings
+
+from users import events, thumbnails
+from users.jobs import task
+from users.models import ProfileCapture, User
+
+PHOTO_GRACE = getattr(settings, 'PHOTO_GRACE', 60 * 10)
+
+
+@task(priority=5)
+def generate_thumbnails(photo):
+    # Файл фото может быть общим с другими пользователями — готовые превью не пересчитываем
+    thumbnails.generate_thumbnails(photo, force=False)
+
+
+@task()
+def delete_thumbnails(photo):
+    thumbnails.delete_thumbnails(photo)
+
+
+@task()
+def delete_photo(photo):
+    """Удаляет файл фото с превью, если на него больше никто не ссылается.
+
+    Одинаковые фото хранятся одним файлом (ContentAddressedStorage), поэтому сначала проверяем ссылки.
+    Файл, который только что загрузили заново, откладываем: его пользователь мог ещё не сохраниться.
+    Повторная загрузка ждёт блокировку хранилища, пока идут проверки и удаление.
+    """
+    storage = User._meta.get_field('photo').storage
+    with storage.lock(photo) if hasattr(storage, 'lock') else nullcontext():
+        if User.objects.filter(photo=photo).exists():
+            return
+        if hasattr(storage, 'recently_saved') and storage.recently_saved(photo, PHOTO_GRACE):
+            delete_photo.delay(photo=photo, delay=PHOTO_GRACE)
+            return
+        thumbnails.delete_thumbnails(photo)
+        storage.delete(photo)
+
+
+@task(priority=10)
+def publish_proposal_events(proposals):
+    """Рассылает события об изменённых заявках: [[id, sender_id, receiver_id, status], ...]."""
+    for proposal_id, sender_id, receiver_id, status in proposals:
+        events.proposal_changed(proposal_id, sender_id, receiver_id, status)
+
+
+@task(priority=-10)
+def prune_profiles():
+    """Оставляет PROFILE_KEEP последних снимков профилировщика; файлы удаляет сигнал post_delete."""
+    keep = getattr(settings, 'PROFILE_KEEP', 500)
+    stale = ProfileCapture.objects.order_by('-created_at', '-id').values_list('pk', flat=True)[keep:]
+    ProfileCapture.objects.filter(pk__in=list(stale)).delete()
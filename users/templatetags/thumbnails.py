@@ -0,0 +1,26 @@
+from django import template
+
+from users.thumbnails import available_thumbnail_url, photo_url, thumbnail_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail(photo, size, ext='webp'):
+    return thumbnail_url(photo, size, ext)
+
+
+@register.inclusion_tag('users/includes/avatar.html')
+def avatar(photo, size, css_class='', alt='Аватар'):
+    """<picture> с WebP-превью и JPEG-запасным вариантом; photo — поле ImageField или имя файла.
+
+    Пока превью не нарезаны, выводится исходное фото.
+    """
+    # Превью берём с запасом под экраны с плотностью 2x
+    return {
+        'webp': available_thumbnail_url(photo, size * 2, 'webp'),
+        'src': photo_url(photo, size * 2, 'jpg'),
+        'size': size,
+        'css_class': css_class,
+        'alt': alt,
+    }
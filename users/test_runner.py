@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def plain_static():
+    """Статика без манифеста: collectstatic перед тестами и бенчмарком не запускают."""
+    return override_settings(STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._plain_static = plain_static()
+        self._plain_static.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._plain_static.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,7 @@
+from django.test import override_settings
+
+from users.benchmarks import MEMORY_CACHES
+
+# Общий кэш по умолчанию живёт в БД; тесты, которые считают запросы, подменяют его памятью,
+# чтобы счётчики говорили о SQL приложения, а не о кэше
+memory_cache = override_settings(CACHES=MEMORY_CACHES)
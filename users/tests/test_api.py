@@ -1,6 +1,10 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
 from django.urls import reverse
-from users.models import User, MarriageProposals, Marriage
+from users.models import ActiveCouple, User, MarriageProposals, Marriage
+from users.proposals import ProposalConflict, accept_proposal
+from users.tests import memory_cache
 
 
 class ProposalAPITest(APITestCase):
@@ -35,9 +39,126 @@ class ProposalAPITest(APITestCase):
         self.client.force_login(self.user1)
         response = self.client.get(url, {'q': 'Мария'})
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(any(u['username'] == 'user2' for u in response.data))
+        self.assertTrue(any(u['username'] == 'user2' for u in response.json()))
 
+    def test_user_autocomplete_skips_married(self):
+        self.user2.first_name = 'Мария'
+        self.user2.is_married = True
+        self.user2.save()
+        response = self.client.get(reverse('user-autocomplete'), {'q': 'Мар'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(u['username'] == 'user2' for u in response.json()))
+
+
+class CandidatesAPITest(APITestCase):
+    def setUp(self):
+        self.man = User.objects.create_user(username='man', password='pass', gender=User.Gender.MAN)
+        self.free = User.objects.create_user(username='free', password='pass', gender=User.Gender.WOMAN)
+        self.busy = User.objects.create_user(username='busy', password='pass', gender=User.Gender.WOMAN)
+        self.married = User.objects.create_user(
+            username='married', password='pass', gender=User.Gender.WOMAN, is_married=True
+        )
+        User.objects.create_user(username='other_man', password='pass', gender=User.Gender.MAN)
+        MarriageProposals.objects.create(
+            sender=User.objects.create_user(username='suitor', password='pass', gender=User.Gender.MAN),
+            receiver=self.busy,
+        )
+        self.client.force_login(self.man)
+
+    def test_only_free_opposite_gender_without_pending_proposals(self):
+        response = self.client.get(reverse('user-candidates'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([u['username'] for u in response.data['results']], ['free'])
+
+
+class OffersAPIPaginationTest(APITestCase):
+    def setUp(self):
+        self.receiver = User.objects.create_user(
+            username='receiver', password='pass', gender=User.Gender.WOMAN
+        )
+        self.proposals = [
+            MarriageProposals.objects.create(
+                sender=User.objects.create_user(username=f'sender{i}', password='pass', gender=User.Gender.MAN),
+                receiver=self.receiver,
+            )
+            for i in range(5)
+        ]
+        self.client.force_login(self.receiver)
+
+    def test_pages_follow_cursor_without_gaps(self):
+        seen = []
+        next_url = reverse('offers-list-api') + '?page_size=2'
+        while next_url:
+            response = self.client.get(next_url)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page['results']), 2)
+            seen.extend(item['id'] for item in page['results'])
+            next_url = page['next']
+        self.assertEqual(seen, [p.pk for p in reversed(self.proposals)])
+
+    def test_deep_cursor_bounds_leading_field(self):
+        first = self.client.get(reverse('offers-list-api'), {'page_size': 2}).json()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(first['next'])
+        self.assertEqual(response.status_code, 200)
+        sql = [query['sql'] for query in captured if 'users_marriageproposals' in query['sql']]
+        self.assertEqual(len(sql), 1)
+        # Граница по created_at стоит вне OR — её БД берёт диапазоном индекса, а не читает его с начала
+        self.assertRegex(sql[0], r'WHERE .*"created_at" <= [^()]+ AND \(')
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('offers-list-api'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+@memory_cache
+class AcceptProposalTest(APITestCase):
+    def setUp(self):
+        self.man = User.objects.create_user(username='man', password='pass', gender=User.Gender.MAN,
+                                            first_name='Иван', last_name='Иванов')
+        self.woman = User.objects.create_user(username='woman', password='pass', gender=User.Gender.WOMAN,
+                                              first_name='Анна', last_name='Петрова')
+        self.proposal = MarriageProposals.objects.create(sender=self.man, receiver=self.woman)
+        self.url = reverse('offers-api', args=[self.proposal.pk])
+        self.client.force_login(self.woman)
 
+    def test_accept(self):
+        # SAVEPOINT, UPDATE заявки, UPDATE супругов, INSERT брака, UPSERT витрины, INSERT задачи, RELEASE
+        with self.assertNumQueries(7):
+            accept_proposal(self.proposal.pk, self.woman.pk)
+
+        marriage = Marriage.objects.get()
+        self.assertEqual((marriage.husband, marriage.wife), (self.man, self.woman))
+        self.assertEqual(marriage.couple.wife_last_name, 'Петрова')
+        self.assertEqual(User.objects.filter(is_married=True).count(), 2)
+        self.proposal.refresh_from_db()
+        self.assertEqual(self.proposal.status, MarriageProposals.Status.COMPLETE)
+
+    def test_accept_via_api(self):
+        response = self.client.patch(self.url, {'status': MarriageProposals.Status.COMPLETE})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], MarriageProposals.Status.COMPLETE)
+        self.assertTrue(Marriage.objects.filter(husband=self.man, wife=self.woman).exists())
+
+    def test_lost_race_is_conflict(self):
+        rival = User.objects.create_user(username='rival', password='pass', gender=User.Gender.WOMAN)
+        Marriage.objects.create(husband=self.man, wife=rival)
+        User.objects.filter(pk__in=[self.man.pk, rival.pk]).update(is_married=True)
+
+        response = self.client.patch(self.url, {'status': MarriageProposals.Status.COMPLETE})
+        self.assertEqual(response.status_code, 409)
+        self.proposal.refresh_from_db()
+        self.assertEqual(self.proposal.status, MarriageProposals.Status.WAITING)
+        self.woman.refresh_from_db()
+        self.assertFalse(self.woman.is_married)
+
+    def test_only_receiver_accepts(self):
+        with self.assertRaises(ProposalConflict):
+            accept_proposal(self.proposal.pk, self.man.pk)
+
+
+@memory_cache
 class DivorceAPITest(APITestCase):
     def setUp(self):
         self.user1 = User.objects.create_user(
@@ -53,3 +174,52 @@ class DivorceAPITest(APITestCase):
         url = reverse('divorce-api')
         response = self.client.patch(url, {})
         self.assertIn(response.status_code, [200, 405])  # 405 если не реализован PATCH
+
+    def test_divorce_query_budget(self):
+        self.client.force_authenticate(self.user1)
+        # SELECT брака, SAVEPOINT, UPDATE супругов, UPDATE брака, DELETE из ActiveCouple, RELEASE
+        with self.assertNumQueries(6):
+            response = self.client.patch(reverse('divorce-api'), {})
+        self.assertEqual(response.status_code, 200)
+
+        self.marriage.refresh_from_db()
+        self.assertEqual(self.marriage.status, Marriage.Status.DIVORCED)
+        self.assertFalse(User.objects.filter(is_married=True).exists())
+        self.assertFalse(ActiveCouple.objects.exists())
+
+    def test_divorce_without_marriage(self):
+        self.client.force_authenticate(self.user1)
+        self.client.patch(reverse('divorce-api'), {})
+        response = self.client.patch(reverse('divorce-api'), {})
+        self.assertEqual(response.status_code, 404)
+
+
+class MarriagesAPITest(APITestCase):
+    def setUp(self):
+        self.man = User.objects.create_user(username='man', password='pass', gender=User.Gender.MAN)
+        self.first_wife = User.objects.create_user(
+            username='first', password='pass', gender=User.Gender.WOMAN, first_name='Анна', last_name='Первая'
+        )
+        self.second_wife = User.objects.create_user(
+            username='second', password='pass', gender=User.Gender.WOMAN, first_name='Ольга', last_name='Вторая'
+        )
+        Marriage.objects.create(husband=self.man, wife=self.first_wife, status=Marriage.Status.DIVORCED)
+        self.active = Marriage.objects.create(husband=self.man, wife=self.second_wife)
+        self.client.force_login(self.man)
+
+    def test_history_is_newest_first(self):
+        response = self.client.get(reverse('marriages-api'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([m['partner_name'] for m in response.data['results']], ['Ольга Вторая', 'Анна Первая'])
+        self.assertTrue(response.data['results'][0]['is_active'])
+        self.assertIsNotNone(response.data['results'][1]['ended_at'])
+
+    def test_history_seen_from_wife(self):
+        self.client.force_login(self.first_wife)
+        response = self.client.get(reverse('marriages-api'))
+        self.assertEqual([m['partner_id'] for m in response.data['results']], [self.man.pk])
+
+    def test_foreign_history_requires_staff(self):
+        response = self.client.get(reverse('marriages-api'), {'user': self.first_wife.pk})
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,109 @@
+import base64
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from users import metrics, profiling
+from users.autocomplete import engine as autocomplete
+from users.models import Marriage, MarriageProposals, ProfileCapture, User
+from users.tests import memory_cache
+
+
+@memory_cache
+class AsyncViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.man = User.objects.create_user(username='man', password='x', gender=User.Gender.MAN,
+                                           first_name='Иван', last_name='Иванов')
+        cls.woman = User.objects.create_user(username='woman', password='x', gender=User.Gender.WOMAN,
+                                             first_name='Мария', last_name='Петрова')
+        cls.proposals = [
+            MarriageProposals.objects.create(
+                sender=User.objects.create_user(username=f'sender{i}', password='x', gender=User.Gender.MAN),
+                receiver=cls.woman,
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        metrics.registry = metrics.Registry()
+
+    async def test_autocomplete_requires_login(self):
+        response = await self.async_client.get(reverse('user-autocomplete'), {'q': 'Мар'})
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('detail', response.json())
+
+    async def test_autocomplete(self):
+        await self.async_client.aforce_login(self.man)
+        response = await self.async_client.get(reverse('user-autocomplete'), {'q': 'Мар'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['username'] for user in response.json()], ['woman'])
+
+    async def test_autocomplete_photo_url_same_for_index_and_database(self):
+        await User.objects.filter(pk=self.woman.pk).aupdate(photo='photos/ab/maria.jpg')
+        await self.async_client.aforce_login(self.man)
+        from_db = (await self.async_client.get(reverse('user-autocomplete'), {'q': 'Мар'})).json()
+        with override_settings(USER_AUTOCOMPLETE_INDEX=True):
+            await sync_to_async(autocomplete.build)()
+            from_index = (await self.async_client.get(reverse('user-autocomplete'), {'q': 'Мар'})).json()
+        self.assertEqual(from_index, from_db)
+        self.assertEqual(from_db[0]['photo'], 'http://testserver/media/photos/ab/maria.jpg')
+
+    async def test_basic_auth(self):
+        credentials = base64.b64encode(b'man:x').decode()
+        response = await self.async_client.get(
+            reverse('user-autocomplete'), {'q': 'Мар'}, headers={'Authorization': f'Basic {credentials}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(
+            reverse('user-autocomplete'), {'q': 'Мар'}, headers={'Authorization': 'Basic bm9wZTpub3Bl'}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    async def test_offers_pages_and_query_metrics(self):
+        await self.async_client.aforce_login(self.woman)
+        seen = []
+        url = reverse('offers-list-api') + '?page_size=2'
+        while url:
+            page = (await self.async_client.get(url)).json()
+            seen.extend(item['id'] for item in page['results'])
+            url = page['next']
+        self.assertEqual(seen, [proposal.pk for proposal in reversed(self.proposals)])
+
+        # SQL выполняется в потоке sync_to_async, но попадает в метрики запроса
+        _, histograms = metrics.collect()
+        queries = histograms[('db_queries_per_request', (('view', 'offers-list-api'), ('method', 'GET')))]
+        self.assertEqual(queries[-1], 2)
+        self.assertGreater(queries[-2], 0)
+
+    async def test_invalid_cursor(self):
+        await self.async_client.aforce_login(self.woman)
+        response = await self.async_client.get(reverse('offers-list-api'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Неверный курсор'})
+
+    async def test_newlyweds_feed_is_public(self):
+        await sync_to_async(self._marry)()
+        response = await self.async_client.get(reverse('newlyweds-api'))
+        self.assertEqual(response.status_code, 200)
+        [couple] = response.json()
+        self.assertEqual(couple['husband']['first_name'], 'Иван')
+        self.assertEqual(couple['wife']['id'], self.woman.pk)
+        self.assertTrue(couple['wife']['photo'])
+
+    def _marry(self):
+        User.objects.filter(pk__in=[self.man.pk, self.woman.pk]).update(is_married=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Marriage.objects.create(husband=self.man, wife=self.woman)
+
+    async def test_profiling_under_async(self):
+        await self.async_client.aforce_login(self.woman)
+        with tempfile.TemporaryDirectory() as directory, override_settings(PROFILE_DIR=directory):
+            response = await self.async_client.get(
+                reverse('offers-list-api'), headers={profiling.TOKEN_HEADER: profiling.make_token()}
+            )
+        capture = await ProfileCapture.objects.aget(pk=response['X-Profile-Id'])
+        self.assertEqual(capture.view, 'offers-list-api')
+        self.assertGreater(capture.queries, 0)
@@ -0,0 +1,126 @@
+import importlib
+from datetime import UTC, datetime
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection, models
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import isolate_apps
+from django.urls import reverse
+
+from users import authentication
+from users.models import ApiToken, User
+from users.tests import memory_cache
+
+
+@memory_cache
+class TokenAuthenticationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='mobile', password='secret', gender=User.Gender.MAN)
+
+    def setUp(self):
+        cache.clear()
+        authentication.users.clear()
+
+    def _get(self, key, name='marriages-api'):
+        return self.client.get(reverse(name), HTTP_AUTHORIZATION=f'Token {key}')
+
+    def test_issue_stores_only_digest(self):
+        response = self.client.post(reverse('api-token-auth'), {'username': 'mobile', 'password': 'secret'})
+        self.assertEqual(response.status_code, 201)
+        key = response.json()['token']
+        token = ApiToken.objects.get(user=self.user)
+        self.assertEqual(token.digest, ApiToken.make_digest(key))
+        self.assertNotEqual(token.digest, key)
+
+        response = self.client.post(reverse('api-token-auth'), {'username': 'mobile', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cached_after_first_call(self):
+        _, key = ApiToken.issue(self.user)
+        with self.assertNumQueries(3):  # владелец ключа, токен с пользователем, история браков
+            self.assertEqual(self._get(key).status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get(key).status_code, 200)
+
+    def test_other_users_changes_keep_cache(self):
+        _, key = ApiToken.issue(self.user)
+        self.assertEqual(self._get(key).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            other = User.objects.create_user(username='other', password='x', gender=User.Gender.WOMAN)
+            other.first_name = 'Анна'
+            other.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get(key).status_code, 200)
+
+        self.user.first_name = 'Иван'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertNumQueries(2):
+            self.assertEqual(self._get(key).status_code, 200)
+
+    def test_invalid_token(self):
+        response = self._get('nope')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(authentication.users), 0)
+
+    def test_revoke(self):
+        _, key = ApiToken.issue(self.user)
+        self.assertEqual(self._get(key).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('api-token-auth'), HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self._get(key).status_code, 403)
+
+    def test_deactivated_user(self):
+        _, key = ApiToken.issue(self.user)
+        self.assertEqual(self._get(key).status_code, 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['is_active'])
+        self.assertEqual(self._get(key).status_code, 403)
+
+    def test_async_view(self):
+        _, key = ApiToken.issue(self.user)
+        response = self._get(key, 'offers-list-api')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+
+class LegacyAuthtokenMigrationTest(TransactionTestCase):
+    """0014 переносит ключи rest_framework.authtoken в ApiToken и удаляет старую таблицу."""
+
+    @isolate_apps('users')
+    def test_keys_copied_and_table_dropped(self):
+        user = User.objects.create_user(username='mobile', password='secret', gender=User.Gender.MAN)
+
+        class LegacyToken(models.Model):
+            key = models.CharField(max_length=40, primary_key=True)
+            user = models.ForeignKey(User, on_delete=models.CASCADE)
+            created = models.DateTimeField()
+
+            class Meta:
+                app_label = 'users'
+                db_table = 'authtoken_token'
+
+        with connection.schema_editor() as schema_editor:
+            schema_editor.create_model(LegacyToken)
+        self.addCleanup(self._drop_legacy_table)
+        LegacyToken.objects.create(key='legacy', user=user, created=datetime(2025, 8, 2, tzinfo=UTC))
+
+        migration = importlib.import_module('users.migrations.0014_copy_authtoken_keys')
+        with connection.schema_editor() as schema_editor:
+            migration.copy_keys(apps, schema_editor)
+
+        token = ApiToken.objects.get()
+        self.assertEqual(token.digest, ApiToken.make_digest('legacy'))
+        self.assertEqual(token.created_at, datetime(2025, 8, 2, tzinfo=UTC))
+        self.assertNotIn('authtoken_token', connection.introspection.table_names())
+        self.assertEqual(self.client.get(reverse('marriages-api'), HTTP_AUTHORIZATION='Token legacy').status_code, 200)
+        user.delete()  # внешний ключ старой таблицы больше не мешает
+
+    def _drop_legacy_table(self):
+        if 'authtoken_token' in connection.introspection.table_names():
+            with connection.cursor() as cursor:
+                cursor.execute('DROP TABLE authtoken_token')
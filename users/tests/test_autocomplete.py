@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from users.autocomplete import VERSION_KEY, AutocompleteEngine, PrefixIndex, _change_key, engine
+from users.models import User, Marriage
+from users.tests import memory_cache
+
+
+class PrefixIndexTest(TestCase):
+    def setUp(self):
+        self.index = PrefixIndex.build([
+            (1, 'fedor', 'Фёдор', 'Иванов', ''),
+            (2, 'ivan', 'Иван', 'Петров', 'photos/ivan.jpg'),
+            (3, 'anna', 'Анна', 'Иванова', ''),
+        ])
+
+    def test_prefix_is_case_and_yo_insensitive(self):
+        self.assertEqual([pk for pk, _ in self.index.search('ФЕД', 10)], [1])
+        self.assertEqual([pk for pk, _ in self.index.search('федор', 10)], [1])
+
+    def test_matches_first_last_and_full_name(self):
+        self.assertEqual({pk for pk, _ in self.index.search('иван', 10)}, {1, 2, 3})
+        self.assertEqual([pk for pk, _ in self.index.search('иван пе', 10)], [2])
+
+    def test_remove_and_add(self):
+        self.index.remove(2)
+        self.assertEqual({pk for pk, _ in self.index.search('иван', 10)}, {1, 3})
+        self.index.add(2, 'ivan', 'Иван', 'Сидоров', '')
+        self.assertEqual([pk for pk, _ in self.index.search('сид', 10)], [2])
+
+
+@memory_cache
+@override_settings(USER_AUTOCOMPLETE_INDEX=True)
+class AutocompleteEngineTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.man = User.objects.create_user(
+            username='ivan', password='pass', gender=User.Gender.MAN, first_name='Иван', last_name='Иванов'
+        )
+        self.woman = User.objects.create_user(
+            username='maria', password='pass', gender=User.Gender.WOMAN, first_name='Мария', last_name='Петрова'
+        )
+        engine.build()
+        self.client.force_login(self.man)
+
+    def test_search_without_queries(self):
+        with self.assertNumQueries(0):
+            found = engine.search('мар', 10)
+        self.assertEqual([user['username'] for user in found], ['maria'])
+
+    def test_marriage_removes_both_partners(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk__in=[self.man.pk, self.woman.pk]).update(is_married=True)
+            Marriage.objects.create(husband=self.man, wife=self.woman)
+        self.assertEqual(engine.search('мар', 10), [])
+
+    def test_stale_index_falls_back_to_database(self):
+        engine.mark_stale()
+        with mock.patch.object(engine, 'warm') as warm:
+            response = self.client.get(reverse('user-autocomplete'), {'q': 'Мар'})
+        warm.assert_called()  # первый запрос процесса ещё и прогревает индекс через request_started
+        self.assertEqual([user['username'] for user in response.json()], ['maria'])
+
+    def test_other_process_replays_changes(self):
+        other = AutocompleteEngine()  # индекс соседнего процесса
+        other.build()
+        index = other._index
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(
+                username='marina', password='pass', gender=User.Gender.WOMAN, first_name='Марина', last_name='Котова'
+            )
+            self.woman.first_name = 'Ольга'
+            self.woman.save()
+
+        with self.assertNumQueries(0):
+            found = other.search('мар', 10)
+        self.assertEqual([user['username'] for user in found], ['marina'])
+        self.assertIs(other._index, index)  # применили журнал, а не пересобрали
+
+    def test_gap_in_log_rebuilds(self):
+        other = AutocompleteEngine()
+        other.build()
+        engine.remove(self.woman.pk)
+        cache.clear()  # запись журнала вытеснена
+        engine.mark_stale()
+        with mock.patch.object(other, 'warm') as warm:
+            self.assertIsNone(other.search('мар', 10))
+        warm.assert_called_once()
+
+    def test_taken_change_number_leaves_gap(self):
+        other = AutocompleteEngine()
+        other.build()
+        # Номер изменения достался и другому процессу (неатомарный incr) — запись в журнале уже чужая
+        cache.set(_change_key(cache.get(VERSION_KEY) + 1), [], None)
+        engine.remove(self.woman.pk)
+        with mock.patch.object(other, 'warm') as warm:
+            self.assertIsNone(other.search('мар', 10))
+        warm.assert_called_once()
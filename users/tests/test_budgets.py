@@ -0,0 +1,25 @@
+from django.test import TestCase
+
+from users import benchmarks
+from users.tests import memory_cache
+
+
+@memory_cache
+class QueryBudgetTest(TestCase):
+    """Число запросов каждого эндпоинта не превышает users/bench_budgets.json (обновляется bench_endpoints)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.actors = benchmarks.seed()
+
+    def test_every_endpoint_is_budgeted(self):
+        names = {name for name, *_ in benchmarks.endpoints(self.actors)}
+        self.assertEqual(names, set(benchmarks.load_budgets()))
+
+    def test_query_budgets(self):
+        results = benchmarks.measure(self.actors, iterations=2)
+        self.assertEqual(benchmarks.check(results, benchmarks.load_budgets(), latency=False), [])
+        for name, result in results.items():
+            self.assertTrue(all(code < 500 for code in result['status']), name)
+        # Замеряется настоящее удаление, а не ответ 400 «нет фото»
+        self.assertEqual(results['delete_photo']['status'], [200])
@@ -0,0 +1,122 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from users import authentication, cards
+from users.cache import LocalCache, TwoTierCache
+from users.tests import memory_cache
+from users.models import Marriage, MarriageProposals, User
+
+
+class LocalCacheTest(TestCase):
+    def test_lru_eviction(self):
+        local = LocalCache(maxsize=2, ttl=60)
+        local.set_many({'a': 1, 'b': 2})
+        local.get_many(['a'])
+        local.set_many({'c': 3})
+        self.assertEqual(local.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+    def test_ttl(self):
+        local = LocalCache(maxsize=10, ttl=5)
+        with mock.patch('users.cache.time.monotonic', return_value=100):
+            local.set_many({'a': 1})
+        with mock.patch('users.cache.time.monotonic', return_value=104):
+            self.assertEqual(local.get_many(['a']), {'a': 1})
+        with mock.patch('users.cache.time.monotonic', return_value=106):
+            self.assertEqual(local.get_many(['a']), {})
+        self.assertEqual(len(local), 0)
+
+
+class TwoTierCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = TwoTierCache(ttl=60)
+
+    def test_local_tier_in_front_of_shared(self):
+        cache.set_many({'x': 1, 'y': 2})
+        self.assertEqual(self.store.get_many(['x', 'y', 'z']), {'x': 1, 'y': 2})
+        cache.clear()
+        # Повторное чтение не ходит в общий кэш
+        self.assertEqual(self.store.get_many(['x', 'y']), {'x': 1, 'y': 2})
+
+    def test_version_bump_is_shared(self):
+        version = self.store.version('things')
+        other = TwoTierCache(ttl=0)  # другой процесс без локальной копии
+        self.assertEqual(other.version('things'), version)
+        bumped = self.store.bump('things')
+        self.assertNotEqual(bumped, version)
+        self.assertEqual(self.store.version('things'), bumped)
+        self.assertEqual(other.version('things'), bumped)
+
+
+@memory_cache
+class CardsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.man = User.objects.create_user(username='man', password='x', gender=User.Gender.MAN,
+                                           first_name='Иван', last_name='Иванов', photo='photos/man.jpg')
+        cls.woman = User.objects.create_user(username='woman', password='x', gender=User.Gender.WOMAN)
+
+    def setUp(self):
+        cache.clear()
+        cards.store.local.clear()
+
+    def test_batch_and_cached(self):
+        with self.assertNumQueries(1):
+            found = cards.get_cards([self.man.pk, self.woman.pk, self.man.pk])
+        self.assertEqual(found[self.man.pk]['full_name'], 'Иван Иванов')
+        self.assertEqual(found[self.man.pk]['photo'], 'photos/man.jpg')
+        self.assertTrue(found[self.man.pk]['avatar'].endswith('photos/man.jpg'))
+        self.assertEqual(found[self.woman.pk]['full_name'], 'woman')  # без имени — логин
+        self.assertTrue(found[self.woman.pk]['avatar'].endswith('users/default.png'))
+
+        cards.store.local.clear()  # другой процесс: только общий кэш
+        with self.assertNumQueries(0):
+            self.assertEqual(cards.get_cards([self.man.pk, self.woman.pk]), found)
+
+    def test_user_write_invalidates(self):
+        cards.get_cards([self.man.pk])
+        self.man.first_name = 'Пётр'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.man.save()
+        self.assertEqual(cards.get_card(self.man.pk)['full_name'], 'Пётр Иванов')
+
+        # Вход меняет только last_login — карточки остаются в кэше
+        version = cards.store.version(cards.VERSION)
+        self.client.force_login(self.man)
+        self.assertEqual(cards.store.version(cards.VERSION), version)
+
+    def test_marriage_invalidates(self):
+        self.assertFalse(cards.get_card(self.woman.pk)['is_married'])
+        User.objects.filter(pk__in=[self.man.pk, self.woman.pk]).update(is_married=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Marriage.objects.create(husband=self.man, wife=self.woman)
+        self.assertTrue(cards.get_card(self.woman.pk)['is_married'])
+
+    def test_admin_divorce_invalidates(self):
+        User.objects.filter(pk__in=[self.man.pk, self.woman.pk]).update(is_married=True)
+        marriage = Marriage.objects.create(husband=self.man, wife=self.woman)
+        self.assertTrue(cards.get_card(self.woman.pk)['is_married'])
+        token_version = authentication.versions.version(f'{authentication.VERSION}:{self.woman.pk}')
+
+        admin = User.objects.create_superuser(username='admin', password='x', email='admin@example.com',
+                                              gender=User.Gender.MAN)
+        self.client.force_login(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:users_marriage_changelist'),
+                             {'action': 'set_divorced', '_selected_action': [marriage.pk]})
+        self.assertFalse(cards.get_card(self.woman.pk)['is_married'])
+        self.assertNotEqual(
+            authentication.versions.version(f'{authentication.VERSION}:{self.woman.pk}'), token_version
+        )
+
+    def test_offers_page(self):
+        MarriageProposals.objects.create(sender=self.man, receiver=self.woman)
+        self.client.force_login(self.woman)
+        response = self.client.get(reverse('offers-list'))
+        self.assertEqual([offer.person['full_name'] for offer in response.context['offers_incoming']],
+                         ['Иван Иванов'])
+        self.assertEqual(response.context['offers_outgoing'], [])
+        self.assertContains(response, 'Иван Иванов')
@@ -0,0 +1,159 @@
+import asyncio
+import json
+from contextlib import suppress
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from users import events, jobs, sse
+from users.models import MarriageProposals, User
+from users.proposals import accept_proposal
+from users.tests import memory_cache
+
+
+def _parse(chunk):
+    fields = dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+@memory_cache
+class ProposalEventsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.man = User.objects.create_user(username='man', password='x', gender=User.Gender.MAN)
+        cls.woman = User.objects.create_user(username='woman', password='x', gender=User.Gender.WOMAN)
+        cls.rival = User.objects.create_user(username='rival', password='x', gender=User.Gender.MAN)
+
+    def setUp(self):
+        events._broker = events.LocalBroker()
+
+    def _propose(self, sender):
+        with self.captureOnCommitCallbacks(execute=True):
+            return MarriageProposals.objects.create(sender=sender, receiver=self.woman)
+
+    def _accept(self, proposal):
+        with self.captureOnCommitCallbacks(execute=True):
+            accept_proposal(proposal.pk, self.woman.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.run_pending()  # события об отменённых заявках рассылает воркер
+
+    async def _next(self, queue):
+        return await asyncio.wait_for(queue.get(), 1)
+
+    async def test_sender_and_receiver_are_notified(self):
+        broker = events.broker()
+        to_woman, to_rival = broker.subscribe(self.woman.pk), broker.subscribe(self.rival.pk)
+        proposal = await sync_to_async(self._propose)(self.man)
+        rival = await sync_to_async(self._propose)(self.rival)
+
+        created = await self._next(to_woman)
+        self.assertEqual(created, {'type': 'proposal.created', 'id': proposal.pk, 'sender': self.man.pk,
+                                   'receiver': self.woman.pk, 'status': MarriageProposals.Status.WAITING})
+        self.assertEqual((await self._next(to_woman))['id'], rival.pk)
+        self.assertEqual((await self._next(to_rival))['id'], rival.pk)
+
+        await sync_to_async(self._accept)(proposal)
+        self.assertEqual((await self._next(to_woman))['type'], 'proposal.accepted')
+        # Конкурирующую заявку отменила задача — об этом узнают оба её участника
+        self.assertEqual((await self._next(to_woman))['type'], 'proposal.canceled')
+        self.assertEqual(await self._next(to_rival), {
+            'type': 'proposal.canceled', 'id': rival.pk, 'sender': self.rival.pk,
+            'receiver': self.woman.pk, 'status': MarriageProposals.Status.CANCELED,
+        })
+
+        broker.unsubscribe(self.woman.pk, to_woman)
+        broker.unsubscribe(self.rival.pk, to_rival)
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    async def test_rolled_back_proposal_is_not_published(self):
+        queue = events.broker().subscribe(self.woman.pk)
+        await sync_to_async(self._propose_and_roll_back)()
+        self.assertTrue(queue.empty())
+
+    def _propose_and_roll_back(self):
+        with self.captureOnCommitCallbacks(execute=True), suppress(RuntimeError), transaction.atomic():
+            MarriageProposals.objects.create(sender=self.man, receiver=self.woman)
+            raise RuntimeError
+
+    async def test_stream_view(self):
+        response = await self.async_client.get(reverse('proposal-events'))
+        self.assertEqual(response.status_code, 403)
+
+        await self.async_client.aforce_login(self.woman)
+        response = await self.async_client.get(reverse('proposal-events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+
+        reading = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)  # поток подписался
+        proposal = await sync_to_async(self._propose)(self.man)
+        event, data = _parse(await asyncio.wait_for(reading, 1))
+        self.assertEqual(event, 'proposal.created')
+        self.assertEqual(data['id'], proposal.pk)
+
+        # Так ASGIHandler обрывает поток при отключении клиента
+        reading = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        reading.cancel()
+        with suppress(asyncio.CancelledError):
+            await reading
+        self.assertEqual(events.broker().subscriber_count(), 0)
+
+    @override_settings(EVENTS_KEEPALIVE=0.01)
+    async def test_keepalive(self):
+        chunks = sse.stream(self.woman.pk)
+        await anext(chunks)
+        self.assertEqual(await anext(chunks), b': keepalive\n\n')
+        await chunks.aclose()
+
+
+@memory_cache
+class EventsAppTest(TransactionTestCase):
+    """sse.app проверяет сессию в отдельном потоке — данные должны быть закоммичены."""
+
+    def setUp(self):
+        events._broker = events.LocalBroker()
+        self.woman = User.objects.create_user(username='woman', password='x', gender=User.Gender.WOMAN)
+
+    async def _call(self, cookie=None):
+        scope = {'type': 'http', 'method': 'GET', 'path': reverse('proposal-events'),
+                 'headers': [(b'cookie', cookie.encode())] if cookie else []}
+        disconnect = asyncio.Event()
+        sent = asyncio.Queue()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        task = asyncio.ensure_future(sse.app(scope, receive, sent.put))
+        return task, sent, disconnect
+
+    async def test_anonymous(self):
+        task, sent, _ = await self._call()
+        await task
+        self.assertEqual((await sent.get())['status'], 403)
+        self.assertIn('detail', json.loads((await sent.get())['body']))
+
+    async def test_stream_until_disconnect(self):
+        await self.async_client.aforce_login(self.woman)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.async_client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        task, sent, disconnect = await self._call(cookie)
+
+        start = await asyncio.wait_for(sent.get(), 5)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream; charset=utf-8'), start['headers'])
+        self.assertEqual((await sent.get())['body'], b'retry: 5000\n\n')
+
+        events.broker().dispatch({'type': 'proposal.created', 'id': 1, 'sender': 2,
+                                  'receiver': self.woman.pk, 'status': 0})
+        message = await asyncio.wait_for(sent.get(), 1)
+        self.assertTrue(message['more_body'])
+        self.assertEqual(_parse(message['body'])[1]['id'], 1)
+
+        disconnect.set()
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(events.broker().subscriber_count(), 0)
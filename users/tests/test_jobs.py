@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users import jobs
+from users.models import Job, MarriageProposals, User
+
+calls = []
+
+
+@jobs.task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@jobs.task(name='tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_priority_and_schedule(self):
+        record.delay(value='low')
+        jobs.enqueue(record, priority=10, value='high')
+        record.delay(value='later', delay=60)
+
+        self.assertEqual(jobs.run_pending(), 2)
+        self.assertEqual(calls, ['high', 'low'])
+        self.assertEqual(Job.objects.get(payload__value='later').status, Job.Status.QUEUED)
+
+    def test_failed_job_is_retried_then_given_up(self):
+        job = explode.delay()
+        with self.assertLogs('users.jobs', 'WARNING'):
+            self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('users.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_stale_running_job_is_released(self):
+        job = record.delay(value='x')
+        jobs.claim()
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.release_stale(), 1)
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(calls, ['x'])
+
+    def test_claim_touches_updated_at(self):
+        job = record.delay(value='x')
+        Job.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        claimed, = jobs.claim()
+        job.refresh_from_db()
+        self.assertEqual(job.updated_at, claimed.locked_at)
+
+    def test_stale_job_out_of_attempts_fails(self):
+        job = explode.delay()  # max_attempts=2: оба раза воркер «упал» посреди задачи
+        jobs.claim()
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.release_stale(), 1)
+
+        jobs.claim()
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('users.jobs', 'ERROR'):
+            self.assertEqual(jobs.release_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNone(job.locked_at)
+        self.assertEqual(jobs.run_pending(), 0)
+
+
+class AcceptOfferTest(APITestCase):
+    def test_competing_proposals_are_cancelled_with_acceptance(self):
+        man = User.objects.create_user(username='man', password='pass', gender=User.Gender.MAN)
+        woman = User.objects.create_user(username='woman', password='pass', gender=User.Gender.WOMAN)
+        rival = User.objects.create_user(username='rival', password='pass', gender=User.Gender.WOMAN)
+        proposal = MarriageProposals.objects.create(sender=man, receiver=woman)
+        competing = MarriageProposals.objects.create(sender=rival, receiver=man)
+
+        self.client.force_login(woman)
+        response = self.client.patch(
+            reverse('offers-api', args=[proposal.pk]), {'status': MarriageProposals.Status.COMPLETE}
+        )
+        self.assertEqual(response.status_code, 200)
+        # Отмена — в той же транзакции, воркеру остаются только события
+        competing.refresh_from_db()
+        self.assertEqual(competing.status, MarriageProposals.Status.CANCELED)
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['users.tasks.publish_proposal_events'])
+
+        # Даже если заявку вернуть в ожидание, принять её нельзя — супруг уже в браке
+        self.client.force_login(man)
+        competing.status = MarriageProposals.Status.WAITING
+        competing.save()
+        response = self.client.patch(
+            reverse('offers-api', args=[competing.pk]), {'status': MarriageProposals.Status.COMPLETE}
+        )
+        self.assertEqual(response.status_code, 409)
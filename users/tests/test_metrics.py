@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from users import metrics
+from users.models import User
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.registry = metrics.Registry()
+
+    def test_request_is_recorded_per_view(self):
+        self.client.force_login(User.objects.create_user(username='viewer', password='x', gender=User.Gender.MAN))
+        self.client.get(reverse('marriages-list'))
+        self.client.get(reverse('marriages-list'))
+
+        counters, histograms = metrics.collect()
+        labels = (('view', 'marriages-list'), ('method', 'GET'))
+        self.assertEqual(counters[('http_requests_total', labels + (('status', 200),))], 2)
+        self.assertEqual(histograms[('http_request_duration_seconds', labels)][-1], 2)
+        self.assertGreater(histograms[('db_queries_per_request', labels)][-2], 0)
+
+    def test_duplicate_queries_are_counted(self):
+        tracker = metrics.QueryTracker()
+        with connection.execute_wrapper(tracker):
+            for _ in range(3):
+                list(User.objects.filter(username='nobody'))
+        self.assertEqual(tracker.count, 3)
+        self.assertEqual(tracker.duplicates, 2)
+
+    def test_prometheus_exposition(self):
+        metrics.registry.inc('http_requests_total', (('view', 'a"b'), ('method', 'GET'), ('status', 200)))
+        metrics.registry.observe('http_request_duration_seconds', (('view', 'home'), ('method', 'GET')), 0.03)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_requests_total{view="a\\"b",method="GET",status="200"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="home",method="GET",le="0.025"} 0', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="home",method="GET",le="0.05"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{view="home",method="GET"} 1', body)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'], METRICS_TOKEN='secret')
+    def test_access_control(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)  # 127.0.0.1 не в списке
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.1.2.3').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+        self.client.force_login(User.objects.create_user(username='staff', password='x', gender=User.Gender.MAN,
+                                                         is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_snapshots_of_other_workers_are_merged(self):
+        labels = (('view', 'home'), ('method', 'GET'), ('status', 200))
+        with tempfile.TemporaryDirectory() as directory:
+            other = metrics.Registry()
+            other.inc('http_requests_total', labels, 5)
+            with open(os.path.join(directory, '1.json'), 'w') as f:
+                json.dump(other.snapshot(), f)
+
+            with override_settings(METRICS_DIR=directory):
+                self.client.get(reverse('home'))
+                self.assertTrue(os.path.exists(os.path.join(directory, f'{os.getpid()}.json')))
+                counters, _ = metrics.collect(directory)
+
+        self.assertEqual(counters[('http_requests_total', labels)], 6)
@@ -1,6 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
-from users.models import Marriage, MarriageProposals
+from users.models import ActiveCouple, Marriage, MarriageProposals
 
 User = get_user_model()
 
@@ -52,6 +52,74 @@ class MarriageModelTest(TestCase):
         self.assertEqual(self.man.partner, self.woman)
         self.assertEqual(self.woman.partner, self.man)
 
+class WithActiveMarriageTest(TestCase):
+    def setUp(self):
+        self.man = User.objects.create_user(
+            username='ivan', password='pass', first_name='Иван', last_name='Иванов', gender=User.Gender.MAN
+        )
+        self.woman = User.objects.create_user(
+            username='maria', password='pass', first_name='Мария', last_name='Петрова', gender=User.Gender.WOMAN
+        )
+        self.single = User.objects.create_user(
+            username='oleg', password='pass', first_name='Олег', last_name='Сидоров', gender=User.Gender.MAN
+        )
+        self.marriage = Marriage.objects.create(husband=self.man, wife=self.woman)
+
+    def test_one_query_for_any_number_of_users(self):
+        with self.assertNumQueries(1):
+            users = {u.username: u for u in User.objects.with_active_marriage()}
+            self.assertEqual(users['ivan'].partner_full_name, 'Мария Петрова')
+            self.assertEqual(users['maria'].partner_full_name, 'Иван Иванов')
+            self.assertEqual(users['maria'].marriage_started_at, self.marriage.created_at)
+            self.assertEqual(users['ivan'].active_marriage_pk, self.marriage.pk)
+            self.assertIsNone(users['oleg'].partner_full_name)
+            self.assertIsNone(users['oleg'].active_marriage)
+
+    def test_annotated_partner(self):
+        man = User.objects.with_active_marriage().get(pk=self.man.pk)
+        self.assertEqual(man.partner_pk, self.woman.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(man.partner, self.woman)
+            self.assertEqual(man.partner.get_full_name(), 'Мария Петрова')
+        self.assertEqual(man.partner.username, 'maria')  # отложенное поле догружается
+
+    def test_single_join_per_role(self):
+        sql = str(User.objects.with_active_marriage().query)
+        self.assertEqual(sql.count('LEFT OUTER JOIN'), 2)
+        self.assertNotIn('SELECT U0', sql)  # без коррелированных подзапросов
+
+
+class ActiveCoupleTest(TestCase):
+    def setUp(self):
+        self.man = User.objects.create_user(
+            username='ivan', password='pass', first_name='Иван', last_name='Иванов', gender=User.Gender.MAN
+        )
+        self.woman = User.objects.create_user(
+            username='maria', password='pass', first_name='Мария', last_name='Петрова', gender=User.Gender.WOMAN
+        )
+        self.marriage = Marriage.objects.create(husband=self.man, wife=self.woman)
+
+    def test_couple_follows_marriage_status(self):
+        couple = ActiveCouple.objects.get(marriage=self.marriage)
+        self.assertEqual(couple.wife_first_name, 'Мария')
+
+        self.marriage.status = Marriage.Status.DIVORCED
+        self.marriage.save()
+        self.assertFalse(ActiveCouple.objects.exists())
+
+    def test_married_manager_skips_divorced_and_duplicates(self):
+        self.marriage.status = Marriage.Status.DIVORCED
+        self.marriage.save()
+        Marriage.objects.create(husband=self.man, wife=self.woman)
+        self.assertEqual(sorted(u.username for u in User.married.all()), ['ivan', 'maria'])
+
+    def test_profile_edit_updates_couple(self):
+        self.woman.is_married = True
+        self.woman.last_name = 'Иванова'
+        self.woman.save()
+        self.assertEqual(ActiveCouple.objects.get().wife_last_name, 'Иванова')
+
+
 class MarriageProposalsModelTest(TestCase):
     def setUp(self):
         self.sender = User.objects.create_user(
@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from users import jobs, thumbnails
+from users.models import User
+from users.storage import photo_storage
+from users.tests.test_thumbnails import age_photo, make_image
+from users.thumbnails import generate_thumbnails, rendition_names
+
+
+class ContentAddressedPhotosTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.ivan = User.objects.create_user(username='ivan', password='pass', gender=User.Gender.MAN)
+        self.petr = User.objects.create_user(username='petr', password='pass', gender=User.Gender.MAN)
+
+    def _photo_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, files in os.walk(os.path.join(self.media_root, 'photos')) for name in files
+        )
+
+    def test_same_content_stored_once(self):
+        self.ivan.photo = make_image('a.jpeg')
+        self.ivan.save()
+        self.petr.photo = make_image('b.jpg')
+        self.petr.save()
+
+        self.assertEqual(self.ivan.photo.name, self.petr.photo.name)
+        self.assertRegex(self.ivan.photo.name, r'^photos/([0-9a-f]{2})/\1[0-9a-f]{62}\.jpg$')
+        self.assertEqual(self._photo_files(), [self.ivan.photo.name])
+
+    def test_delete_keeps_shared_file(self):
+        self.ivan.photo = make_image()
+        self.ivan.save()
+        self.petr.photo = make_image()
+        self.petr.save()
+        name = self.ivan.photo.name
+        generate_thumbnails(name)
+        age_photo(name)
+
+        self.client.force_login(self.ivan)
+        self.assertEqual(self.client.post(reverse('delete_photo')).status_code, 200)
+        jobs.run_pending()
+        self.assertTrue(photo_storage.exists(name))
+        self.assertTrue(all(default_storage.exists(n) for n in rendition_names(name)))
+
+        self.petr.delete()
+        jobs.run_pending()
+        self.assertFalse(photo_storage.exists(name))
+        self.assertFalse(any(default_storage.exists(n) for n in rendition_names(name)))
+
+    def test_delete_postponed_for_fresh_upload(self):
+        self.ivan.photo = make_image()
+        self.ivan.save()
+        name = self.ivan.photo.name
+        self.client.force_login(self.ivan)
+        self.client.post(reverse('delete_photo'))
+
+        # Тот же файл только что загрузили снова — до сохранения пользователя ссылок на него нет
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertTrue(photo_storage.exists(name))
+        self.assertEqual(jobs.run_pending(), 0)  # повтор отложен на PHOTO_GRACE
+
+    def test_upload_waits_for_running_delete(self):
+        self.ivan.photo = make_image()
+        self.ivan.save()
+        name = self.ivan.photo.name
+        age_photo(name)
+        self.client.force_login(self.ivan)
+        self.client.post(reverse('delete_photo'))
+
+        # Тот же файл загружают, пока задача уже решила его удалить: загрузка ждёт и пишет файл заново
+        upload = threading.Thread(target=photo_storage.save, args=('again.jpg', make_image()))
+        delete_thumbnails = thumbnails.delete_thumbnails
+
+        def delete_during_upload(photo):
+            upload.start()
+            upload.join(0.5)
+            delete_thumbnails(photo)
+
+        with mock.patch.object(thumbnails, 'delete_thumbnails', side_effect=delete_during_upload):
+            self.assertEqual(jobs.run_pending(), 1)
+        upload.join()
+        self.assertTrue(photo_storage.exists(name))
+
+    def test_dedupe_command(self):
+        legacy = os.path.join(self.media_root, 'photos', '2025', '08', '02')
+        os.makedirs(legacy)
+        image = make_image()
+        for filename in ('ronaldo.jpg', 'ronaldo_u1M1HLR.jpg', 'orphan.jpg'):
+            with open(os.path.join(legacy, filename), 'wb') as f:
+                f.write(image.read())
+            image.seek(0)
+        old = os.path.join(self.media_root, 'photos', '2025', '08', '02', 'orphan.jpg')
+        os.utime(old, (0, 0))
+        User.objects.filter(pk=self.ivan.pk).update(photo='photos/2025/08/02/ronaldo.jpg')
+        User.objects.filter(pk=self.petr.pk).update(photo='photos/2025/08/02/ronaldo_u1M1HLR.jpg')
+        generate_thumbnails('photos/2025/08/02/ronaldo.jpg')
+
+        out = StringIO()
+        call_command('dedupe_photos', dry_run=True, stdout=out)
+        self.assertIn('Будет переименовано: 2, из них слито с дубликатами: 1', out.getvalue())
+        self.assertEqual(len(self._photo_files()), 3)
+
+        call_command('dedupe_photos', delete_orphans=True, stdout=StringIO())
+        self.ivan.refresh_from_db()
+        self.petr.refresh_from_db()
+        name = self.ivan.photo.name
+        self.assertEqual(self.petr.photo.name, name)
+        self.assertTrue(name.startswith('photos/') and '2025' not in name)
+        self.assertEqual(self._photo_files(), [name])
+        self.assertTrue(all(default_storage.exists(n) for n in rendition_names(name)))
+
+        out = StringIO()
+        call_command('dedupe_photos', stdout=out)
+        self.assertIn('Переименовано: 0', out.getvalue())
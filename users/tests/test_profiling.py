@@ -0,0 +1,99 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from users import jobs, profiling
+from users.models import ProfileCapture, User
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        overrides = override_settings(PROFILE_DIR=self.directory, PROFILE_INTERVAL=0.001, PROFILE_SAMPLE_RATE=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_regular_requests_are_not_profiled(self):
+        response = self.client.get(reverse('home') + '?_profile=1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(ProfileCapture.objects.exists())
+
+    def test_staff_can_profile_a_request(self):
+        staff = User.objects.create_user(username='staff', password='x', gender=User.Gender.MAN, is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse('marriages-list') + '?_profile=1')
+
+        capture = ProfileCapture.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(capture.view, 'marriages-list')
+        self.assertEqual(capture.trigger, ProfileCapture.Trigger.STAFF)
+        self.assertEqual(capture.user, staff)
+        self.assertGreater(capture.queries, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, capture.file)))
+
+    def test_signed_header(self):
+        response = self.client.get(reverse('home'), headers={profiling.TOKEN_HEADER: 'forged:token'})
+        self.assertNotIn('X-Profile-Id', response)
+
+        response = self.client.get(reverse('home'), headers={profiling.TOKEN_HEADER: profiling.make_token()})
+        capture = ProfileCapture.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(capture.trigger, ProfileCapture.Trigger.HEADER)
+
+    def test_sampling(self):
+        with self.settings(PROFILE_SAMPLE_RATE=1):
+            self.client.get(reverse('home'))
+        self.assertEqual(ProfileCapture.objects.get().trigger, ProfileCapture.Trigger.SAMPLE)
+
+    def test_folded_stacks(self):
+        def busy():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        def run():
+            sampler = profiling.Sampler([(threading.get_ident(), run.__code__)], 0.001)
+            sampler.start()
+            busy()
+            sampler.stop()
+            return sampler
+
+        sampler = run()
+        stacks = dict(line.rsplit(' ', 1) for line in sampler.folded().splitlines())
+        # Стек обрезан по кадру run: корень — вызванная из него функция
+        busy_stack = f'{__name__}:ProfilingTest.test_folded_stacks.<locals>.busy'
+        self.assertIn(busy_stack, stacks)
+        self.assertEqual(sum(map(int, stacks.values())), sampler.samples)
+
+    def test_old_captures_are_pruned_with_files(self):
+        with self.settings(PROFILE_SAMPLE_RATE=1, PROFILE_KEEP=1):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get(reverse('home'))
+                self.client.get(reverse('home'))
+            first, second = ProfileCapture.objects.order_by('pk')
+            with self.captureOnCommitCallbacks(execute=True):
+                jobs.run_pending()
+
+        self.assertQuerySetEqual(ProfileCapture.objects.all(), [second])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, first.file)))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, second.file)))
+
+    def test_admin_lists_and_downloads_captures(self):
+        admin = User.objects.create_superuser(username='root', password='x', email='root@example.com',
+                                              gender=User.Gender.MAN)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('marriages-list') + '?_profile=1')
+        capture = ProfileCapture.objects.get(pk=response['X-Profile-Id'])
+
+        response = self.client.get(reverse('admin:users_profilecapture_changelist'))
+        self.assertContains(response, capture.file)
+
+        response = self.client.get(reverse('admin:users_profilecapture_download', args=[capture.pk]))
+        self.assertEqual(response.status_code, 200)
+        with open(os.path.join(self.directory, capture.file), 'rb') as f:
+            self.assertEqual(b''.join(response.streaming_content), f.read())
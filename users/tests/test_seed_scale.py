@@ -0,0 +1,32 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from users.models import ActiveCouple, Marriage, MarriageProposals, User
+
+
+class SeedScaleTest(TestCase):
+    def test_generated_data_is_consistent(self):
+        call_command('seed_scale', users=400, marriages=150, proposals=300, batch_size=70, stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 400)
+        self.assertEqual(Marriage.objects.count(), 150)
+        self.assertEqual(
+            set(MarriageProposals.objects.values_list('status', flat=True)),
+            set(MarriageProposals.Status.values),
+        )
+
+        active = Marriage.objects.filter(status=Marriage.Status.ACTIVE)
+        self.assertEqual(ActiveCouple.objects.count(), active.count())
+        married = set(active.values_list('husband', flat=True)) | set(active.values_list('wife', flat=True))
+        self.assertEqual(married, set(User.objects.filter(is_married=True).values_list('pk', flat=True)))
+        self.assertFalse(active.filter(husband__gender=User.Gender.WOMAN).exists())
+        self.assertFalse(
+            MarriageProposals.objects.filter(status=MarriageProposals.Status.WAITING)
+            .values('sender').annotate(count=Count('pk')).filter(count__gt=1).exists()
+        )
+
+        # Последовательности сдвинуты за вставленные вручную id
+        self.assertGreater(User.objects.create(username='after', gender=User.Gender.MAN).pk, 400)
@@ -0,0 +1,35 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.models import User
+
+
+class SessionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='man', password='x', gender=User.Gender.MAN)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_reads_skip_session_table(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('offers-list'))
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('offers-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in captured if 'django_session' in query['sql']])
+        # Сессия не менялась — куку заново не выставляем
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_bench_sessions(self):
+        out = StringIO()
+        call_command('bench_sessions', iterations=3, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[2:]], ['db', 'cached_db', 'cache', 'signed_cookies'])
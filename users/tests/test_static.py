@@ -0,0 +1,53 @@
+import gzip
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from users import storage
+
+MANIFEST_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'users.storage.CompressedManifestStaticFilesStorage'},
+}
+
+
+class CompressedManifestStorageTest(SimpleTestCase):
+    def test_collectstatic_writes_hashed_and_compressed(self):
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(source, 'css'))
+            css = '.card{color:#db2777;padding:1rem}\n' * 50
+            with open(os.path.join(source, 'css', 'site.css'), 'w') as f:
+                f.write(css)
+            with open(os.path.join(source, 'css', 'tiny.css'), 'w') as f:
+                f.write('a{}')
+
+            with override_settings(STATICFILES_DIRS=[source], STATIC_ROOT=root, STORAGES=MANIFEST_STORAGES,
+                                   INSTALLED_APPS=['django.contrib.staticfiles']):
+                call_command('collectstatic', interactive=False, verbosity=0)
+                hashed = staticfiles_storage.stored_name('css/site.css')
+                tiny = staticfiles_storage.stored_name('css/tiny.css')
+                html = engines['django'].from_string('{% load static %}{% static "css/site.css" %}').render()
+
+            self.assertRegex(hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+            self.assertEqual(html, f'/static/{hashed}')
+            with gzip.open(os.path.join(root, hashed + '.gz'), 'rt') as f:
+                self.assertEqual(f.read(), css)
+            if storage.brotli is not None:
+                self.assertTrue(os.path.exists(os.path.join(root, hashed + '.br')))
+            self.assertNotEqual(tiny, 'css/tiny.css')
+            self.assertFalse(os.path.exists(os.path.join(root, tiny + '.gz')))
+
+    def test_missing_manifest_entry_is_an_error(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root, STORAGES=MANIFEST_STORAGES):
+            with self.assertRaises(ValueError):
+                staticfiles_storage.stored_name('css/site.css')
+
+    def test_plain_names_in_tests(self):
+        # Тесты идут без collectstatic — users.test_runner.TestRunner подменяет хранилище обычным
+        html = engines['django'].from_string('{% load static %}{% static "css/site.css" %}').render()
+        self.assertEqual(html, '/static/css/site.css')
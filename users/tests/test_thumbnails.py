@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from users import jobs
+from users.models import User
+from users.thumbnails import THUMBNAIL_SIZES, generate_thumbnails, rendition_name, rendition_names, thumbnail_url
+
+
+def make_image(name='круза.jpg', size=(800, 600), fmt='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+def age_photo(name, seconds=60 * 60):
+    # Свежезагруженные файлы delete_photo откладывает — делаем вид, что фото загружено давно
+    path = default_storage.path(name)
+    past = os.path.getmtime(path) - seconds
+    os.utime(path, (past, past))
+
+
+class ThumbnailsTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username='ivan', email='ivan@example.com', password='pass', gender=User.Gender.MAN, first_name='Иван', last_name='Иванов'
+        )
+
+    def test_profile_upload_creates_renditions(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('profile'), {
+            'photo': make_image(), 'first_name': 'Иван', 'last_name': 'Иванов', 'gender': User.Gender.MAN,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(jobs.run_pending(), 1)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.photo.name.startswith('photos/'))
+        for name in rendition_names(self.user.photo.name):
+            self.assertTrue(default_storage.exists(name), name)
+        with default_storage.open(rendition_name(self.user.photo.name, 48, 'jpg')) as f:
+            self.assertEqual(Image.open(f).size, (48, 48))
+
+    def test_thumbnail_url_picks_nearest_size(self):
+        self.user.photo = make_image('photo.png')
+        self.user.save()
+        self.assertTrue(self.user.thumbnail_url(100).endswith(f'/thumbs/128/{self.user.photo.name[:-4]}.webp'))
+        self.assertIn(f'/thumbs/{THUMBNAIL_SIZES[-1]}/', self.user.thumbnail_url(1000, 'jpg'))
+
+    def test_delete_photo_removes_files_in_background(self):
+        self.user.photo = make_image('photo.jpg')
+        self.user.save()
+        name = self.user.photo.name
+        jobs.run_pending()
+        age_photo(name)
+
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('delete_photo'))
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.photo)
+        self.assertTrue(default_storage.exists(name))
+
+        jobs.run_pending()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(any(default_storage.exists(n) for n in rendition_names(name)))
+
+    def test_avatar_falls_back_to_original_until_generated(self):
+        self.user.photo = make_image('photo.jpg')
+        self.user.save()
+        template = Template('{% load thumbnails %}{% avatar photo 64 %}')
+        html = template.render(Context({'photo': self.user.photo}))
+        self.assertNotIn('<source', html)
+        self.assertIn(f'src="{self.user.photo.url}"', html)
+
+        generate_thumbnails(self.user.photo)
+        html = template.render(Context({'photo': self.user.photo}))
+        self.assertIn(f'srcset="{thumbnail_url(self.user.photo, 128)}"', html)
+        self.assertIn(f'src="{thumbnail_url(self.user.photo, 128, "jpg")}"', html)
+
+    def test_no_photo_uses_default(self):
+        self.assertEqual(self.user.thumbnail_url(48), '/media/users/default.png')
+
+    def test_backfill_command(self):
+        self.user.photo = make_image('old.jpg')
+        self.user.save()
+        call_command('make_thumbnails', workers=2, stdout=StringIO())
+        for name in rendition_names(self.user.photo.name):
+            self.assertTrue(default_storage.exists(name), name)
+
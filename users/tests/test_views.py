@@ -1,6 +1,10 @@
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from users.models import Marriage
+from users.tests import memory_cache
 
 User = get_user_model()
 
@@ -32,6 +36,18 @@ class PublicViewsTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, self.user.first_name)
 
+    def test_public_profile_of_married_user(self):
+        wife = User.objects.create_user(
+            username='maria', password='pass', gender=User.Gender.WOMAN,
+            first_name='Мария', last_name='Петрова', is_married=True
+        )
+        self.user.is_married = True
+        self.user.save()
+        Marriage.objects.create(husband=self.user, wife=wife)
+        response = self.client.get(reverse('public_profile', args=[self.user.pk]))
+        self.assertContains(response, 'В браке')
+        self.assertContains(response, 'Мария Петрова')
+
 
 class ProfileViewTest(TestCase):
     def setUp(self):
@@ -44,9 +60,107 @@ class ProfileViewTest(TestCase):
         response = self.client.get(reverse('profile'))
         self.assertEqual(response.status_code, 302)  # редирект на логин
 
+    def test_marriages_page(self):
+        wife = User.objects.create_user(
+            username='maria', password='pass', gender=User.Gender.WOMAN, first_name='Мария', last_name='Петрова'
+        )
+        Marriage.objects.create(husband=self.user, wife=wife, status=Marriage.Status.DIVORCED)
+        Marriage.objects.create(husband=self.user, wife=wife)
+        self.client.login(username='testuser', password='pass')
+        response = self.client.get(reverse('marriages-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['active_marriage'].partner_name, 'Мария Петрова')
+        self.assertEqual(len(response.context['past_marriages']), 1)
+
     def test_profile_page(self):
         self.client.login(username='testuser', password='pass')
         response = self.client.get(reverse('profile'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Профиль')
         self.assertContains(response, self.user.first_name)
+
+
+@memory_cache
+class NewlywedsBlockTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.man = User.objects.create_user(
+            username='ivan', password='pass', gender=User.Gender.MAN,
+            first_name='Иван', last_name='Иванов'
+        )
+        self.woman = User.objects.create_user(
+            username='maria', password='pass', gender=User.Gender.WOMAN,
+            first_name='Мария', last_name='Петрова'
+        )
+
+    def test_block_is_cached_between_requests(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Marriage.objects.create(husband=self.man, wife=self.woman)
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Мария Петрова', html=False)
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('home'))
+
+    def test_divorce_removes_couple(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            marriage = Marriage.objects.create(husband=self.man, wife=self.woman)
+        self.assertContains(self.client.get(reverse('home')), 'Мария')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            marriage.status = Marriage.Status.DIVORCED
+            marriage.save()
+        self.assertContains(self.client.get(reverse('home')), 'Молодожёнов, к сожалению, ещё нет')
+
+    def test_new_marriage_is_added_to_cached_block(self):
+        self.client.get(reverse('home'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Marriage.objects.create(husband=self.man, wife=self.woman)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Иван')
+
+
+@memory_cache
+class PublicProfileCachingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser', password='pass', gender=User.Gender.MAN,
+            first_name='Иван', last_name='Иванов'
+        )
+        self.url = reverse('public_profile', args=[self.user.pk])
+
+    def test_repeat_visit_gets_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_profile_edit_changes_etag_and_fragment(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.user.first_name = 'Пётр'
+        self.user.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Пётр')
+
+    def test_marriage_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        wife = User.objects.create_user(
+            username='maria', password='pass', gender=User.Gender.WOMAN, first_name='Мария', last_name='Петрова'
+        )
+        User.objects.filter(pk__in=[self.user.pk, wife.pk]).update(is_married=True)
+        Marriage.objects.create(husband=self.user, wife=wife)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Мария Петрова')
@@ -0,0 +1,112 @@
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+THUMBNAIL_SIZES = tuple(sorted(getattr(settings, 'THUMBNAIL_SIZES', (48, 128, 256))))
+THUMBNAIL_DIR = 'thumbs'
+# WebP — основной формат, JPEG — запасной для браузеров без WebP
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DEFAULT_AVATAR = 'users/default.png'
+
+
+def _photo_name(photo):
+    return getattr(photo, 'name', photo) or ''
+
+
+def fit_size(size):
+    """Наименьший из нарезаемых размеров, не меньший запрошенного."""
+    for candidate in THUMBNAIL_SIZES:
+        if candidate >= size:
+            return candidate
+    return THUMBNAIL_SIZES[-1]
+
+
+def rendition_name(name, size, ext='webp'):
+    # thumbs/128/photos/2025/08/02/круза.webp — рядом с оригиналом, чтобы имя однозначно выводилось из photo
+    base = posixpath.splitext(name)[0]
+    return f'{THUMBNAIL_DIR}/{size}/{base}.{ext}'
+
+
+def rendition_names(name):
+    return [rendition_name(name, size, ext) for size in THUMBNAIL_SIZES for ext in FORMATS]
+
+
+def thumbnail_url(photo, size, ext='webp'):
+    name = _photo_name(photo)
+    if not name:
+        return f'{settings.MEDIA_URL}{DEFAULT_AVATAR}'
+    return default_storage.url(rendition_name(name, fit_size(size), ext))
+
+
+def available_thumbnail_url(photo, size, ext='webp'):
+    """URL превью, если оно уже нарезано, иначе None: задача ещё в очереди или упала, фото старше превью."""
+    name = _photo_name(photo)
+    if not name:
+        return None
+    rendition = rendition_name(name, fit_size(size), ext)
+    return default_storage.url(rendition) if default_storage.exists(rendition) else None
+
+
+def photo_url(photo, size, ext='jpg'):
+    """Для <img src>: превью, а пока его нет — исходное фото (или аватар по умолчанию)."""
+    name = _photo_name(photo)
+    if not name:
+        return f'{settings.MEDIA_URL}{DEFAULT_AVATAR}'
+    return available_thumbnail_url(name, size, ext) or default_storage.url(name)
+
+
+def _open(name):
+    with default_storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        # Для JPEG декодер сразу уменьшает картинку в 2/4/8 раз — многомегабайтные фото читаются в разы быстрее
+        image.draft('RGB', (THUMBNAIL_SIZES[-1], THUMBNAIL_SIZES[-1]))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB')
+
+
+def _save(name, data):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(data))
+
+
+def generate_thumbnails(photo, force=True):
+    """Нарезает квадратные превью фото во всех размерах и форматах. Возвращает число записанных файлов."""
+    name = _photo_name(photo)
+    if not name:
+        return 0
+    if not force and all(default_storage.exists(n) for n in rendition_names(name)):
+        return 0
+
+    image = _open(name)
+    written = 0
+    for size in reversed(THUMBNAIL_SIZES):
+        # Аватары выводятся в круге с object-cover, поэтому сразу обрезаем по центру до квадрата
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for ext, (fmt, options) in FORMATS.items():
+            buffer = BytesIO()
+            image.save(buffer, fmt, **options)
+            _save(rendition_name(name, size, ext), buffer.getvalue())
+            written += 1
+    return written
+
+
+def delete_thumbnails(photo):
+    name = _photo_name(photo)
+    if not name:
+        return
+    for rendition in rendition_names(name):
+        if default_storage.exists(rendition):
+            default_storage.delete(rendition)
@@ -1,7 +1,7 @@
 from django.contrib.auth.views import LogoutView
 from django.urls import path
 
-from . import views, api_views
+from . import views, api_views, async_views
 
 urlpatterns = [
     path('', views.HomePage.as_view(), name='home'),
@@ -14,9 +14,16 @@ urlpatterns = [
     path('proposal/', views.ProposalHTML.as_view(), name='proposal'),
     path('api/proposal/', api_views.ProposalAPI.as_view(), name='proposal-api'),
     path('offers/', views.OffersHTML.as_view(), name='offers-list'),
+    path('api/offers/', async_views.OffersListAPI.as_view(), name='offers-list-api'),
+    path('api/offers/events/', async_views.ProposalEventsView.as_view(), name='proposal-events'),
     path('api/offers/<int:pk>/', api_views.OffersAPI.as_view(), name='offers-api'),
     path('api/divorce/', api_views.DivorceAPI.as_view(), name='divorce-api'),
     path('marriages/', views.MarriagesHTML.as_view(), name='marriages-list'),
-    path('api/users/autocomplete/', api_views.UserAutocompleteView.as_view(), name='user-autocomplete'),
+    path('api/marriages/', api_views.MarriagesAPI.as_view(), name='marriages-api'),
+    path('api/users/candidates/', api_views.CandidatesAPI.as_view(), name='user-candidates'),
+    path('api/users/autocomplete/', async_views.UserAutocompleteView.as_view(), name='user-autocomplete'),
+    path('api/newlyweds/', async_views.NewlywedsAPI.as_view(), name='newlyweds-api'),
+    path('api-token-auth/', api_views.ApiTokenAPI.as_view(), name='api-token-auth'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 
 ]
@@ -1,14 +1,24 @@
+import hashlib
+import hmac
+import ipaddress
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView
-from django.db import models
-from django.db.models import Q
-from django.http import JsonResponse
+from django.core.paginator import Paginator
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views.generic import ListView, CreateView, UpdateView, TemplateView, View, DetailView
 
+from users import cards, metrics, newlyweds, tasks
 from users.forms import LoginUserForm, RegisterUserForm, ProfileUserForm, MarriageProposalForm
-from users.models import User, Marriage, MarriageProposals
+from users.history import history_queryset, to_records
+from users.models import ActiveCouple, User, Marriage, MarriageProposals
 
 
 class HomePage(ListView):
@@ -18,7 +28,7 @@ class HomePage(ListView):
     }
 
     def get_queryset(self):
-        return User.married.all()
+        return ActiveCouple.objects.order_by('-created_at', '-marriage')
 
 
 class LoginUser(LoginView):
@@ -42,11 +52,11 @@ class UserProfile(LoginRequiredMixin, UpdateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user  # type: User
+        user = self.object  # type: User
 
         context.update({
             'is_married': user.is_married,
-            'partner_name': user.partner,
+            'partner_name': user.partner_full_name,
         })
 
         return context
@@ -55,20 +65,65 @@ class UserProfile(LoginRequiredMixin, UpdateView):
         return reverse_lazy('profile')
 
     def get_object(self, queryset=None):
-        return self.request.user
+        # Данные брака подтягиваются тем же запросом, что и сам пользователь
+        return User.objects.with_active_marriage().get(pk=self.request.user.pk)
+
+
+def _profile_versions(request, pk):
+    # Один индексный запрос: updated_at пользователя и его активного брака
+    if not hasattr(request, '_profile_versions'):
+        active = Marriage.objects.filter(
+            models.Q(husband=OuterRef('pk')) | models.Q(wife=OuterRef('pk')),
+            status=Marriage.Status.ACTIVE
+        )
+        request._profile_versions = User.objects.filter(pk=pk).annotate(
+            marriage_updated_at=Subquery(active.values('updated_at')[:1])
+        ).values_list('updated_at', 'marriage_updated_at').first()
+    return request._profile_versions
+
+
+def profile_last_modified(request, pk):
+    versions = _profile_versions(request, pk)
+    if versions is None:
+        return None
+    return max(version for version in versions if version)
 
 
+def profile_etag(request, pk):
+    versions = _profile_versions(request, pk)
+    if versions is None:
+        return None
+    # Страница зависит и от смотрящего (шапка, кнопка предложения), и от блока молодожёнов
+    viewer = request.user
+    parts = [pk, *versions, viewer.pk, getattr(viewer, 'updated_at', None), newlyweds.current_version()]
+    return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+@method_decorator(condition(etag_func=profile_etag, last_modified_func=profile_last_modified), name='get')
 class UserPublicProfileView(DetailView):
-    model = get_user_model()
+    queryset = User.objects.with_active_marriage()
     template_name = 'users/public_profile.html'
     context_object_name = 'profile_user'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        versions = _profile_versions(self.request, self.object.pk)
+        context.update({
+            'profile_version': '-'.join(str(v.timestamp()) if v else '0' for v in versions),
+            'profile_cache_timeout': settings.PROFILE_CACHE_TIMEOUT,
+        })
+        return context
+
 
 class DeletePhotoView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         user = request.user
         if user.photo:
-            user.photo.delete(save=True)
+            # Файлы удаляет воркер, в запросе только обнуляем поле
+            with transaction.atomic():
+                tasks.delete_photo.delay(photo=user.photo.name)
+                user.photo = None
+                user.save(update_fields=['photo', 'updated_at'])
             return JsonResponse({'success': True})
         return JsonResponse({'success': False, 'error': 'Нет фото'}, status=400)
 
@@ -82,12 +137,10 @@ class ProposalHTML(LoginRequiredMixin, TemplateView):
         proposal_type = self.request.GET.get('type', 'registered')
         is_for_registered = proposal_type != 'unregistered'
 
-        free_users = User.objects.filter(~Q(username=self.request.user.username), is_married=False)
-
         form = MarriageProposalForm(initial={'type': proposal_type})
 
+        # Список свободных подгружается постранично из CandidatesAPI
         context.update({
-            'free_users': free_users,
             'is_for_registered': is_for_registered,
             'form': form,
         })
@@ -101,16 +154,23 @@ class OffersHTML(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Полученные
-        incoming = MarriageProposals.objects.filter(
-            receiver=self.request.user,
-            status=MarriageProposals.Status.WAITING
-        )
-        # Отправленные заявки
-        outgoing = MarriageProposals.objects.filter(
-            sender=self.request.user,
+        # Полученные и отправленные заявки — одним запросом, вторые участники — карточками из кэша
+        user = self.request.user
+        offers = list(MarriageProposals.objects.filter(
+            models.Q(receiver=user) | models.Q(sender=user),
             status=MarriageProposals.Status.WAITING
+        ).order_by('-created_at', '-id'))
+        people = cards.get_cards(
+            offer.sender_id if offer.receiver_id == user.pk else offer.receiver_id for offer in offers
         )
+        incoming, outgoing = [], []
+        for offer in offers:
+            if offer.receiver_id == user.pk:
+                offer.person = people.get(offer.sender_id)
+                incoming.append(offer)
+            else:
+                offer.person = people.get(offer.receiver_id)
+                outgoing.append(offer)
 
         choice = MarriageProposals.Status
 
@@ -130,30 +190,49 @@ class MarriagesHTML(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        marriages = Marriage.objects.filter(
-            models.Q(husband=self.request.user) | models.Q(wife=self.request.user)
-        ).select_related('husband', 'wife')
-
-        marriages_data = []
-        for marriage in marriages.select_related('husband', 'wife'):
-            partner = marriage.wife if marriage.husband == self.request.user else marriage.husband
-            marriages_data.append({
-                'partner': partner,
-                'start_date': marriage.created_at.strftime("%d.%m.%Y"),
-                'end_date': marriage.updated_at.strftime(
-                    "%d.%m.%Y") if marriage.status != Marriage.Status.ACTIVE else None,
-                'is_active': marriage.status == Marriage.Status.ACTIVE,
-                'partner_photo': getattr(partner, 'has_photo', '/media/users/default.png')
-            })
-
-        marriages_data.sort(key=lambda x: x['start_date'], reverse=True)
+        # Сортировка и постраничная выдача — в БД, строки — компактные MarriageRecord
+        paginator = Paginator(history_queryset(self.request.user), settings.MARRIAGES_PER_PAGE)
+        page = paginator.get_page(self.request.GET.get('page'))
+        records = to_records(page)
 
-        active_marriage = next((m for m in marriages_data if m['is_active']), None)  # Первый активный (или None)
-        past_marriages = [m for m in marriages_data if not m['is_active']]  # Список прошедших
+        # Активный брак всегда самый новый: жениться можно, только будучи свободным
+        active_marriage = records[0] if page.number == 1 and records and records[0].is_active else None
+        past_marriages = [record for record in records if not record.is_active]
 
         context.update({
             'active_marriage': active_marriage,
             'past_marriages': past_marriages,
+            'page_obj': page,
             'request': self.request
         })
         return context
+
+
+def _metrics_allowed(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    )
+
+
+class MetricsView(View):
+    """Метрики запросов в текстовом формате Prometheus (см. users/metrics.py).
+
+    Доступ — сотрудникам, с адресов METRICS_ALLOWED_IPS или с токеном METRICS_TOKEN: не полагаемся
+    на то, что перед приложением стоит nginx с закрытым /metrics.
+    """
+
+    def get(self, request):
+        if not _metrics_allowed(request):
+            return HttpResponseForbidden()
+        body = metrics.render(getattr(settings, 'METRICS_DIR', ''))
+        return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')